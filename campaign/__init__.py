@@ -0,0 +1,19 @@
+"""
+Campaign bookkeeping (progress journal, resume), scheduling and the
+acquisition worker process.
+"""
+from .journal import CampaignJournal, item_key, read_journal
+from .orchestrator import Orchestrator, Resource
+from .worker import AcquisitionWorker, RemoteRun, WorkerError
+
+__all__ = [
+    "CampaignJournal",
+    "item_key",
+    "read_journal",
+    "Orchestrator",
+    "Resource",
+    "AcquisitionWorker",
+    "RemoteRun",
+    "WorkerError",
+]
+__version__ = "0.1.0"
@@ -0,0 +1,136 @@
+"""
+Crash-safe campaign journal.
+
+An append-only JSON-lines file that records the progress of a measurement
+campaign. Every record is flushed and fsync'd before the call returns, so
+after a crash, power cut or USB drop the journal holds everything that was
+finished. A record looks like::
+
+    {"t": 1718200000.1, "event": "done", "key": "r01/c05/s2:CHRONOAMPEROMETRY",
+     "outputs": {"csv_path": "..."}, "metrics": {"avg": 1.2e-06}}
+
+Events:
+    - ``start``: a new campaign (or a resumed one, ``"resume": true``) with
+      the list of planned item keys and free-form metadata,
+    - ``done``: one item finished, with its output location and key metrics,
+    - ``failed``: one item raised, with the error message,
+    - ``finish``: the campaign ran to the end.
+
+A ``start`` without ``resume`` begins a fresh campaign; everything before it
+is history. With ``resume`` the completed items of the current campaign are
+kept, so the loop can skip them and re-enter at the first incomplete item.
+"""
+import json
+import os
+import threading
+import time
+
+
+def item_key(repeat, cell, step, method):
+    """Journal key of one planned item (repeat and step are 1-based)."""
+    return f"r{repeat:02}/c{cell:02}/s{step}:{method.strip().upper()}"
+
+
+def read_journal(path):
+    """Return all records of a journal file.
+
+    Truncated lines (the process died while writing them) are skipped.
+    """
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+class CampaignJournal:
+    """Append-only, fsync'd progress log of one campaign."""
+
+    def __init__(self, path):
+        self.path = path
+        self.completed = {}
+        self.failed = {}
+        self.planned = []
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._torn = False
+        self._lock = threading.Lock()   # records may come from worker threads
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                self._torn = f.read(1) != b"\n"
+        for record in read_journal(self.path):
+            event = record.get("event")
+            if event == "start":
+                if not record.get("resume"):
+                    self.completed = {}
+                    self.failed = {}
+                self.planned = record.get("items", [])
+            elif event == "done":
+                self.completed[record["key"]] = record
+                self.failed.pop(record["key"], None)
+            elif event == "failed":
+                self.failed[record["key"]] = record
+
+    def _append(self, event, **fields):
+        record = {"t": time.time(), "event": event, **fields}
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._torn:
+                # terminate a half-written line left by a crash
+                line = "\n" + line
+                self._torn = False
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        return record
+
+    # ---------- campaign ----------
+
+    def start(self, items, resume=False, **meta):
+        """Record the planned `items` (journal keys).
+
+        Without `resume` all earlier progress is discarded. With `resume`
+        completed items are kept; returns the keys that are still to do.
+        """
+        if not resume:
+            self.completed = {}
+            self.failed = {}
+        self.planned = list(items)
+        self._append("start", resume=bool(resume), items=self.planned, meta=meta)
+        pending = [k for k in self.planned if k not in self.completed]
+        if resume:
+            print(f"[CampaignJournal] Resuming: {len(self.planned) - len(pending)} of "
+                  f"{len(self.planned)} item(s) already done")
+        return pending
+
+    def is_done(self, key):
+        return key in self.completed
+
+    def record_done(self, key, outputs=None, metrics=None):
+        self.completed[key] = self._append("done", key=key, outputs=outputs or {},
+                                           metrics=metrics or {})
+        self.failed.pop(key, None)
+
+    def record_failed(self, key, error):
+        self.failed[key] = self._append("failed", key=key, error=str(error))
+
+    def finish(self, **summary):
+        self._append("finish", **summary)
+
+    def progress(self):
+        """(done, planned) item counts of the current campaign."""
+        return sum(1 for k in self.planned if k in self.completed), len(self.planned)
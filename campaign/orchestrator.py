@@ -0,0 +1,169 @@
+"""
+Resource-aware scheduling of a measurement campaign.
+
+The hardware and the host side of a campaign are modelled as resources:
+the printer, the potentiostat(s), the disk writer and the plot renderer.
+Every piece of work is a task on one resource with a list of tasks it has
+to wait for, so each cell visit becomes a small dependency graph::
+
+    move(i) ──> measure(i) ──> retract(i) ──> move(i+1) ...
+                    ├────────> save(i) ───┐
+                    └────────> plot(i) ───┴─> record(i)
+
+A task starts as soon as its dependencies are done and its resource is
+free, so independent work overlaps: CSV files and plots of cell i are
+written while the printer already moves to cell i+1, and the final park
+runs while the last outputs are flushed.
+
+The work itself is plain blocking code (serial I/O, numpy, matplotlib); it
+runs in threads via ``asyncio.to_thread`` and the event loop only does the
+scheduling. The event loop gets a thread of its own, so `run` also works
+where the caller already runs a loop (a Jupyter kernel, PyironFlow's run
+button). `Orchestrator.report` returns the busy time and utilization
+of every resource.
+"""
+import asyncio
+import dataclasses
+import threading
+import time
+
+
+@dataclasses.dataclass
+class Task:
+    name: str
+    resource: str
+    fn: object                      # callable without arguments
+    after: tuple = ()               # names of the tasks to wait for
+    result: object = None
+    ready: float | None = None      # dependencies done (monotonic time)
+    start: float | None = None
+    end: float | None = None
+
+
+class Resource:
+    """A resource that runs at most `capacity` tasks at a time."""
+
+    def __init__(self, name, capacity=1):
+        self.name = name
+        self.capacity = capacity
+        self.tasks = []
+        self._semaphore = None
+
+    async def run(self, task):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.capacity)
+        async with self._semaphore:
+            task.start = time.monotonic()
+            try:
+                task.result = await asyncio.to_thread(task.fn)
+            finally:
+                task.end = time.monotonic()
+                self.tasks.append(task)
+        return task.result
+
+    def busy_s(self):
+        return sum(task.end - task.start for task in self.tasks)
+
+    def wait_s(self):
+        """Total time tasks were ready but waited for this resource."""
+        return sum(task.start - task.ready for task in self.tasks)
+
+
+class Orchestrator:
+    """Run a dependency graph of tasks on a set of resources.
+
+    ``orchestrator.add(name, resource, fn, after=(...))`` adds a task;
+    `run` executes all of them and returns {name: result}. If a task
+    raises, the tasks that have not started yet are cancelled and the
+    error is raised from `run` once the running ones have ended.
+    """
+
+    def __init__(self, resources=("printer", "potentiostat", "disk", "plot")):
+        self.resources = {}
+        for resource in resources:
+            if isinstance(resource, str):
+                resource = Resource(resource)
+            self.resources[resource.name] = resource
+        self.tasks = {}
+        self.started = None
+        self.ended = None
+
+    def add(self, name, resource, fn, after=()):
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task {name!r}")
+        if resource not in self.resources:
+            raise ValueError(f"Unknown resource {resource!r} of task {name!r}")
+        missing = [dep for dep in after if dep and dep not in self.tasks]
+        if missing:
+            raise ValueError(f"Task {name!r} depends on unknown task(s) {missing}")
+        self.tasks[name] = Task(name, resource, fn, tuple(dep for dep in after if dep))
+        return name
+
+    async def _run_all(self):
+        for resource in self.resources.values():
+            resource._semaphore = None     # bound to the previous event loop
+        futures = {}
+
+        async def run_task(task):
+            if task.after:
+                await asyncio.gather(*(futures[dep] for dep in task.after))
+            task.ready = time.monotonic()
+            return await self.resources[task.resource].run(task)
+
+        # tasks are added in dependency order, so every dependency exists
+        for task in self.tasks.values():
+            futures[task.name] = asyncio.ensure_future(run_task(task))
+        try:
+            await asyncio.gather(*futures.values())
+        except BaseException:
+            for future in futures.values():
+                future.cancel()
+            await asyncio.gather(*futures.values(), return_exceptions=True)
+            raise
+
+    def result(self, name):
+        """Result of a finished task (e.g. inside a task that depends on it)."""
+        return self.tasks[name].result
+
+    def queue_depths(self):
+        """{resource: number of tasks ready to start but waiting for it}."""
+        depths = dict.fromkeys(self.resources, 0)
+        for task in list(self.tasks.values()):
+            if task.ready is not None and task.start is None:
+                depths[task.resource] += 1
+        return depths
+
+    def run(self):
+        """Run all tasks and return {name: result}; re-raises the first task error."""
+        errors = []
+
+        def scheduler():
+            try:
+                asyncio.run(self._run_all())
+            except BaseException as e:
+                errors.append(e)
+
+        self.started = time.monotonic()
+        thread = threading.Thread(target=scheduler, name="orchestrator", daemon=True)
+        try:
+            thread.start()
+            thread.join()
+        finally:
+            self.ended = time.monotonic()
+        if errors:
+            raise errors[0]
+        return {name: task.result for name, task in self.tasks.items()}
+
+    def report(self):
+        """{resource: {"tasks", "busy_s", "wait_s", "utilization"}} plus "makespan_s"."""
+        makespan = (self.ended or time.monotonic()) - (self.started or time.monotonic())
+        report = {"makespan_s": round(makespan, 3)}
+        for name, resource in self.resources.items():
+            busy = resource.busy_s()
+            report[name] = {
+                "tasks": len(resource.tasks),
+                "busy_s": round(busy, 3),
+                "wait_s": round(resource.wait_s(), 3),
+                "utilization": round(busy / makespan, 3) if makespan > 0 else 0.0,
+            }
+        return report
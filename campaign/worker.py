@@ -0,0 +1,330 @@
+"""
+Acquisition in a separate process.
+
+The notebook kernel shares the GIL with ipywidgets, pyironflow and
+matplotlib, so a busy GUI delays the serial reads. `AcquisitionWorker`
+starts a child process that owns the printer and PalmSens ports and runs
+the measurements there; the kernel only sends commands over a
+``multiprocessing`` pipe and receives the results::
+
+    with AcquisitionWorker(printer_port="COM4", simulate=False) as worker:
+        planner = MotionPlanner(worker.gcode)
+        planner.visit(...)
+        result = worker.measure("CHRONOAMPEROMETRY", port="COM5", ...)
+
+`measure` and `measure_chain` take the arguments of `run_method` /
+`run_chain` and return their result dicts; CSV, plot and column store are
+written by the worker. While a run streams, the worker sends its points in
+batches (``on_points(batch)`` in the kernel, e.g. for a live plot). Batches
+go through a bounded outbox on their own thread: if the kernel stops
+reading, batches are dropped (and counted) instead of blocking acquisition,
+and if the kernel goes away the running command still finishes and writes
+its files before the worker exits.
+
+The worker uses the ``spawn`` start method (the only one on Windows), so
+commands and results must be picklable.
+"""
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+
+BATCH_POINTS = 512          # points per batch at most
+BATCH_INTERVAL_S = 0.1      # ... or this old at most
+
+
+class WorkerError(RuntimeError):
+    """A command raised in the worker process (message includes its traceback)."""
+
+
+class RemoteRun:
+    """Stand-in for a `MethodRun` whose outputs the worker has already written."""
+
+    def __init__(self, result):
+        self.result = result
+
+    def save_csv(self):
+        pass
+
+    def save_plot(self):
+        pass
+
+    def summarize(self):
+        return self.result
+
+    def finish(self):
+        return self.result
+
+
+# ---------- worker process ----------
+
+class _PointBatcher:
+    """Collects the points of the running measurement into batches."""
+
+    def __init__(self, outbox, max_pending):
+        self.outbox = outbox
+        self.max_pending = max_pending
+        self.request = None
+        self.dropped = 0
+        self._run = None
+        self._reset()
+
+    def _reset(self):
+        self.x, self.y, self.t = [], [], []
+        self.started = time.monotonic()
+
+    def on_point(self, run, x, y, t_host):
+        if run is not self._run:
+            self.flush()
+            self._run = run
+        self.x.append(x)
+        self.y.append(y)
+        self.t.append(t_host)
+        if len(self.x) >= BATCH_POINTS or t_host - self.started >= BATCH_INTERVAL_S:
+            self.flush()
+
+    def flush(self):
+        if self.x and self._run is not None:
+            if self.outbox.qsize() >= self.max_pending:
+                self.dropped += len(self.x)
+            else:
+                self.outbox.put(("points", self.request, {
+                    "method": self._run.spec.key, "raw_path": self._run.raw_path,
+                    "x": self.x, "y": self.y, "t_host": self.t, "dropped": self.dropped,
+                }))
+        self._reset()
+
+
+class _WorkerState:
+    def __init__(self, printer_port, printer_baud, simulate, batcher):
+        self.printer_port = printer_port
+        self.printer_baud = printer_baud
+        self.simulate = simulate
+        self.batcher = batcher
+        self._printer = None
+
+    @property
+    def printer(self):
+        from printer.printer_setup import open_printer
+        if self._printer is None:
+            self._printer = open_printer(self.printer_port, self.printer_baud, self.simulate)
+            if self._printer is None:
+                raise ConnectionError(f"Could not connect to printer on {self.printer_port}")
+        return self._printer
+
+    def close(self):
+        from printer.printer_setup import close_printer
+        if self._printer is not None:
+            close_printer(self.printer_port)
+            self._printer = None
+
+
+def _op_ping(state):
+    return multiprocessing.current_process().pid
+
+
+def _op_gcode(state, commands):
+    printer = state.printer
+    for command in commands:
+        printer.send_and_wait(command)
+
+
+def _op_sync(state, timeout_s):
+    state.printer.sync(timeout=timeout_s)
+
+
+def _op_position(state):
+    printer = state.printer
+    return {"position": dict(printer.position), "homed": printer.homed}
+
+
+def _op_measure(state, method, **kwargs):
+    from palmsens.palmsens_controller import run_method
+    return run_method(method, on_point=state.batcher.on_point, **kwargs)
+
+
+def _op_measure_chain(state, steps, **kwargs):
+    from palmsens.palmsens_controller import run_chain
+    return run_chain(steps, on_point=state.batcher.on_point, **kwargs)
+
+
+def _op_link_stats(state):
+    from telemetry.linkstats import snapshot_all
+    return snapshot_all()
+
+
+_OPS = {
+    "ping": _op_ping,
+    "gcode": _op_gcode,
+    "sync": _op_sync,
+    "position": _op_position,
+    "measure": _op_measure,
+    "measure_chain": _op_measure_chain,
+    "link_stats": _op_link_stats,
+}
+
+
+def _send_loop(conn, outbox):
+    connected = True
+    while True:
+        message = outbox.get()
+        if message is None:
+            return
+        if connected:
+            try:
+                conn.send(message)
+            except (OSError, EOFError):
+                connected = False       # kernel gone: keep draining, keep measuring
+
+
+def _worker_main(conn, printer_port, printer_baud, simulate, max_pending):
+    outbox = queue.Queue()
+    sender = threading.Thread(target=_send_loop, args=(conn, outbox), name="worker-sender",
+                              daemon=True)
+    sender.start()
+    batcher = _PointBatcher(outbox, max_pending)
+    state = _WorkerState(printer_port, printer_baud, simulate, batcher)
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except (OSError, EOFError):
+                break
+            if message[0] == "stop":
+                break
+            _, request, op, kwargs = message
+            batcher.request = request
+            try:
+                reply = ("reply", request, True, _OPS[op](state, **kwargs))
+            except Exception as e:
+                reply = ("reply", request, False,
+                         f"{type(e).__name__}: {e}\n{traceback.format_exc()}")
+            batcher.flush()     # the last points go out before the reply
+            batcher.request = None
+            outbox.put(reply)
+    finally:
+        state.close()
+        outbox.put(None)
+        sender.join(timeout=5)
+
+
+# ---------- kernel side ----------
+
+class AcquisitionWorker:
+    """Client of the acquisition process; one command runs at a time.
+
+    `on_points(batch)` receives the streamed point batches (dicts with
+    method, raw_path, x, y, t_host and the number of points dropped so far)
+    while a command is waited for.
+    """
+
+    def __init__(self, printer_port="COM4", printer_baud=115200, simulate=True,
+                 on_points=None, max_pending=256):
+        self.printer_port = printer_port
+        self.printer_baud = printer_baud
+        self.simulate = simulate
+        self.on_points = on_points
+        self.max_pending = max_pending
+        self.process = None
+        self._conn = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        """Start the worker; the kernel's own session on the printer port is closed first.
+
+        Raises RuntimeError if a printer control panel still uses that session.
+        """
+        from printer.printer_setup import release_port
+        # a second open of the port fails on Windows (exclusive COM ports) and
+        # resets the board elsewhere, so the kernel lets go of it first
+        release_port(self.printer_port)
+        context = multiprocessing.get_context("spawn")
+        self._conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, name="acquisition-worker",
+            args=(child, self.printer_port, self.printer_baud, self.simulate, self.max_pending),
+        )
+        self.process.start()
+        child.close()
+        pid = self.call("ping", timeout=60)
+        print(f"[AcquisitionWorker] Started (pid {pid})")
+        return self
+
+    def stop(self, timeout=None):
+        """Let the worker finish its command, release the ports and exit."""
+        if self.process is None:
+            return
+        try:
+            self._conn.send(("stop",))
+        except (OSError, EOFError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            print("[AcquisitionWorker] Worker did not stop; terminating")
+            self.process.terminate()
+            self.process.join()
+        self._conn.close()
+        self.process = None
+
+    def call(self, op, timeout=None, **kwargs):
+        """Run `op` in the worker and return its result (raises `WorkerError`)."""
+        with self._lock:
+            request = next(self._ids)
+            self._conn.send(("call", request, op, kwargs))
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                wait = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                if not self._conn.poll(wait):
+                    if not self.alive:
+                        raise WorkerError(f"Worker exited during {op!r}")
+                    raise TimeoutError(f"No reply to {op!r} within {timeout} s")
+                try:
+                    message = self._conn.recv()
+                except (OSError, EOFError):
+                    raise WorkerError(f"Worker exited during {op!r}") from None
+                if message[0] == "points":
+                    if self.on_points is not None:
+                        self.on_points(message[2])
+                elif message[1] == request:
+                    _, _, ok, payload = message
+                    if not ok:
+                        raise WorkerError(payload)
+                    return payload
+
+    def gcode(self, command):
+        """Send one G-code line (or a list) to the printer, each acknowledged with
+        ``ok``; usable as a `MotionPlanner` send."""
+        self.call("gcode", commands=[command] if isinstance(command, str) else list(command))
+
+    def sync(self, timeout=120.0):
+        """Wait until the printer has finished all moves (``M400``)."""
+        self.call("sync", timeout_s=timeout)
+
+    def position(self):
+        """{"position": {"X", "Y", "Z"}, "homed"} of the worker's printer session."""
+        return self.call("position")
+
+    def measure(self, method, **kwargs):
+        """`run_method` in the worker; returns its result dict."""
+        return self.call("measure", method=method, **kwargs)
+
+    def measure_chain(self, steps, **kwargs):
+        """`run_chain` in the worker; returns its result dicts."""
+        return self.call("measure_chain", steps=steps, **kwargs)
+
+    def link_stats(self):
+        return self.call("link_stats")
@@ -1,7 +1,17 @@
 """
 PalmSens wrapper + MethodSCRIPT helpers.
 """
-from .palmsens_controller import run_chronoamperometry, PalmSensController
+from .palmsens_controller import (
+    run_chronoamperometry, run_cyclic_voltammetry, run_ocp, run_method, run_chain, PalmSensController,
+)
+from .termination import AdaptiveTerminator, build_terminator
+from .reducers import ReducerSet, build_reducers
+from .columnstore import ColumnStore, ColumnWriter
+from .capture import RecordingComm, ReplayComm, read_capture
+from . import jitter, quality
+from .mscript_estimate import estimate_script, estimate_script_file
+from .templates import ScriptTemplate, load_template
+from .ringbuffer import RingBuffer
 
 # Optional re-exports if these modules exist in your package:
 try:
@@ -15,6 +25,26 @@ except Exception:
 
 __all__ = [
     "run_chronoamperometry",
+    "run_cyclic_voltammetry",
+    "run_ocp",
+    "run_method",
+    "run_chain",
+    "AdaptiveTerminator",
+    "build_terminator",
+    "ReducerSet",
+    "build_reducers",
+    "ColumnStore",
+    "ColumnWriter",
+    "RecordingComm",
+    "ReplayComm",
+    "read_capture",
+    "quality",
+    "jitter",
+    "estimate_script",
+    "estimate_script_file",
+    "ScriptTemplate",
+    "load_template",
+    "RingBuffer",
     "PalmSensController",
     "Instrument",
     "Serial",
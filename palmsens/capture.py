@@ -0,0 +1,137 @@
+"""
+Raw serial capture and offline replay.
+
+`RecordingComm` wraps a communication object (anything with ``write`` and
+``readline``, see `palmsens.instrument.Instrument`) and logs all traffic to a
+compact binary file. `ReplayComm` plays such a file back as a communication
+object, so a recorded run can be fed through `Instrument` and `mscript`
+again, e.g. after the post-processing changed, or to benchmark the parser on
+real traffic.
+
+File format: the magic bytes ``PSCAP1\\n`` followed by records of
+
+    direction  1 byte    b'T' (host -> device) or b'R' (device -> host)
+    timestamp  float64   host time (time.time()) of the write / readline
+    length     uint32    payload length in bytes
+    payload    length bytes
+
+all little-endian.
+"""
+import logging
+import struct
+import time
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = b'PSCAP1\n'
+TX = b'T'
+RX = b'R'
+
+_RECORD = struct.Struct('<cdI')
+
+
+def read_capture(path):
+    """Yield (direction, timestamp, payload) records from a capture file.
+
+    A record that was cut off (process killed while writing) ends the file.
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a PalmSens capture file.')
+        while True:
+            head = file.read(_RECORD.size)
+            if len(head) < _RECORD.size:
+                return
+            direction, timestamp, length = _RECORD.unpack(head)
+            payload = file.read(length)
+            if len(payload) < length:
+                return
+            yield direction, timestamp, payload
+
+
+class RecordingComm:
+    """Communication wrapper that logs all TX/RX bytes to `path`.
+
+    Every record is flushed to the OS as soon as it is written (one line per
+    record, so this is cheap at serial rates): a crashed or killed run
+    leaves a replayable capture up to its last line.
+    """
+
+    def __init__(self, comm, path):
+        self.comm = comm
+        self.path = path
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _record(self, direction, data):
+        self._file.write(_RECORD.pack(direction, time.time(), len(data)))
+        self._file.write(data)
+        self._file.flush()
+
+    def write(self, data: bytes):
+        self._record(TX, data)
+        self.comm.write(data)
+
+    def readline(self) -> bytes:
+        data = self.comm.readline()
+        # Empty reads (timeouts) are recorded too; they show gaps in the
+        # device output. Replay skips them.
+        self._record(RX, data)
+        return data
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class ReplayComm:
+    """Communication object that replays the RX side of a capture file.
+
+    Writes are accepted and ignored. By default lines are returned as fast
+    as they are read; with `realtime` the recorded timing between lines is
+    reproduced. When the recording is exhausted (e.g. a capture of a run that
+    was cut off), `readline` raises EOFError instead of timing out forever.
+    """
+
+    def __init__(self, path, realtime=False):
+        self.path = path
+        self.realtime = realtime
+        self._records = read_capture(path)
+        self._last_timestamp = None
+        self._last_wall = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, data: bytes):
+        LOG.debug('Replay: ignoring TX %r', data)
+
+    def readline(self) -> bytes:
+        for direction, timestamp, payload in self._records:
+            if direction == RX and payload:
+                break
+        else:
+            raise EOFError(f'End of capture {self.path}')
+        if self.realtime:
+            if self._last_timestamp is not None:
+                delay = (timestamp - self._last_timestamp) - (time.monotonic() - self._last_wall)
+                if delay > 0:
+                    time.sleep(delay)
+            self._last_timestamp = timestamp
+            self._last_wall = time.monotonic()
+        return payload
+
+    def close(self):
+        self._records.close()
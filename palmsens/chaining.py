@@ -0,0 +1,88 @@
+"""
+Chaining the method steps of a cell into one MethodSCRIPT execution.
+
+`chain_scripts` merges several scripts (e.g. OCP -> CV -> CA) into one: a
+single ``e`` header, the union of the ``var`` declarations, then the body of
+every step preceded by a boundary marker::
+
+    send_string "chain_step 1"
+
+and one ``on_finished:`` section with the (deduplicated) cleanup lines of
+all steps. The device echoes a marker as a text line (``Tchain_step 1``), so
+`demux` can route the output lines back to the step that produced them.
+
+Steps then follow each other with only the instrument's own switching time
+in between, instead of a reconnect, re-upload and script end per step. The
+price is that a step cannot be stopped on its own: aborting ends the chain.
+"""
+import re
+
+STEP_MARKER = 'chain_step'
+
+_MARKER_LINE = re.compile(r'^T' + STEP_MARKER + r' (\d+)\s*$')
+
+
+def _split_script(text):
+    """(var lines, body lines, on_finished lines) of a script, without comments."""
+    variables, body, finished = [], [], []
+    section = body
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        if stripped == 'e' and not body and not variables:
+            continue
+        if stripped == 'on_finished:':
+            section = finished
+            continue
+        if section is body and stripped.startswith('var '):
+            variables.append(stripped)
+            continue
+        section.append(line)
+    return variables, body, finished
+
+
+def chain_scripts(scripts):
+    """Merge scripts (texts, in step order) into one script with step markers."""
+    variables, finished, out = [], [], []
+    for index, text in enumerate(scripts, 1):
+        step_vars, body, step_finished = _split_script(text)
+        variables += [v for v in step_vars if v not in variables]
+        finished += [f for f in step_finished if f.strip() not in (x.strip() for x in finished)]
+        out.append(f'send_string "{STEP_MARKER} {index}"')
+        out += body
+    lines = ['e', *variables, *out]
+    if finished:
+        lines += ['on_finished:', *finished]
+    return '\n'.join(lines) + '\n\n'
+
+
+def marker_step(line):
+    """Step index (0-based) of a marker line, or None for any other line."""
+    match = _MARKER_LINE.match(line)
+    return int(match.group(1)) - 1 if match else None
+
+
+def demux(lines):
+    """Yield (step index, line) for the output lines of a chained script.
+
+    Marker lines are consumed; lines before the first marker (e.g. the
+    script acknowledgement) belong to step -1.
+    """
+    step = -1
+    for line in lines:
+        index = marker_step(line)
+        if index is not None:
+            step = index
+            continue
+        yield step, line
+
+
+def split_result_lines(lines, n_steps):
+    """Output lines of a chained script as one list of lines per step."""
+    steps = [[] for _ in range(n_steps)]
+    for step, line in demux(lines):
+        if 0 <= step < n_steps:
+            steps[step].append(line)
+    return steps
@@ -0,0 +1,158 @@
+"""
+On-disk column store for streamed measurement data.
+
+A store is a directory with one raw little-endian file per column plus a JSON
+header::
+
+    Chronoamperometry_Data_20240101-120000.cols/
+        header.json          columns, dtypes, units, metadata, row count
+        x.f8                 float64 values, back to back
+        y.f8
+        curve.u2             uint16
+        ...
+
+Rows are buffered in fixed-size chunks and appended to the column files
+when a chunk is full, so memory use does not depend on the run length. The
+header is written when the store is created and rewritten on close; the row
+count of a store that was never closed (crash, USB drop) is derived from the
+file sizes, so everything up to the last flushed chunk can still be read.
+Columns are opened with ``numpy.memmap`` and are not loaded into memory.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+HEADER = "header.json"
+
+
+def _column_file(path, name, dtype):
+    return os.path.join(path, f"{name}.{np.dtype(dtype).str[1:]}")
+
+
+class ColumnWriter:
+    """Append rows to a column store in fixed-size chunks.
+
+    `columns` maps column names to numpy dtypes (in order). `units` and
+    `meta` are stored in the header. With `fsync` every flushed chunk is
+    forced to disk.
+    """
+
+    def __init__(self, path, columns, units=None, meta=None, chunk_rows=4096, fsync=False):
+        self.path = path
+        self.columns = {name: np.dtype(dtype).newbyteorder("<") for name, dtype in columns.items()}
+        self.units = dict(units or {})
+        self.meta = dict(meta or {})
+        self.chunk_rows = chunk_rows
+        self.fsync = fsync
+        self.n_rows = 0
+        self._fill = 0
+        self._buffers = {name: np.empty(chunk_rows, dtype) for name, dtype in self.columns.items()}
+        os.makedirs(path, exist_ok=True)
+        self._files = {name: open(_column_file(path, name, dtype), "wb")
+                       for name, dtype in self.columns.items()}
+        self._write_header(complete=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_header(self, complete):
+        header = {
+            "columns": [{"name": name, "dtype": dtype.str, "unit": self.units.get(name, "")}
+                        for name, dtype in self.columns.items()],
+            "n_rows": self.n_rows,
+            "complete": complete,
+            "meta": self.meta,
+        }
+        tmp = os.path.join(self.path, HEADER + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f, indent=2, default=str)
+        os.replace(tmp, os.path.join(self.path, HEADER))
+
+    def append(self, *row):
+        """Append one row (values in column order)."""
+        i = self._fill
+        for buffer, value in zip(self._buffers.values(), row):
+            buffer[i] = value
+        self._fill += 1
+        if self._fill == self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows to the column files."""
+        if not self._fill:
+            return
+        for name, f in self._files.items():
+            f.write(self._buffers[name][:self._fill].tobytes())
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.n_rows += self._fill
+        self._fill = 0
+
+    def close(self, **meta):
+        """Flush, close the column files and mark the store complete."""
+        if self._files is None:
+            return
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = None
+        self.meta.update(meta)
+        self._write_header(complete=True)
+
+
+class ColumnStore:
+    """Read-only access to a column store; columns are memory-mapped."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, HEADER), encoding="utf-8") as f:
+            self.header = json.load(f)
+        self.columns = {c["name"]: np.dtype(c["dtype"]) for c in self.header["columns"]}
+        self.units = {c["name"]: c.get("unit", "") for c in self.header["columns"]}
+        self.meta = self.header.get("meta", {})
+        self.complete = self.header.get("complete", False)
+        if self.complete:
+            self.n_rows = self.header["n_rows"]
+        else:
+            # never closed: trust only rows present in every column file
+            self.n_rows = min(
+                (os.path.getsize(_column_file(path, name, dtype)) // dtype.itemsize
+                 for name, dtype in self.columns.items()),
+                default=0,
+            )
+
+    def __len__(self):
+        return self.n_rows
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        dtype = self.columns[name]
+        if self.n_rows == 0:
+            return np.empty(0, dtype)
+        return np.memmap(_column_file(self.path, name, dtype), dtype=dtype, mode="r",
+                         shape=(self.n_rows,))
+
+    def iter_chunks(self, names=None, chunk_rows=65536):
+        """Yield dicts of column slices of at most `chunk_rows` rows."""
+        names = list(names or self.columns)
+        arrays = {name: self[name] for name in names}
+        for start in range(0, self.n_rows, chunk_rows):
+            yield {name: arrays[name][start:start + chunk_rows] for name in names}
+
+    def to_csv(self, csv_path, names=None, headers=None, chunk_rows=65536):
+        """Write columns to CSV chunk by chunk; `headers` renames columns."""
+        names = list(names or self.columns)
+        headers = headers or {}
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            pd.DataFrame(columns=[headers.get(n, n) for n in names]).to_csv(f, index=False)
+            for chunk in self.iter_chunks(names, chunk_rows):
+                frame = pd.DataFrame({headers.get(n, n): np.asarray(chunk[n]) for n in names})
+                frame.to_csv(f, index=False, header=False)
@@ -0,0 +1,144 @@
+"""
+Decimation of measured curves for display.
+
+A plot cannot show more than a few points per pixel column, so long captures
+are reduced to a pixel budget before they are drawn:
+
+    `minmax`  splits the curve (in acquisition order) into runs of points
+              that fall into the same x column (a fraction of a pixel wide)
+              and keeps the first, minimum, maximum and last point of each,
+              so the drawn trace (spikes, noise band, overloads) looks the
+              same as with every point. Fully vectorized.
+    `lttb`    Largest-Triangle-Three-Buckets: keeps the one point per bucket
+              that spans the largest triangle with its neighbours; smoother
+              looking, but may drop isolated extremes. One numpy pass per
+              bucket; expects finite values (NaN gaps: use `minmax`).
+
+A run ends wherever the curve leaves its column, so CV cycles (x going back
+and forth) keep one run per pass through each column and every scan is drawn;
+the point count grows with the number of passes, not with the capture length.
+`for_axes` bins by the actual pixel columns of matplotlib axes, which is what
+the plots use; `minmax` bins the x range into equal columns when there is no
+axes at hand. Curves that already fit the budget are returned unchanged.
+"""
+import numpy as np
+
+# columns per pixel: at 1 the join between two runs can shift an edge pixel
+SUBPIXEL = 4
+
+
+def run_indices(columns, y):
+    """Sorted indices of the first/min/max/last point of each run of equal `columns`."""
+    columns = np.asarray(columns)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n == 0:
+        return np.arange(0)
+    nan = np.isnan(y)
+    change = columns[1:] != columns[:-1]
+    if nan.any():
+        # gaps get runs of their own (kept, so the line stays broken) and never win
+        change |= nan[1:] != nan[:-1]
+    starts = np.flatnonzero(np.r_[True, change])
+    lengths = np.diff(np.r_[starts, n])
+    if len(starts) * 4 >= n:
+        return np.arange(n)
+
+    def first_hit(values, ufunc):
+        best = np.repeat(ufunc.reduceat(values, starts), lengths)
+        hit = np.flatnonzero((values == best) | np.isnan(best))
+        owner = np.searchsorted(starts, hit, side='right') - 1
+        return hit[np.unique(owner, return_index=True)[1]]
+
+    low, high = y, y
+    if nan.any():
+        low, high = np.where(nan, np.inf, y), np.where(nan, -np.inf, y)
+    return np.unique(np.concatenate([
+        starts,
+        starts + lengths - 1,
+        first_hit(low, np.minimum),
+        first_hit(high, np.maximum),
+    ]))
+
+
+def minmax(x, y, n_bins, subpixel=SUBPIXEL):
+    """(x, y) reduced to at most 4 points per pass through each of `n_bins` x columns."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) <= 4 * n_bins:
+        return x, y
+    finite = np.isfinite(x)
+    if not finite.any():
+        return x, y
+    low, high = x[finite].min(), x[finite].max()
+    scale = n_bins * subpixel / (high - low) if high > low else 0.0
+    columns = np.floor((np.where(finite, x, low) - low) * scale).astype(np.int64)
+    index = run_indices(columns, y)
+    return x[index], y[index]
+
+
+def lttb(x, y, n_out):
+    """(x, y) reduced to `n_out` points with Largest-Triangle-Three-Buckets."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    index = np.empty(n_out, dtype=np.intp)
+    index[0], index[-1] = 0, n - 1
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # third corner: mean of the next bucket (the last point after the last bucket)
+        if i + 2 < len(edges):
+            cx, cy = x[stop:edges[i + 2]].mean(), y[stop:edges[i + 2]].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        ax, ay = x[index[i]], y[index[i]]
+        area = np.abs((ax - cx) * (y[start:stop] - ay) - (ax - x[start:stop]) * (cy - ay))
+        index[i + 1] = start + int(area.argmax())
+    return x[index], y[index]
+
+
+def pixel_width(ax):
+    """Width of matplotlib axes `ax` in output pixels (at the figure's dpi)."""
+    figure = ax.get_figure()
+    return max(int(ax.get_position().width * figure.get_figwidth() * figure.dpi), 1)
+
+
+def fit_view(ax, x, y):
+    """Set the data limits of `ax` from the full (x, y) before it is decimated."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    ax.ignore_existing_data_limits = True
+    if finite.any():
+        ax.update_datalim([[x[finite].min(), y[finite].min()],
+                           [x[finite].max(), y[finite].max()]])
+    ax.autoscale_view()
+
+
+def for_axes(ax, x, y, subpixel=SUBPIXEL):
+    """(x, y) reduced to the pixel columns of `ax`; call after the limits are final.
+
+    Plot the result with the limits kept (e.g. after `fit_view`): autoscaling
+    on the reduced points gives the same view only if its extremes survived.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) <= 4 * pixel_width(ax):
+        return x, y
+    finite = np.isfinite(x)
+    points = np.column_stack([np.where(finite, x, 0.0), np.full(len(x), ax.get_ylim()[0])])
+    columns = np.floor(ax.transData.transform(points)[:, 0] * subpixel).astype(np.int64)
+    index = run_indices(np.where(finite, columns, -1), y)
+    return x[index], y[index]
+
+
+def decimate(x, y, n_pixels, method='minmax'):
+    """(x, y) reduced for a plot `n_pixels` wide ('minmax' or 'lttb')."""
+    if method == 'minmax':
+        return minmax(x, y, n_pixels)
+    if method == 'lttb':
+        return lttb(x, y, 2 * n_pixels)
+    raise ValueError(f'Unknown decimation method {method!r}')
@@ -44,6 +44,12 @@ EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 # Standard library imports
 import logging
 import time
+from contextlib import contextmanager
+
+# Local imports
+from palmsens.capture import RecordingComm
+from telemetry.linkstats import link_stats
+from telemetry.tracing import traced
 
 
 LOG = logging.getLogger(__name__)
@@ -87,6 +93,15 @@ class CommunicationTimeout(Exception):
     """
 
 
+def _link_name(comm):
+    """Name of the link statistics of a communication object (port or replay file)."""
+    connection = getattr(comm, 'connection', comm)
+    port = getattr(connection, 'port', None)
+    if port:
+        return port
+    return 'replay' if getattr(comm, 'path', None) else type(comm).__name__
+
+
 class Instrument():
     """Communication interface for MethodSCRIPT instruments.
 
@@ -101,13 +116,21 @@ class Instrument():
         - readline() -> bytes
     """
 
-    def __init__(self, comm):
+    def __init__(self, comm, capture_path=None):
         """Initialize the object.
 
         `comm` must be a communication object as described in the
-        documentation of this class.
+        documentation of this class. If `capture_path` is given, all raw
+        traffic is recorded to that file (see `palmsens.capture`); call
+        `close_capture()` when done.
         """
+        self.link = link_stats(f'palmsens:{_link_name(comm)}')
+        self.link.connected()
+        if capture_path:
+            comm = RecordingComm(comm, capture_path)
         self.comm = comm
+        # Optional overall deadline (time.monotonic()) for reading responses.
+        self.deadline = None
         self.firmware_version = None
         self.device_type = DeviceType.UNKNOWN
 
@@ -125,37 +148,57 @@ class Instrument():
         data = text.encode('ascii')
         LOG.debug('TX: %r', data)
         self.comm.write(data)
+        self.link.tx(len(data))
 
     def writelines(self, lines):
         """Write multiple lines to the device."""
         for line in lines:
             self.write(line)
 
+    def set_deadline(self, seconds):
+        """Give up reading after `seconds` from now (None: no deadline).
+
+        Use e.g. the estimated script duration (see `palmsens.mscript_estimate`)
+        so a hung script is detected instead of retrying indefinitely.
+        """
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+
     def readline(self) -> str:
         """Read one response line from the device."""
         max_attempts = 50
         attempt = 0
         while attempt < max_attempts:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                self.link.incr('errors')
+                raise CommunicationError('Deadline exceeded while waiting for the device.')
             data = self.comm.readline()
             if data:
                 LOG.debug('RX: %r', data)
                 line = data.decode('ascii', errors='replace')
                 if line.endswith('\n'):
+                    self.link.rx(len(data))
                     return line
                 else:
                     LOG.warning('Incomplete line received: %s', line)
+                    self.link.incr('partial_lines')
                     attempt += 1
                     time.sleep(2.0)  # Delay before retrying
             else:
                 LOG.warning('No data received, attempt %d', attempt + 1)
+                self.link.incr('timeouts')
                 attempt += 1
                 time.sleep(2.0)
+            self.link.incr('retries')
+        self.link.incr('errors')
         raise CommunicationError('No EOL character received after multiple attempts.')
 
 
-    def readlines_until_end(self):
-        """Receive all lines until an empty line is received."""
-        lines = []
+    def iter_lines(self):
+        """Yield response lines as they arrive, until an empty line is received.
+
+        This allows data packages to be processed while the script is still
+        running (see `readlines_until_end` for the collected version).
+        """
         while True:
             try:
                 line = self.readline()
@@ -163,11 +206,45 @@ class Instrument():
                 if line == '\n':
                     LOG.warning("Empty line received. Possible script error.")
                     break
-                lines.append(line)
+                yield line
             except CommunicationTimeout:
                 LOG.warning("Communication timeout while reading lines.")
                 continue
-        return lines
+
+    def readlines_until_end(self):
+        """Receive all lines until an empty line is received."""
+        return list(self.iter_lines())
+
+    def close_capture(self):
+        """Finish the raw traffic capture, if one is being recorded."""
+        if isinstance(self.comm, RecordingComm):
+            self.comm.close()
+
+    @contextmanager
+    def unrecorded(self):
+        """Talk to the device without recording the traffic in the capture.
+
+        For exchanges a replay must not see, e.g. `abort_and_sync` before or
+        after a run: replaying skips them, so recording them would shift the
+        replayed responses.
+        """
+        comm = self.comm
+        if isinstance(comm, RecordingComm):
+            self.comm = comm.comm
+        try:
+            yield self
+        finally:
+            self.comm = comm
+
+    def abort(self):
+        """Abort the running script without waiting.
+
+        The device acknowledges with 'Z', runs the `on_finished:` section of
+        the script and then ends the output with an empty line as usual, so the
+        caller should keep reading (e.g. continue `iter_lines`).
+        """
+        LOG.info('Aborting active script.')
+        self.write('Z\n')
 
 
     def _update_firmware_version_and_device_type(self, force=False):
@@ -196,6 +273,7 @@ class Instrument():
         self._update_firmware_version_and_device_type(force=force)
         return self.firmware_version
 
+    @traced('instrument.handshake')
     def get_device_type(self, force=False):
         """Get the device type.
 
@@ -236,15 +314,28 @@ class Instrument():
     def send_script(self, path):
         """Read a script from file and send it to the device."""
         with open(path, 'rt', encoding='ascii') as file:
-            lines = file.readlines()
-    
+            self.send_script_text(file.read())
+
+    @traced('instrument.upload')
+    def send_script_text(self, text):
+        """Send a script that is already in memory (e.g. rewritten or rendered)."""
+        lines = text.splitlines(keepends=True)
+
         LOG.info("Sending the following MethodSCRIPT:")
         for line in lines:
             LOG.info(line.strip())  # Strip to remove extra newline characters in the log
     
         self.writelines(lines)
 
+    @traced('instrument.upload')
+    def send_script_bytes(self, data: bytes):
+        """Send a script that is already encoded (e.g. a rendered template) in one write."""
+        LOG.info('Sending MethodSCRIPT (%d bytes).', len(data))
+        LOG.debug('TX: %r', data)
+        self.comm.write(data)
+        self.link.tx(len(data), lines=data.count(b'\n'))
 
+    @traced('instrument.abort_and_sync')
     def abort_and_sync(self):
         """Abort a possibly running script and wait for it to finish.
 
@@ -0,0 +1,84 @@
+"""
+Host-side timing of streamed packages.
+
+Every package is stamped with the host's monotonic clock when its line is
+read from the serial port (column ``t_host``, float64 seconds, see
+`palmsens_controller.MethodRun`). Comparing these stamps with each other and
+with the device's own time column shows whether the host kept up:
+
+    gaps        time between consecutive packages on the host; a *stall* is a
+                gap longer than `stall_factor` times the median gap
+    latency     host arrival minus device time, relative to the fastest
+                package of the run (the transport floor), for methods whose
+                x column is a device-side time in seconds (CA, OCP)
+    correlation how often points flagged ``TIMING_ERROR`` by the device follow
+                a host stall, and the correlation of the gap with the flag
+
+A host stall (GC pause, plotting, widget updates) delays reading; once the
+device's output buffer is full it cannot keep its own timing and flags the
+points. Runs replayed from a capture carry replay times, not device arrival
+times.
+"""
+import numpy as np
+
+from palmsens.columnstore import ColumnStore
+from palmsens.quality import STATUS, find_stores
+
+HOST_COLUMN = 't_host'
+
+
+def _stats(values):
+    if len(values) == 0:
+        return None
+    return {
+        'median': float(np.median(values)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max()),
+    }
+
+
+def jitter_report(store, column='y', stall_factor=5.0):
+    """Gap, latency and TIMING_ERROR correlation summary of one run (or None
+    if the store has no host timestamps)."""
+    if HOST_COLUMN not in store or len(store) < 2:
+        return None
+    t_host = np.asarray(store[HOST_COLUMN], dtype=np.float64)
+    gaps = np.diff(t_host)
+    median_gap = float(np.median(gaps))
+    stalls = gaps > stall_factor * median_gap if median_gap > 0 else np.zeros(len(gaps), bool)
+
+    latency = None
+    if store.units.get('x') == 's':
+        offset = t_host - np.asarray(store['x'], dtype=np.float64)
+        latency = _stats(offset - offset.min())
+
+    status_column = f'{column}_status'
+    flagged = np.zeros(len(gaps), bool)
+    if status_column in store:
+        # a flag on point i is attributed to the gap before it
+        flagged = (np.asarray(store[status_column][1:]) & STATUS['TIMING_ERROR']) != 0
+    correlation = None
+    if flagged.any() and not flagged.all() and gaps.std() > 0:
+        correlation = float(np.corrcoef(gaps, flagged)[0, 1])
+
+    return {
+        'n_points': len(store),
+        'duration_s': float(t_host[-1] - t_host[0]),
+        'gap_s': _stats(gaps),
+        'stalls': int(stalls.sum()),
+        'stall_s': float((gaps[stalls] - median_gap).sum()),
+        'latency_s': latency,
+        'timing_errors': int(flagged.sum()),
+        'timing_errors_after_stall': int((flagged & stalls).sum()),
+        'gap_timing_error_correlation': correlation,
+    }
+
+
+def scan_jitter(root, column='y', stall_factor=5.0):
+    """`jitter_report` of every run below `root` that has host timestamps."""
+    rows = []
+    for path in find_stores(root):
+        report = jitter_report(ColumnStore(path), column, stall_factor)
+        if report is not None:
+            rows.append({'path': path, **report})
+    return rows
@@ -45,6 +45,8 @@ import warnings
 # Third-party imports
 import numpy as np
 
+from telemetry.tracing import traced
+
 
 # Custom types
 VarType = collections.namedtuple('VarType', ['id', 'name', 'unit'])
@@ -319,6 +321,7 @@ def parse_mscript_data_package(line: str):
         return [MScriptVar(var) for var in line[1:-1].split(';')]
 
 
+@traced('mscript.parse')
 def parse_result_lines(lines):
     """Parse the result of a MethodSCRIPT and return a list of curves.
 
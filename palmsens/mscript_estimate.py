@@ -0,0 +1,249 @@
+"""
+Static duration / point-count estimator for MethodSCRIPTs.
+
+Walks a script (the subset used in ``scripts/``: ``var``, ``store_var``,
+``add_var`` / ``sub_var`` / ``mul_var`` / ``div_var`` / ``copy_var``,
+``wait``, ``loop`` ... ``endloop``, the ``meas_loop_*`` commands and
+``pck_*`` packages) and predicts, without a device:
+    - the duration of the script,
+    - the number of data packages every measurement loop emits,
+    - the package layout (variables and their types) of every loop.
+
+Values that are only known at run time (e.g. the OCP result that a later
+potential is relative to) are taken as 0. Since the scripts use them as
+offsets, differences such as an LSV window are still right. Commands that
+are not understood are ignored and listed in `ScriptEstimate.warnings`.
+"""
+import dataclasses
+import math
+import re
+
+from palmsens.mscript import SI_PREFIX_FACTOR
+
+_LITERAL = re.compile(r'^([+-]?\d+(?:\.\d+)?)([afpnumkMGTPE]?)$')
+
+# Variable types of the outputs of each measurement loop, in argument order.
+_LOOP_OUTPUTS = {
+    'meas_loop_ocp': ['ab'],
+    'meas_loop_ca': ['da', 'ba'],
+    'meas_loop_cv': ['da', 'ba'],
+    'meas_loop_lsv': ['da', 'ba'],
+    'meas_loop_dpv': ['da', 'ba'],
+    'meas_loop_swv': ['da', 'ba', 'ba', 'ba'],
+    'meas_loop_eis': ['dc', 'cc', 'cd'],
+}
+
+# Rough time per EIS frequency: a few periods, but at least the settling time.
+_EIS_PERIODS = 2.0
+_EIS_MIN_POINT_S = 0.1
+
+_MAX_LOOP_ITERATIONS = 100000
+
+
+@dataclasses.dataclass
+class LoopEstimate:
+    command: str
+    duration_s: float
+    n_packages: int
+    layout: list      # [(variable, type id), ...] of the package
+
+
+@dataclasses.dataclass
+class ScriptEstimate:
+    duration_s: float = 0.0
+    loops: list = dataclasses.field(default_factory=list)
+    warnings: list = dataclasses.field(default_factory=list)
+
+    @property
+    def n_packages(self):
+        return sum(loop.n_packages for loop in self.loops)
+
+    def timeout(self, factor=1.5, margin_s=60.0):
+        """A generous upper bound for the whole run (s)."""
+        return self.duration_s * factor + margin_s
+
+
+def parse_literal(token):
+    """MethodSCRIPT numeric literal ('500m', '-15m', '1', '2100n') -> float, or None."""
+    match = _LITERAL.match(token)
+    if not match:
+        return None
+    value, prefix = match.groups()
+    return float(value) * SI_PREFIX_FACTOR[prefix or ' ']
+
+
+def _split_blocks(lines):
+    """Return (index of matching 'endloop') for every loop opener."""
+    ends = {}
+    stack = []
+    for i, (command, _) in enumerate(lines):
+        if command == 'loop' or command.startswith('meas_loop_'):
+            stack.append(i)
+        elif command == 'endloop' and stack:
+            ends[stack.pop()] = i
+    return ends
+
+
+class _Estimator:
+    def __init__(self, text):
+        self.lines = []
+        for raw in text.splitlines():
+            code = raw.split('#', 1)[0].strip()
+            if not code:
+                continue
+            if code == 'on_finished:':
+                break
+            tokens = code.split()
+            self.lines.append((tokens[0], tokens[1:]))
+        self.ends = _split_blocks(self.lines)
+        self.values = {}
+        self.types = {}
+        self.result = ScriptEstimate()
+
+    def value(self, token):
+        literal = parse_literal(token)
+        if literal is not None:
+            return literal
+        return self.values.get(token, 0.0)
+
+    def warn(self, message):
+        if message not in self.result.warnings:
+            self.result.warnings.append(message)
+
+    def run(self, start, end):
+        i = start
+        while i < end:
+            command, args = self.lines[i]
+            if command.startswith('meas_loop_'):
+                i = self.meas_loop(i, command, args)
+            elif command == 'loop':
+                i = self.loop(i, args)
+            else:
+                self.simple(command, args)
+                i += 1
+
+    def simple(self, command, args):
+        if command == 'var':
+            self.values.setdefault(args[0], 0.0)
+        elif command == 'store_var':
+            self.values[args[0]] = self.value(args[1])
+            if len(args) > 2:
+                self.types[args[0]] = args[2]
+        elif command == 'copy_var':
+            self.values[args[1]] = self.values.get(args[0], 0.0)
+            self.types[args[1]] = self.types.get(args[0], '')
+        elif command in ('add_var', 'sub_var', 'mul_var', 'div_var'):
+            a, b = self.values.get(args[0], 0.0), self.value(args[1])
+            if command == 'add_var':
+                a += b
+            elif command == 'sub_var':
+                a -= b
+            elif command == 'mul_var':
+                a *= b
+            elif b:
+                a /= b
+            self.values[args[0]] = a
+        elif command == 'wait':
+            self.result.duration_s += self.value(args[0])
+        elif command in ('if', 'elseif', 'else', 'endif', 'breakloop'):
+            self.warn(f"'{command}' is not evaluated; all branches are counted")
+
+    def loop(self, i, args):
+        end = self.ends.get(i)
+        if end is None:
+            self.warn("'loop' without 'endloop'")
+            return len(self.lines)
+        ops = {'<': lambda a, b: a < b, '<=': lambda a, b: a <= b,
+               '>': lambda a, b: a > b, '>=': lambda a, b: a >= b,
+               '!=': lambda a, b: a != b, '==': lambda a, b: a == b}
+        if len(args) != 3 or args[1] not in ops:
+            self.warn(f"unsupported loop condition {' '.join(args)!r}; counted once")
+            self.run(i + 1, end)
+            return end + 1
+        compare = ops[args[1]]
+        for _ in range(_MAX_LOOP_ITERATIONS):
+            if not compare(self.value(args[0]), self.value(args[2])):
+                break
+            self.run(i + 1, end)
+        else:
+            self.warn('loop did not terminate within the iteration limit')
+        return end + 1
+
+    def meas_loop(self, i, command, args):
+        end = self.ends.get(i, len(self.lines))
+        outputs = _LOOP_OUTPUTS.get(command)
+        if outputs is None:
+            self.warn(f"'{command}' is not supported; its duration is unknown")
+            return end + 1
+        n_out = len(outputs)
+        for name, type_id in zip(args, outputs):
+            self.types[name] = type_id
+        params = [self.value(a) for a in args[n_out:] if '(' not in a]
+        duration, points = self._loop_size(command, params, args[n_out:])
+
+        layout = [(a[0], self.types.get(a[0], '')) for c, a in self.lines[i + 1:end] if c == 'pck_add']
+        self.result.loops.append(LoopEstimate(command, duration, points if layout else 0, layout))
+        self.result.duration_s += duration
+        # statements in the body run once per point (e.g. 'add_var t 1')
+        body = [(c, a) for c, a in self.lines[i + 1:end] if not c.startswith('pck_')]
+        for _ in range(min(points, _MAX_LOOP_ITERATIONS)):
+            for c, a in body:
+                self.simple(c, a)
+        return end + 1
+
+    def _loop_size(self, command, params, raw):
+        """(duration s, number of points) of one measurement loop."""
+        if command in ('meas_loop_ocp',):
+            interval, run_time = params[0], params[1]
+            return run_time, int(run_time / interval + 1e-9) if interval > 0 else 0
+        if command == 'meas_loop_ca':
+            _, interval, run_time = params[:3]
+            return run_time, int(run_time / interval + 1e-9) if interval > 0 else 0
+        if command == 'meas_loop_cv':
+            begin, vtx1, vtx2, step, rate = params[:5]
+            scans = 1
+            for token in raw:
+                match = re.match(r'nscans\((\d+)\)', token)
+                if match:
+                    scans = int(match.group(1))
+            path = abs(vtx1 - begin) + abs(vtx2 - vtx1) + abs(begin - vtx2)
+            return scans * path / rate, scans * int(round(path / step))
+        if command in ('meas_loop_lsv', 'meas_loop_dpv', 'meas_loop_swv'):
+            begin, end_, step = params[:3]
+            points = int(round(abs(end_ - begin) / step)) + 1
+            if command == 'meas_loop_lsv':
+                rate = params[3]
+                return abs(end_ - begin) / rate, points
+            # pulse techniques: last parameter before options is the pulse period
+            # (dpv) or frequency (swv)
+            if command == 'meas_loop_dpv':
+                period = params[-1]
+            else:
+                period = 1.0 / params[-1] if params[-1] else 0.0
+            return points * period, points
+        if command == 'meas_loop_eis':
+            _, f_max, f_min, n_freq = params[:4]
+            n_freq = int(n_freq)
+            if n_freq <= 1 or f_min <= 0:
+                freqs = [f_max]
+            else:
+                ratio = (f_min / f_max) ** (1.0 / (n_freq - 1))
+                freqs = [f_max * ratio ** k for k in range(n_freq)]
+            duration = sum(max(_EIS_PERIODS / f, _EIS_MIN_POINT_S) for f in freqs if f > 0)
+            return duration, n_freq
+        return 0.0, 0
+
+
+def estimate_script(text):
+    """Estimate duration, packages and layout of a MethodSCRIPT (text)."""
+    estimator = _Estimator(text)
+    estimator.run(0, len(estimator.lines))
+    result = estimator.result
+    if not math.isfinite(result.duration_s):
+        result.warnings.append('duration is not finite')
+    return result
+
+
+def estimate_script_file(path):
+    with open(path, encoding='ascii') as f:
+        return estimate_script(f.read())
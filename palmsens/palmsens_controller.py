@@ -111,24 +111,677 @@ import os
 import sys
 import datetime
 import logging
-import pandas as pd
+import time
+from collections import namedtuple
+from dataclasses import dataclass, field
 import matplotlib
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-
-from palmsens import instrument, mscript, serial
+from matplotlib.figure import Figure
+
+from palmsens import chaining, decimate, instrument, mscript, serial
+from palmsens.capture import ReplayComm
+from palmsens.columnstore import ColumnStore, ColumnWriter
+from palmsens.jitter import jitter_report
+from palmsens.quality import NO_RANGE, metadata_codes, run_quality
+from palmsens.range_presets import apply_range_preset
+from palmsens.mscript_estimate import estimate_script
+from palmsens.reducers import build_reducers
+from palmsens.termination import build_terminator
+from telemetry.metrics_server import METRICS
+from telemetry.tracing import current_tags, span, tags, traced
 
 # Configure logger
 LOG = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='[%(module)s] %(message)s', stream=sys.stdout)
 
 
+@dataclass(frozen=True)
+class MethodSpec:
+    """How the data of one measurement method is collected and saved."""
+    key: str            # method name as used in the experiment steps
+    title: str          # plot title
+    file_stem: str      # <file_stem>_Data_<timestamp>.csv / _Plot_<timestamp>.png
+    folder_stem: str    # <folder_stem>_csv_data / <folder_stem>_plots_png
+    x_name: str         # CSV header of the x column
+    y_name: str         # CSV header of the y column
+    x_column: int       # variable index of x in a data package
+    y_column: int       # variable index of y in a data package
+    x_label: str
+    y_label: str
+    min_vars: int = 2   # packages with fewer variables are skipped
+    # summary metrics computed while streaming: {name: (reducer type, kwargs)}
+    metrics: dict = field(default_factory=dict)
+
+    @property
+    def measures_current(self):
+        """True if y is a current, i.e. learned current-range presets apply."""
+        return _unit(self.y_label) == "A"
+
+
+# Metrics of every method; "avg" is the mean of the last 10 y values.
+_COMMON_METRICS = {
+    "avg": ("last_n_mean", {"n": 10}),
+    "y": ("min_max", {}),
+    "stats": ("welford", {}),
+}
+
+METHODS = {
+    "CHRONOAMPEROMETRY": MethodSpec(
+        "CHRONOAMPEROMETRY", "Chronoamperometry Measurement", "Chronoamperometry",
+        "chronoamperometry", "Applied time(s)", "Measured Current(A)", 0, 2,
+        "Time (s)", "Current (A)", min_vars=3,
+        metrics={**_COMMON_METRICS,
+                 "end_slope": ("windowed_slope", {"window": 20}),   # A/s
+                 "charge": ("charge_integral", {})},                # C
+    ),
+    "CYCLIC VOLTAMMETRY": MethodSpec(
+        "CYCLIC VOLTAMMETRY", "Cyclic Voltammetry", "CyclicVoltammetry",
+        "cyclic_voltammetry", "Applied Potential(V)", "Measured Current(A)", 0, 1,
+        "Potential (V)", "Current (A)",
+        metrics=dict(_COMMON_METRICS),
+    ),
+    "OPEN CIRCUIT POTENTIAL": MethodSpec(
+        "OPEN CIRCUIT POTENTIAL", "Open Circuit Potential", "OCP",
+        "ocp", "Applied time(s)", "Measured Potential(V)", 0, 1,
+        "Time (s)", "Potential (V)",
+        metrics={**_COMMON_METRICS,
+                 "end_drift": ("windowed_slope", {"window": 20})},  # V/s
+    ),
+}
+
+def _unit(label):
+    """'Time (s)' -> 's'."""
+    return label[label.find("(") + 1:label.rfind(")")] if "(" in label else ""
+
+
+# Stand-in for MScriptVar when simulated data is fed to a terminator.
+_SimVar = namedtuple("_SimVar", ["value"])
+
+
+def _simulated_data(spec):
+    if spec.key == "CHRONOAMPEROMETRY":
+        return list(range(20)), [0.001 * (i + 1) for i in range(20)]
+    if spec.key == "CYCLIC VOLTAMMETRY":
+        applied_potential = [i * 0.01 for i in range(-100, 101)]  # -1.00 .. 1.00
+        return applied_potential, [0.000001 * (0.5 * i) for i in range(len(applied_potential))]
+    applied_time = list(range(60))  # 60 s
+    return applied_time, [0.15 + i * 1e-4 for i in applied_time]
+
+
+class _CurveTracker:
+    """Splits the output lines of a script into packages and curve indexes."""
+
+    def __init__(self):
+        self.curve_index = 0
+        self.curve_length = 0
+        self.n_packages = 0
+        self.parse_ns = 0       # time spent parsing packages (for tracing)
+
+    def feed(self, line):
+        """The data package of `line` (list of `MScriptVar`), or None."""
+        # '+' = end of loop, '*' = end of measurement loop, '-' = end of scan
+        if line and line[0] in "+*-":
+            if self.curve_length:
+                self.curve_index += 1
+                self.curve_length = 0
+            return None
+        start = time.perf_counter_ns()
+        package = mscript.parse_mscript_data_package(line)
+        self.parse_ns += time.perf_counter_ns() - start
+        if package:
+            self.curve_length += 1
+            self.n_packages += 1
+        return package
+
+
+# Bound (s) for aborting a left-over script and reading up to its end.
+SYNC_TIMEOUT_S = 30.0
+
+
+def _open_comm(port, baudrate, replay_path):
+    return ReplayComm(replay_path) if replay_path else serial.Serial(port, baudrate)
+
+
+def _sync(dev):
+    """Abort whatever script the device still runs and read up to its end.
+
+    Not recorded in the capture: replays skip the sync.
+    """
+    with dev.unrecorded():
+        dev.set_deadline(SYNC_TIMEOUT_S)
+        dev.abort_and_sync()
+        dev.set_deadline(None)
+
+
+def _recover(dev, error):
+    """Leave the device idle after a failed or interrupted run, before the port closes."""
+    LOG.warning("⚠️ Run ended with %s; aborting the script on the device.", type(error).__name__)
+    try:
+        _sync(dev)
+    except Exception as e:  # the original error is the one reported
+        LOG.warning("⚠️ Could not resync the device: %s", e)
+
+
+def _send(dev, script_path, script_text, timeout_s, sync=True):
+    if sync:
+        # output of a run that was cut off earlier would be read as ours
+        _sync(dev)
+    dev_type = dev.get_device_type()
+    LOG.info("✅ Connected to device: %s", dev_type)
+
+    LOG.info("📤 Sending script: %s", script_path)
+    if isinstance(script_text, bytes):
+        dev.send_script_bytes(script_text)
+    elif script_text is not None:
+        dev.send_script_text(script_text)
+    else:
+        dev.send_script(script_path)
+    dev.set_deadline(timeout_s)
+    LOG.info("⏳ Waiting for device response...")
+    return dev_type
+
+
+def acquire(port, baudrate, script_path, on_package, terminator=None, capture_path=None,
+            replay_path=None, script_text=None, timeout_s=None):
+    """Run a MethodSCRIPT and stream its output.
+
+    Packages are parsed as they arrive and passed to
+    ``on_package(package, curve_index, t_host)``, where `t_host` is the
+    host's ``time.monotonic()`` when the line was read; nothing is kept here. If a
+    `terminator` is given, every package is also fed to it and the script is
+    aborted once it reports a stop reason; the remaining output (abort
+    acknowledgement, `on_finished:`) is still read so the device ends in a
+    clean state.
+
+    With `capture_path` the raw serial traffic is recorded (see
+    `palmsens.capture`). With `replay_path` no device is used: the recorded
+    traffic of an earlier run is fed through the same path instead. If
+    `script_text` (str, or bytes as returned by `ScriptTemplate.render`) is
+    given it is sent instead of the file at `script_path`.
+    `timeout_s` bounds the whole run (e.g. from `ScriptEstimate.timeout()`).
+    Before the script is sent, a script still running from an interrupted
+    run is aborted (`Instrument.abort_and_sync`); if this run fails or is
+    interrupted, its script is aborted the same way before the port closes.
+
+    Returns (n_packages, stop_reason, device_type).
+    """
+    live = replay_path is None
+    with _open_comm(port, baudrate, replay_path) as comm:
+        dev = instrument.Instrument(comm, capture_path=capture_path)
+        try:
+            return _stream(dev, script_path, script_text, on_package, terminator, timeout_s,
+                           live)
+        except BaseException as e:
+            if live:
+                _recover(dev, e)
+            raise
+        finally:
+            dev.close_capture()
+
+
+def _stream(dev, script_path, script_text, on_package, terminator, timeout_s, sync=True):
+    stop_reason = None
+    dev_type = _send(dev, script_path, script_text, timeout_s, sync)
+    curves = _CurveTracker()
+    with span("instrument.stream") as trace:
+        for line in dev.iter_lines():
+            received = time.monotonic()
+            package = curves.feed(line)
+            if not package:
+                continue
+            on_package(package, curves.curve_index, received)
+            if terminator is not None and stop_reason is None:
+                stop_reason = terminator.feed(package, curves.curve_index)
+                if stop_reason is not None:
+                    dev.abort()
+        trace.set(n_packages=curves.n_packages, parse_ms=curves.parse_ns / 1e6,
+                  stop_reason=stop_reason)
+    return curves.n_packages, stop_reason, dev_type
+
+
+def acquire_chain(port, baudrate, script_text, on_packages, capture_path=None,
+                  replay_path=None, timeout_s=None):
+    """Run a chained script (see `palmsens.chaining`) and stream its output.
+
+    `on_packages` holds one ``on_package(package, curve_index, t_host)`` callback
+    per step; the output is routed by the step markers and the curve index
+    starts at 0 for every step.
+
+    Returns (n_packages per step, device_type).
+    """
+    live = replay_path is None
+    with _open_comm(port, baudrate, replay_path) as comm:
+        dev = instrument.Instrument(comm, capture_path=capture_path)
+        try:
+            dev_type = _send(dev, "<chained script>", script_text, timeout_s, live)
+            curves = [_CurveTracker() for _ in on_packages]
+            with span("instrument.stream", chained=len(on_packages)) as trace:
+                for step, line in chaining.demux(dev.iter_lines()):
+                    received = time.monotonic()
+                    if not 0 <= step < len(on_packages):
+                        continue
+                    package = curves[step].feed(line)
+                    if package:
+                        on_packages[step](package, curves[step].curve_index, received)
+                trace.set(n_packages=sum(c.n_packages for c in curves),
+                          parse_ms=sum(c.parse_ns for c in curves) / 1e6)
+            return [c.n_packages for c in curves], dev_type
+        except BaseException as e:
+            if live:
+                _recover(dev, e)
+            raise
+        finally:
+            dev.close_capture()
+
+
+def _prepare_script(script_path, script_text, range_preset):
+    """Script text with the learned range preset applied, and its estimate."""
+    if range_preset is not None:
+        if script_text is None:
+            with open(script_path, encoding="ascii") as f:
+                script_text = f.read()
+        elif isinstance(script_text, bytes):
+            script_text = script_text.decode("ascii")
+        script_text = apply_range_preset(script_text, range_preset)
+        LOG.info("🎚 Using learned current range %s (%s .. %s)", *range_preset)
+
+    # Static estimate of the script: ETA, run timeout and buffer size
+    estimate = None
+    if script_text is not None or os.path.exists(script_path):
+        if script_text is None:
+            with open(script_path, encoding="ascii") as f:
+                estimate = estimate_script(f.read())
+        elif isinstance(script_text, bytes):
+            estimate = estimate_script(script_text.decode("ascii"))
+        else:
+            estimate = estimate_script(script_text)
+    return script_text, estimate
+
+
+class MethodRun:
+    """Output files, column store and streaming metrics of one method run.
+
+    A run is filled while the device streams (`on_package`, or `simulate`)
+    and then closed (`close`). The outputs are written separately
+    (`save_csv`, `save_plot`, `summarize`; `finish` does all three), so a
+    scheduler can do the file work of one run while the next one measures.
+    """
+
+    def __init__(self, spec, output_path, estimate, metrics=None, meta=None, suffix="",
+                 on_point=None):
+        self.spec = spec
+        self.on_point = on_point    # on_point(run, x, y, t_host) for live consumers
+        self.estimate = estimate
+        self.expected = estimate.n_packages if estimate else 0
+        if estimate:
+            LOG.info("⏱ %s: expected %.0f s, %d packages", spec.title, estimate.duration_s,
+                     estimate.n_packages)
+        self.reducers = build_reducers({**spec.metrics, **(metrics or {})})
+
+        # Prepare output folders
+        output_csv = os.path.join(output_path, f"{spec.folder_stem}_csv_data")
+        output_plot = os.path.join(output_path, f"{spec.folder_stem}_plots_png")
+        self.output_raw = os.path.join(output_path, f"{spec.folder_stem}_raw_data")
+        os.makedirs(output_csv, exist_ok=True)
+        os.makedirs(output_plot, exist_ok=True)
+        os.makedirs(self.output_raw, exist_ok=True)
+
+        # Timestamp
+        self.now_string = datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + suffix
+        self.csv_path = os.path.join(output_csv, f"{spec.file_stem}_Data_{self.now_string}.csv")
+        self.plot_path = os.path.join(output_plot, f"{spec.file_stem}_Plot_{self.now_string}.png")
+        self.raw_path = os.path.join(self.output_raw, f"{spec.file_stem}_Data_{self.now_string}.cols")
+        self.result = {"method": spec.key, "csv_path": self.csv_path, "raw_path": self.raw_path,
+                       "capture_path": None, "plot_path": None, "avg": None, "metrics": {},
+                       "quality": {}, "jitter": None, "n_points": 0, "stop_reason": None}
+        self.writer = ColumnWriter(
+            self.raw_path,
+            {"x": "f8", "x_status": "u1", "x_cr": "u2",
+             "y": "f8", "y_status": "u1", "y_cr": "u2",
+             "curve": "u2", "t_host": "f8"},
+            units={"x": _unit(spec.x_label), "y": _unit(spec.y_label)},
+            meta={"method": spec.key, **(meta or {}),
+                  "expected_packages": self.expected, "t_host_clock": "monotonic",
+                  "csv_headers": {"x": spec.x_name, "y": spec.y_name}},
+            chunk_rows=min(max(self.expected, 64), 4096),
+        )
+        self.store = None       # ColumnStore once closed with data
+        self.trace_tags = current_tags()    # cell/step/repeat for spans of later output work
+        self.started = None
+        self.packages = 0
+        self.next_progress = 0.1
+
+    def capture_file(self, stem=None):
+        return os.path.join(self.output_raw,
+                            f"{stem or self.spec.file_stem}_Serial_{self.now_string}.pscap")
+
+    def simulate(self, terminator=None):
+        """Fill the run with simulated data; returns the stop reason."""
+        LOG.info("⚠️ Running %s in simulation mode (no device).", self.spec.title)
+        for x, y in zip(*_simulated_data(self.spec)):
+            t_host = time.monotonic()
+            self.writer.append(x, 0, NO_RANGE, y, 0, NO_RANGE, 0, t_host)
+            self.reducers.update(x, y)
+            METRICS.inc("palmsens_points_total")
+            if self.on_point is not None:
+                self.on_point(self, x, y, t_host)
+            if terminator is not None and terminator.feed([_SimVar(x), _SimVar(y)]):
+                return terminator.stop_reason
+        return None
+
+    def on_package(self, row, curve_index, t_host=None):
+        spec = self.spec
+        if t_host is None:
+            t_host = time.monotonic()
+        if self.started is None:
+            self.started = t_host
+        self.packages += 1
+        if self.expected and self.packages >= self.next_progress * self.expected:
+            elapsed = time.monotonic() - self.started
+            LOG.info("… %s: %d/%d packages, ETA %.0f s", spec.title, self.packages,
+                     self.expected, max(self.estimate.duration_s - elapsed, 0.0))
+            self.next_progress += 0.1
+        if len(row) < spec.min_vars:
+            LOG.debug("Skipping row with %d variable(s): %s", len(row), row)
+            return
+        x_var = row[spec.x_column]
+        y_var = row[spec.y_column]
+        x = x_var.value
+        y = y_var.value
+        y_status, y_cr = metadata_codes(y_var)
+        self.writer.append(x, *metadata_codes(x_var), y, y_status, y_cr, curve_index, t_host)
+        self.reducers.update(x, y)
+        METRICS.inc("palmsens_points_total")
+        if y_status:
+            for mask, flag in mscript.METADATA_STATUS_FLAGS:
+                if y_status & mask:
+                    METRICS.inc("palmsens_flagged_points_total", flag=flag)
+        if self.on_point is not None:
+            self.on_point(self, x, y, t_host)
+
+    def close(self, stop_reason=None, error=None, has_data=True):
+        """Close the column store after acquisition."""
+        if error is not None:
+            LOG.error("❌ %s: communication error: %s", self.spec.title, str(error))
+            # keep what was streamed so far; still return the paths
+            self.writer.close(error=str(error))
+            self.result["error"] = str(error)
+            METRICS.inc("palmsens_run_errors_total")
+        elif not has_data:
+            self.writer.close()
+            LOG.error("❌ %s: no valid curves parsed from device.", self.spec.title)
+        else:
+            if stop_reason:
+                LOG.info("⏹ %s stopped early: %s", self.spec.title, stop_reason)
+            self.writer.close(stop_reason=stop_reason)
+            self.store = ColumnStore(self.raw_path)
+            self.result["stop_reason"] = stop_reason
+        return self
+
+    def save_csv(self):
+        """Write the CSV (in chunks from the column store)."""
+        if self.store is not None:
+            with tags(**self.trace_tags), span("run.csv", rows=len(self.store)):
+                self.store.to_csv(self.csv_path, ["x", "y"],
+                                  headers={"x": self.spec.x_name, "y": self.spec.y_name})
+
+    def save_plot(self):
+        """Render the PNG (figure API only, so it may run off the main thread)."""
+        if self.store is None:
+            return
+        with tags(**self.trace_tags), span("run.png"):
+            self._plot()
+        self.result["plot_path"] = self.plot_path
+
+    def _plot(self):
+        spec = self.spec
+        fig = Figure()
+        ax = fig.subplots()
+        # at most a few points per pass through each pixel column: the trace
+        # looks the same as with every point, and Agg time and PNG size stay
+        # flat; the limits come from all points, before they are reduced
+        x, y = self.store["x"], self.store["y"]
+        decimate.fit_view(ax, x, y)
+        x, y = decimate.for_axes(ax, x, y)
+        ax.plot(x, y, label=spec.y_label)
+        ax.set_xlabel(spec.x_label)
+        ax.set_ylabel(spec.y_label)
+        ax.set_title(spec.title)
+        ax.grid(True)
+        fig.savefig(self.plot_path)
+
+    def summarize(self):
+        """Metrics (computed while streaming) and metadata summary; returns the result."""
+        if self.store is None:
+            return self.result
+        spec = self.spec
+        values = self.reducers.values()
+        avg = values.get("avg")
+        if avg is not None:
+            LOG.info("📊 %s avg of last 10 values: %.6e", spec.title, avg)
+
+        # --- Per-point status / range metadata ---
+        quality = run_quality(self.store)
+        if quality["overload_fraction"] or quality["timing_errors"]:
+            LOG.warning("⚠️ %s: %.1f%% overloaded points, %d timing error(s)", spec.title,
+                        100 * quality["overload_fraction"], quality["timing_errors"])
+
+        # --- Host arrival timing (stalls delaying the serial reads) ---
+        timing = jitter_report(self.store)
+        if timing and timing["timing_errors_after_stall"]:
+            LOG.warning("⚠️ %s: %d timing error(s) after host stalls (%.2f s stalled)", spec.title,
+                        timing["timing_errors_after_stall"], timing["stall_s"])
+
+        self.result.update(avg=avg, metrics=values, quality=quality, jitter=timing,
+                           n_points=len(self.store))
+        return self.result
+
+    def finish(self):
+        """Save CSV and plot and summarize; returns the result dict."""
+        self.save_csv()
+        self.save_plot()
+        return self.summarize()
+
+
+def measure_method(
+    method: str,
+    port: str = "COM5",
+    baudrate: int = 1,
+    script_path: str = "",
+    output_path: str = "output",
+    simulate: bool = False,
+    terminator=None,
+    metrics: dict | None = None,
+    capture: bool = False,
+    replay_path: str | None = None,
+    range_preset=None,
+    script_text: str | bytes | None = None,
+    script_params: dict | None = None,
+    on_point=None,
+) -> MethodRun:
+    """The acquisition part of `run_method`: returns the closed `MethodRun`
+    without writing CSV and plot."""
+    with span("run.acquire", method=method.strip().upper()):
+        return _measure_method(method, port, baudrate, script_path, output_path, simulate,
+                               terminator, metrics, capture, replay_path, range_preset,
+                               script_text, script_params, on_point)
+
+
+def _measure_method(method, port, baudrate, script_path, output_path, simulate, terminator,
+                    metrics, capture, replay_path, range_preset, script_text, script_params,
+                    on_point):
+    spec = METHODS[method.strip().upper()]
+    if isinstance(terminator, dict):
+        terminator = build_terminator(terminator)
+    if simulate or replay_path or not spec.measures_current:
+        range_preset = None
+    script_text, estimate = _prepare_script(script_path, script_text, range_preset)
+    run = MethodRun(spec, output_path, estimate, metrics, meta={
+        "script": script_path, "script_params": script_params, "simulated": simulate,
+        "replay_of": replay_path, "range_preset": list(range_preset) if range_preset else None,
+    }, on_point=on_point)
+
+    # --- SIMULATION MODE ---
+    if simulate and not replay_path:
+        return run.close(run.simulate(terminator))
+
+    # --- REAL DEVICE (or REPLAY) MODE ---
+    capture_path = run.capture_file() if capture and not replay_path else None
+    run.result["capture_path"] = capture_path
+    LOG.info("🔌 Connecting to PalmSens on %s", port)
+    try:
+        n_packages, stop_reason, device_type = acquire(
+            port, baudrate, script_path, run.on_package, terminator,
+            capture_path=capture_path, replay_path=replay_path, script_text=script_text,
+            timeout_s=estimate.timeout() if estimate and not replay_path else None,
+        )
+    except Exception as e:
+        return run.close(error=e)
+    run.writer.meta["device_type"] = device_type
+    METRICS.set("palmsens_device_info", 1, device_type=device_type, port=port)
+    return run.close(stop_reason, has_data=bool(n_packages))
+
+
+def run_method(
+    method: str,
+    port: str = "COM5",
+    baudrate: int = 1,
+    script_path: str = "",
+    output_path: str = "output",
+    simulate: bool = False,
+    terminator=None,
+    metrics: dict | None = None,
+    capture: bool = False,
+    replay_path: str | None = None,
+    range_preset=None,
+    script_text: str | bytes | None = None,
+    script_params: dict | None = None,
+    on_point=None,
+) -> dict:
+    """
+    Run one measurement method on a PalmSens device (or simulate it).
+    - Streams the MethodSCRIPT output, optionally stopping early (`terminator`,
+      an `AdaptiveTerminator` or a `build_terminator` config dict)
+    - Computes the method's summary metrics while streaming (`metrics` adds
+      to or overrides the declared ones, see `palmsens.reducers`)
+    - Appends the points to an on-disk column store while streaming, so
+      memory stays bounded and a crash leaves the data up to the last chunk
+      (see `palmsens.columnstore`)
+    - Optionally records the raw serial traffic (`capture`, saved as
+      <method>_raw_data/*.pscap) or, instead of a device, replays an earlier
+      recording (`replay_path`) to reprocess a historical run
+    - Sends `script_text` (e.g. a rendered `palmsens.templates` template;
+      `script_params` are only recorded) instead of the file at `script_path`
+    - Optionally narrows the current range window of the script with a
+      learned `range_preset` (see `palmsens.range_presets`; ignored for
+      methods that do not measure a current, e.g. OCP)
+    - Calls ``on_point(run, x, y, t_host)`` for every stored point, e.g. to
+      feed a live view or forward the data to another process
+    - Saves CSV (written in chunks from the column store) and PNG
+    - Keeps the status flags and current range of every point as metadata
+      columns and summarizes them (see `palmsens.quality`)
+    - Stamps every point with its host arrival time (``t_host`` column) and
+      reports gaps, latency and host stalls (see `palmsens.jitter`)
+    - Returns a dict with csv_path, raw_path, plot_path, avg (mean of the
+      last 10 y values or None), metrics, quality, jitter, n_points and stop_reason
+      (None if the script ran to its end)
+    """
+    return measure_method(
+        method, port, baudrate, script_path, output_path, simulate, terminator, metrics,
+        capture, replay_path, range_preset, script_text, script_params, on_point,
+    ).finish()
+
+
+@traced("run.acquire_chain")
+def measure_chain(
+    steps: list,
+    port: str = "COM5",
+    baudrate: int = 1,
+    output_path: str = "output",
+    simulate: bool = False,
+    capture: bool = False,
+    replay_path: str | None = None,
+    on_point=None,
+) -> list:
+    """The acquisition part of `run_chain`: returns the closed `MethodRun` of
+    every step without writing CSV and plots."""
+    texts, runs = [], []
+    for step in steps:
+        spec = METHODS[step["method"].strip().upper()]
+        range_preset = step.get("range_preset")
+        if simulate or replay_path or not spec.measures_current:
+            range_preset = None
+        text, estimate = _prepare_script(step["script_path"], step.get("script_text"), range_preset)
+        if text is None:
+            with open(step["script_path"], encoding="ascii") as f:
+                text = f.read()
+        texts.append(text.decode("ascii") if isinstance(text, bytes) else text)
+        runs.append(MethodRun(spec, output_path, estimate, step.get("metrics"), meta={
+            "script": step["script_path"], "script_params": step.get("script_params"),
+            "simulated": simulate, "replay_of": replay_path,
+            "range_preset": list(range_preset) if range_preset else None,
+            "chain": [s["method"] for s in steps], "chain_step": len(runs) + 1,
+        }, suffix=f"_step{len(runs) + 1}", on_point=on_point))
+
+    if simulate and not replay_path:
+        return [run.close(run.simulate()) for run in runs]
+
+    script = chaining.chain_scripts(texts)
+    estimate = estimate_script(script)
+    LOG.info("⛓ Chaining %d steps: expected %.0f s", len(runs), estimate.duration_s)
+    capture_path = runs[0].capture_file("Chain") if capture and not replay_path else None
+    for run in runs:
+        run.result["capture_path"] = capture_path
+    LOG.info("🔌 Connecting to PalmSens on %s", port)
+    try:
+        counts, device_type = acquire_chain(
+            port, baudrate, script, [run.on_package for run in runs],
+            capture_path=capture_path, replay_path=replay_path,
+            timeout_s=estimate.timeout() if not replay_path else None,
+        )
+    except Exception as e:
+        return [run.close(error=e) for run in runs]
+    METRICS.set("palmsens_device_info", 1, device_type=device_type, port=port)
+    for run, n_packages in zip(runs, counts):
+        run.writer.meta["device_type"] = device_type
+        run.close(has_data=bool(n_packages))
+    return runs
+
+
+def run_chain(
+    steps: list,
+    port: str = "COM5",
+    baudrate: int = 1,
+    output_path: str = "output",
+    simulate: bool = False,
+    capture: bool = False,
+    replay_path: str | None = None,
+    on_point=None,
+) -> list:
+    """
+    Run several methods as one chained MethodSCRIPT (see `palmsens.chaining`).
+    - `steps` is a list of dicts with "method", "script_path" and optionally
+      "script_text", "script_params", "range_preset" and "metrics" (as for
+      `run_method`); `on_point` is called for the points of every step
+    - The scripts are merged into one upload with step markers; the output
+      is split back per step while streaming
+    - Early termination is not available: aborting would end the whole chain
+    - A capture (`capture`) covers the whole chain and is saved next to the
+      first step's data as Chain_Serial_<timestamp>.pscap
+    - Returns one `run_method` style result dict per step
+    """
+    runs = measure_chain(steps, port, baudrate, output_path, simulate, capture, replay_path,
+                         on_point)
+    return [run.finish() for run in runs]
+
+
 def run_chronoamperometry(
     port: str = "COM5",
     baudrate: int = 1,
     script_path: str = "scripts/Script_Chronoamperometry.mscr",
     output_path: str = "output/Chronoamperometry_measurement",
-    simulate: bool = False
+    simulate: bool = False,
+    terminator=None,
 ) -> tuple[str, float | None]:
     """
     Run a chronoamperometry experiment using a PalmSens device or simulate data.
@@ -139,164 +792,26 @@ def run_chronoamperometry(
         - CSV file path
         - Average current of last 10 values (if available)
     """
+    result = run_method("Chronoamperometry", port, baudrate, script_path, output_path,
+                        simulate, terminator)
+    return result["csv_path"], result["avg"]
 
-    # Prepare output folders
-    output_csv = os.path.join(output_path, "chronoamperometry_csv_data")
-    output_plot = os.path.join(output_path, "chronoamperometry_plots_png")
-    os.makedirs(output_csv, exist_ok=True)
-    os.makedirs(output_plot, exist_ok=True)
-
-    # Timestamp
-    now = datetime.datetime.now()
-    now_string = now.strftime('%Y%m%d-%H%M%S')
-    csv_file_path = os.path.join(output_csv, f"Chronoamperometry_Data_{now_string}.csv")
-    plot_file_path = os.path.join(output_plot, f"Chronoamperometry_Plot_{now_string}.png")
-
-    # --- SIMULATION MODE ---
-    if simulate:
-        LOG.info("⚠️ Running in simulation mode (no device).")
-        applied_time = list(range(20))
-        measured_current = [0.001 * (i + 1) for i in range(20)]
-
-    # --- REAL DEVICE MODE ---
-    else:
-        LOG.info("🔌 Connecting to PalmSens on %s", port)
-        try:
-            with serial.Serial(port, baudrate) as comm:
-                dev = instrument.Instrument(comm)
-                dev_type = dev.get_device_type()
-                LOG.info("✅ Connected to device: %s", dev_type)
 
-                LOG.info("📤 Sending script: %s", script_path)
-                dev.send_script(script_path)
-
-                LOG.info("⏳ Waiting for device response...")
-                result_lines = dev.readlines_until_end()
-        except Exception as e:
-            LOG.error("❌ Failed to communicate with PalmSens: %s", str(e))
-            return csv_file_path, None
-
-        curves = mscript.parse_result_lines(result_lines)
-        if not curves:
-            LOG.error("❌ No valid curves parsed from device.")
-            return csv_file_path, None
-
-        applied_time = []
-        measured_current = []
-
-        for curve in curves:
-            for row in curve:
-                if len(row) >= 3:
-                    applied_time.append(row[0].value)
-                    measured_current.append(row[2].value)
-                else:
-                    LOG.warning("⚠️ Skipping incomplete row: %s", row)
-
-    # --- Save CSV ---
-    df = pd.DataFrame({
-        "Applied time(s)": applied_time,
-        "Measured Current(A)": measured_current
-    })
-    df.to_csv(csv_file_path, index=False)
-
-    # --- Save Plot ---
-    plt.figure()
-    plt.plot(applied_time, measured_current, label="Current (A)")
-    plt.xlabel("Time (s)")
-    plt.ylabel("Current (A)")
-    plt.title("Chronoamperometry Measurement")
-    plt.grid(True)
-    plt.savefig(plot_file_path)
-    plt.close()
-
-    # --- Compute Average ---
-    avg_current = None
-    if len(df) >= 10:
-        avg_current = df["Measured Current(A)"].tail(10).mean()
-        LOG.info("📊 Average of last 10 current values: %.4e A", avg_current)
-
-    return csv_file_path, avg_current
 def run_cyclic_voltammetry(
     port: str = "COM5",
     baudrate: int = 1,
     script_path: str = "scripts/Script_CyclicVoltammetry.mscr",
     output_path: str = "output/CyclicVoltammetry_measurement",
-    simulate: bool = False
+    simulate: bool = False,
+    terminator=None,
 ) -> tuple[str, float | None]:
     """
     Run a cyclic voltammetry experiment (PalmSens or simulate).
     Saves CSV + PNG. Returns (csv_path, avg_current_last_10 or None).
     """
-    # Prepare output folders (uniform with CA)
-    output_csv = os.path.join(output_path, "cyclic_voltammetry_csv_data")
-    output_plot = os.path.join(output_path, "cyclic_voltammetry_plots_png")
-    os.makedirs(output_csv, exist_ok=True)
-    os.makedirs(output_plot, exist_ok=True)
-
-    # Timestamped filenames
-    now = datetime.datetime.now()
-    now_string = now.strftime('%Y%m%d-%H%M%S')
-    csv_file_path = os.path.join(output_csv, f"CyclicVoltammetry_Data_{now_string}.csv")
-    plot_file_path = os.path.join(output_plot, f"CyclicVoltammetry_Plot_{now_string}.png")
-
-    # --- SIMULATION ---
-    if simulate:
-        LOG.info("⚠️ Running CV in simulation mode (no device).")
-        applied_potential = [i * 0.01 for i in range(-100, 101)]  # -1.00 .. 1.00
-        measured_current  = [0.000001 * (0.5*i) for i in range(len(applied_potential))]
-
-    # --- REAL DEVICE ---
-    else:
-        LOG.info("🔌 Connecting to PalmSens on %s", port)
-        try:
-            with serial.Serial(port, baudrate) as comm:
-                dev = instrument.Instrument(comm)
-                dev_type = dev.get_device_type()
-                LOG.info("✅ Connected to device: %s", dev_type)
-
-                LOG.info("📤 Sending script: %s", script_path)
-                dev.send_script(script_path)
-
-                LOG.info("⏳ Waiting for device response...")
-                result_lines = dev.readlines_until_end()
-        except Exception as e:
-            LOG.error("❌ CV: communication error: %s", str(e))
-            # still return a path so caller can see where it tried to write
-            return csv_file_path, None
-
-        curves = mscript.parse_result_lines(result_lines)
-        if not curves:
-            LOG.error("❌ CV: no valid curves parsed from device.")
-            return csv_file_path, None
-
-        # column 0 = E (V), column 1 = I (A) for CV
-        applied_potential = mscript.get_values_by_column(curves, 0)
-        measured_current  = mscript.get_values_by_column(curves, 1)
-
-    # --- Save CSV (uniform headers) ---
-    df = pd.DataFrame({
-        "Applied Potential(V)": applied_potential,
-        "Measured Current(A)":  measured_current
-    })
-    df.to_csv(csv_file_path, index=False)
-
-    # --- Save Plot (uniform style) ---
-    plt.figure()
-    plt.plot(applied_potential, measured_current, label="Current (A)")
-    plt.xlabel("Potential (V)")
-    plt.ylabel("Current (A)")
-    plt.title("Cyclic Voltammetry")
-    plt.grid(True)
-    plt.savefig(plot_file_path)
-    plt.close()
-
-    # --- Metric: average of last 10 current values (uniform with CA) ---
-    avg_current = None
-    if len(df) >= 10:
-        avg_current = df["Measured Current(A)"].tail(10).mean()
-        LOG.info("📊 CV avg of last 10 current values: %.4e A", avg_current)
-
-    return csv_file_path, avg_current
+    result = run_method("Cyclic Voltammetry", port, baudrate, script_path, output_path,
+                        simulate, terminator)
+    return result["csv_path"], result["avg"]
 
 
 def run_ocp(
@@ -304,78 +819,13 @@ def run_ocp(
     baudrate: int = 1,
     script_path: str = "scripts/Script_OCP.mscr",
     output_path: str = "output/OCP_measurement",
-    simulate: bool = False
+    simulate: bool = False,
+    terminator=None,
 ) -> tuple[str, float | None]:
     """
     Run an open-circuit potential experiment (PalmSens or simulate).
     Saves CSV + PNG. Returns (csv_path, avg_potential_last_10 or None).
     """
-    # Prepare output folders (uniform with CA)
-    output_csv = os.path.join(output_path, "ocp_csv_data")
-    output_plot = os.path.join(output_path, "ocp_plots_png")
-    os.makedirs(output_csv, exist_ok=True)
-    os.makedirs(output_plot, exist_ok=True)
-
-    # Timestamped filenames
-    now = datetime.datetime.now()
-    now_string = now.strftime('%Y%m%d-%H%M%S')
-    csv_file_path = os.path.join(output_csv, f"OCP_Data_{now_string}.csv")
-    plot_file_path = os.path.join(output_plot, f"OCP_Plot_{now_string}.png")
-
-    # --- SIMULATION ---
-    if simulate:
-        LOG.info("⚠️ Running OCP in simulation mode (no device).")
-        applied_time       = list(range(60))              # 60 s
-        measured_potential = [0.15 + i*1e-4 for i in applied_time]
-
-    # --- REAL DEVICE ---
-    else:
-        LOG.info("🔌 Connecting to PalmSens on %s", port)
-        try:
-            with serial.Serial(port, baudrate) as comm:
-                dev = instrument.Instrument(comm)
-                dev_type = dev.get_device_type()
-                LOG.info("✅ Connected to device: %s", dev_type)
-
-                LOG.info("📤 Sending script: %s", script_path)
-                dev.send_script(script_path)
-
-                LOG.info("⏳ Waiting for device response...")
-                result_lines = dev.readlines_until_end()
-        except Exception as e:
-            LOG.error("❌ OCP: communication error: %s", str(e))
-            return csv_file_path, None
-
-        curves = mscript.parse_result_lines(result_lines)
-        if not curves:
-            LOG.error("❌ OCP: no valid curves parsed from device.")
-            return csv_file_path, None
-
-        # column 0 = time (s), column 1 = potential (V) for OCP
-        applied_time       = mscript.get_values_by_column(curves, 0)
-        measured_potential = mscript.get_values_by_column(curves, 1)
-
-    # --- Save CSV (uniform headers) ---
-    df = pd.DataFrame({
-        "Applied time(s)":        applied_time,
-        "Measured Potential(V)":  measured_potential
-    })
-    df.to_csv(csv_file_path, index=False)
-
-    # --- Save Plot (uniform style) ---
-    plt.figure()
-    plt.plot(applied_time, measured_potential, label="Potential (V)")
-    plt.xlabel("Time (s)")
-    plt.ylabel("Potential (V)")
-    plt.title("Open Circuit Potential")
-    plt.grid(True)
-    plt.savefig(plot_file_path)
-    plt.close()
-
-    # --- Metric: average of last 10 potential values (uniform metric) ---
-    avg_potential = None
-    if len(df) >= 10:
-        avg_potential = df["Measured Potential(V)"].tail(10).mean()
-        LOG.info("📊 OCP avg of last 10 potential values: %.6f V", avg_potential)
-
-    return csv_file_path, avg_potential
+    result = run_method("Open Circuit Potential", port, baudrate, script_path, output_path,
+                        simulate, terminator)
+    return result["csv_path"], result["avg"]
@@ -0,0 +1,96 @@
+"""
+Data quality queries on per-point metadata columns.
+
+Every value column ``<name>`` of a column store (see `palmsens.columnstore`)
+has two metadata columns next to it:
+
+    ``<name>_status``  uint8   status flags of the point (see
+                               `mscript.METADATA_STATUS_FLAGS`)
+    ``<name>_cr``      uint16  current (or potential) range index,
+                               `NO_RANGE` if the device did not report one
+
+The queries below are vectorized over the memory-mapped columns, so a whole
+campaign directory can be scanned without parsing any CSV.
+"""
+import glob
+import os
+
+import numpy as np
+
+from palmsens.columnstore import ColumnStore
+from palmsens.mscript import METADATA_STATUS_FLAGS
+
+NO_RANGE = 0xFFFF
+
+STATUS = {name: mask for mask, name in METADATA_STATUS_FLAGS}
+
+
+def metadata_codes(var):
+    """(status, cr) of an `MScriptVar` as stored in the metadata columns."""
+    metadata = var.metadata
+    return metadata.get('status', 0), metadata.get('cr', NO_RANGE)
+
+
+def flag_fraction(store, flag, column='y'):
+    """Fraction of rows of `column` that have status `flag` (e.g. 'OVERLOAD')."""
+    status_column = f'{column}_status'
+    if len(store) == 0 or status_column not in store:
+        return 0.0
+    return float(np.count_nonzero(store[status_column] & STATUS[flag])) / len(store)
+
+
+def flag_counts(store, column='y'):
+    """Number of rows of `column` per status flag."""
+    status_column = f'{column}_status'
+    if len(store) == 0 or status_column not in store:
+        return {name: 0 for name in STATUS}
+    status = np.asarray(store[status_column])
+    return {name: int(np.count_nonzero(status & mask)) for name, mask in STATUS.items()}
+
+
+def range_histogram(store, column='y'):
+    """{range index: row count} of `column`, without `NO_RANGE`."""
+    cr_column = f'{column}_cr'
+    if len(store) == 0 or cr_column not in store:
+        return {}
+    ranges, counts = np.unique(np.asarray(store[cr_column]), return_counts=True)
+    return {int(r): int(c) for r, c in zip(ranges, counts) if r != NO_RANGE}
+
+
+def run_quality(store, column='y'):
+    """Summary of the metadata of one run."""
+    counts = flag_counts(store, column)
+    n = len(store)
+    return {
+        'n_points': n,
+        'overload_fraction': counts['OVERLOAD'] / n if n else 0.0,
+        'underload_fraction': counts['UNDERLOAD'] / n if n else 0.0,
+        'timing_errors': counts['TIMING_ERROR'],
+        'ranges': range_histogram(store, column),
+    }
+
+
+def find_stores(root):
+    """All column stores below `root`."""
+    return sorted(glob.glob(os.path.join(root, '**', '*.cols'), recursive=True))
+
+
+def scan_campaign(root, column='y'):
+    """`run_quality` of every run below `root`, with path and method."""
+    rows = []
+    for path in find_stores(root):
+        store = ColumnStore(path)
+        rows.append({'path': path, 'method': store.meta.get('method'),
+                     'complete': store.complete, **run_quality(store, column)})
+    return rows
+
+
+def runs_with_timing_errors(root, column='y'):
+    """Paths of the runs below `root` with at least one TIMING_ERROR point."""
+    return [row['path'] for row in scan_campaign(root, column) if row['timing_errors']]
+
+
+def overloaded_runs(root, min_fraction=0.0, column='y'):
+    """(path, overload fraction) of runs whose overload fraction exceeds `min_fraction`."""
+    return [(row['path'], row['overload_fraction']) for row in scan_campaign(root, column)
+            if row['overload_fraction'] > min_fraction]
@@ -0,0 +1,148 @@
+"""
+Learned current-range presets.
+
+The scripts use wide autoranging windows (e.g. ``set_autoranging ba 10n 10u``)
+and the device spends the first points of a run hunting for the right range.
+The current range of every point is kept in the ``y_cr`` metadata column of
+the column store (see `palmsens.quality`), so earlier runs of the same cell
+and method tell which ranges the signal actually needs. `mine_range_preset`
+turns that history into a narrower window (one range of margin on both
+sides, starting in the highest range used) and `apply_range_preset` rewrites
+the ``set_range ba`` / ``set_autoranging ba`` lines of a script with it.
+
+If any of the recent runs shows overload or underload flags, no preset is
+returned and the script keeps its original wide window; the next runs then
+produce fresh history to learn from.
+"""
+import collections
+import glob
+import logging
+import os
+import re
+
+import numpy as np
+
+from palmsens.columnstore import ColumnStore
+from palmsens.mscript import MSCRIPT_CURRENT_RANGES_EMSTAT4, MSCRIPT_CURRENT_RANGES_EMSTAT_PICO
+from palmsens.quality import NO_RANGE, STATUS
+
+LOG = logging.getLogger(__name__)
+
+RangePreset = collections.namedtuple('RangePreset', ['initial', 'low', 'high'])
+
+_UNIT_FACTOR = {'pA': 1e-12, 'nA': 1e-9, 'uA': 1e-6, 'mA': 1e-3, 'A': 1.0}
+_MSCRIPT_PREFIXES = [('a', 1e-18), ('f', 1e-15), ('p', 1e-12), ('n', 1e-9), ('u', 1e-6),
+                     ('m', 1e-3), ('', 1.0)]
+_RANGE_LINE = re.compile(r'^(\s*)(set_range|set_autoranging)\s+ba\b')
+
+
+def _range_table(device_type):
+    if device_type == 'EmStat Pico':
+        return MSCRIPT_CURRENT_RANGES_EMSTAT_PICO
+    if device_type and 'EmStat4' in device_type:
+        return MSCRIPT_CURRENT_RANGES_EMSTAT4
+    return {}
+
+
+def range_current(device_type, cr):
+    """Full-scale current (A) of range index `cr`, or None if unknown."""
+    text = _range_table(device_type).get(cr)
+    if text is None:
+        return None
+    value, unit = text.split()[:2]
+    return float(value) * _UNIT_FACTOR[unit]
+
+
+def _range_family(device_type, cr):
+    """Ranges of the same kind as `cr` (normal / high speed), sorted by current."""
+    high_speed = cr >= 128
+    ranges = [(range_current(device_type, index), index) for index in _range_table(device_type)
+              if (index >= 128) == high_speed]
+    return [index for _, index in sorted(ranges)]
+
+
+def format_current(amps):
+    """MethodSCRIPT literal of a current, e.g. 1e-07 -> '100n'."""
+    for prefix, factor in reversed(_MSCRIPT_PREFIXES):
+        mantissa = amps / factor
+        if mantissa >= 1 and abs(mantissa - round(mantissa)) < 1e-6 * mantissa:
+            return f'{int(round(mantissa))}{prefix}'
+    for prefix, factor in _MSCRIPT_PREFIXES:
+        if amps / factor < 1000:
+            return f'{int(round(amps / factor))}{prefix}'
+    return f'{amps:g}'
+
+
+def find_cell_stores(cell_dir, method, history=5):
+    """The `history` most recent complete column stores of `method` below `cell_dir`."""
+    stores = []
+    for path in glob.glob(os.path.join(cell_dir, '**', '*.cols'), recursive=True):
+        try:
+            store = ColumnStore(path)
+        except (OSError, ValueError):
+            continue
+        if store.complete and store.meta.get('method') == method and len(store):
+            stores.append((os.path.getmtime(path), store))
+    stores.sort(key=lambda item: item[0])
+    return [store for _, store in stores[-history:]]
+
+
+def mine_range_preset(stores, settle_points=5, margin=1):
+    """Derive a `RangePreset` from earlier runs, or None to keep the wide window.
+
+    The first `settle_points` of every run (while the device is still
+    autoranging from the script's initial range) are ignored, and so are runs
+    whose y is not a current (e.g. OCP: its ranges are potential ranges).
+    """
+    used = set()
+    device_type = None
+    for store in stores:
+        if 'y_cr' not in store or store.units.get('y') != 'A':
+            continue
+        status = np.asarray(store['y_status'])
+        if np.any(status & (STATUS['OVERLOAD'] | STATUS['UNDERLOAD'])):
+            LOG.info('Overload/underload in %s, keeping the wide range window.', store.path)
+            return None
+        device_type = device_type or store.meta.get('device_type')
+        cr = np.asarray(store['y_cr'][settle_points:])
+        used.update(int(r) for r in np.unique(cr) if r != NO_RANGE)
+    if not used or not device_type:
+        return None
+    family = _range_family(device_type, max(used))
+    indexes = [family.index(cr) for cr in used if cr in family]
+    if not indexes:
+        return None
+    low = family[max(min(indexes) - margin, 0)]
+    high = family[min(max(indexes) + margin, len(family) - 1)]
+    top = family[max(indexes)]
+    return RangePreset(
+        initial=format_current(range_current(device_type, top)),
+        low=format_current(range_current(device_type, low)),
+        high=format_current(range_current(device_type, high)),
+    )
+
+
+def apply_range_preset(script_text, preset):
+    """Rewrite the current range lines of the first current measurement.
+
+    The last ``set_range ba`` and ``set_autoranging ba`` lines before the
+    first ``meas_loop_*`` that is not an OCP loop are replaced.
+    """
+    lines = script_text.splitlines(keepends=True)
+    end = next((i for i, line in enumerate(lines)
+                if line.strip().startswith('meas_loop_') and not line.strip().startswith('meas_loop_ocp')),
+               len(lines))
+    replaced = set()
+    for i in range(end - 1, -1, -1):
+        match = _RANGE_LINE.match(lines[i])
+        if not match or match.group(2) in replaced:
+            continue
+        indent, command = match.groups()
+        if command == 'set_range':
+            lines[i] = f'{indent}set_range ba {preset.initial}\n'
+        else:
+            lines[i] = f'{indent}set_autoranging ba {preset.low} {preset.high}\n'
+        replaced.add(command)
+        if len(replaced) == 2:
+            break
+    return ''.join(lines)
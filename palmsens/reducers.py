@@ -0,0 +1,198 @@
+"""
+Streaming reducers for per-run summary metrics.
+
+A reducer is fed one (x, y) point at a time while the data packages stream
+in and keeps only O(1) state (or a fixed-size window), so summary metrics do
+not require the full arrays to be kept or re-read from CSV:
+    - `LastNMean`: mean of the last n values of y,
+    - `MinMax`: running minimum and maximum of y,
+    - `Welford`: running mean / standard deviation of y,
+    - `WindowedSlope`: least-squares dy/dx over the last n points,
+    - `ChargeIntegral`: trapezoidal integral of y over x (charge for I(t)),
+    - `TimeToThreshold`: first x at which y crosses a threshold.
+
+Metrics are declared as ``{name: (reducer type, kwargs)}`` and built with
+`build_reducers`, e.g. ``{"charge": ("charge_integral", {})}``.
+"""
+import collections
+import math
+
+
+class Reducer:
+    """Base class; `update` is called once per point, `value` at any time."""
+
+    def update(self, x, y):
+        raise NotImplementedError
+
+    def value(self):
+        raise NotImplementedError
+
+
+class LastNMean(Reducer):
+    """Mean of the last `n` values (of all of them while fewer; None if none)."""
+
+    def __init__(self, n=10):
+        self._values = collections.deque(maxlen=n)
+
+    def update(self, x, y):
+        self._values.append(y)
+
+    def value(self):
+        if not self._values:
+            return None
+        return sum(self._values) / len(self._values)
+
+
+class MinMax(Reducer):
+    def __init__(self):
+        self.min = None
+        self.max = None
+
+    def update(self, x, y):
+        if self.min is None or y < self.min:
+            self.min = y
+        if self.max is None or y > self.max:
+            self.max = y
+
+    def value(self):
+        return {"min": self.min, "max": self.max}
+
+
+class Welford(Reducer):
+    """Numerically stable running mean and (sample) standard deviation."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, x, y):
+        self.count += 1
+        delta = y - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (y - self.mean)
+
+    def value(self):
+        if self.count == 0:
+            return {"mean": None, "std": None, "count": 0}
+        std = math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+        return {"mean": self.mean, "std": std, "count": self.count}
+
+
+class WindowedSlope(Reducer):
+    """Least-squares slope dy/dx over the last `window` points.
+
+    Running sums are updated on entry and exit of the window, so each update
+    is O(1). x is taken relative to the first point to limit cancellation.
+    """
+
+    def __init__(self, window=20):
+        self._points = collections.deque()
+        self.window = window
+        self._x0 = None
+        self._sx = self._sy = self._sxx = self._sxy = 0.0
+
+    def update(self, x, y):
+        if self._x0 is None:
+            self._x0 = x
+        x = x - self._x0
+        self._points.append((x, y))
+        self._sx += x
+        self._sy += y
+        self._sxx += x * x
+        self._sxy += x * y
+        if len(self._points) > self.window:
+            ox, oy = self._points.popleft()
+            self._sx -= ox
+            self._sy -= oy
+            self._sxx -= ox * ox
+            self._sxy -= ox * oy
+
+    def value(self):
+        n = len(self._points)
+        if n < 2:
+            return None
+        denom = n * self._sxx - self._sx * self._sx
+        if denom == 0:
+            return None
+        return (n * self._sxy - self._sx * self._sy) / denom
+
+
+class ChargeIntegral(Reducer):
+    """Trapezoidal integral of y dx (e.g. charge in C from current in A over s)."""
+
+    def __init__(self):
+        self.total = 0.0
+        self._last = None
+
+    def update(self, x, y):
+        if self._last is not None:
+            lx, ly = self._last
+            self.total += 0.5 * (y + ly) * (x - lx)
+        self._last = (x, y)
+
+    def value(self):
+        return self.total
+
+
+class TimeToThreshold(Reducer):
+    """First x at which y falls below (or rises above) `threshold`, else None."""
+
+    def __init__(self, threshold, direction="below"):
+        if direction not in ("below", "above"):
+            raise ValueError(f"direction must be 'below' or 'above', not {direction!r}")
+        self.threshold = threshold
+        self.direction = direction
+        self.x = None
+
+    def update(self, x, y):
+        if self.x is not None:
+            return
+        if (y <= self.threshold) if self.direction == "below" else (y >= self.threshold):
+            self.x = x
+
+    def value(self):
+        return self.x
+
+
+REDUCER_TYPES = {
+    "last_n_mean": LastNMean,
+    "min_max": MinMax,
+    "welford": Welford,
+    "windowed_slope": WindowedSlope,
+    "charge_integral": ChargeIntegral,
+    "time_to_threshold": TimeToThreshold,
+}
+
+
+class ReducerSet:
+    """Named reducers fed together; `values` flattens dict results to name_key."""
+
+    def __init__(self, reducers):
+        self.reducers = dict(reducers)
+
+    def update(self, x, y):
+        if math.isnan(x) or math.isnan(y):
+            return
+        for reducer in self.reducers.values():
+            reducer.update(x, y)
+
+    def values(self):
+        out = {}
+        for name, reducer in self.reducers.items():
+            value = reducer.value()
+            if isinstance(value, dict):
+                out.update({f"{name}_{key}": v for key, v in value.items()})
+            else:
+                out[name] = value
+        return out
+
+
+def build_reducers(metrics):
+    """Build a `ReducerSet` from ``{name: (type, kwargs)}`` declarations."""
+    reducers = {}
+    for name, (kind, kwargs) in metrics.items():
+        if kind not in REDUCER_TYPES:
+            raise ValueError(f"Unknown reducer type {kind!r} for metric {name!r}")
+        reducers[name] = REDUCER_TYPES[kind](**(kwargs or {}))
+    return ReducerSet(reducers)
@@ -0,0 +1,204 @@
+"""
+Shared-memory ring buffer of decoded float64 columns.
+
+One producer (the acquisition thread or process) appends rows; any number
+of viewers, in the same or other processes, attach by name and read the
+latest window without pickling, locks or slowing the producer::
+
+    ring = RingBuffer.create(("x", "y", "t_host"), capacity=1 << 20, name="rig1_live")
+    run_method(..., on_point=ring.on_point)
+
+    # elsewhere (e.g. another kernel)
+    view = RingBuffer.attach("rig1_live")
+    seq, cols = view.latest(5000)
+
+Layout of the shared block: an int64 header (magic, capacity, number of
+columns, sequence, generation, generation start), the column names as JSON, then one float64
+array per column. The *sequence* counts all rows ever appended; row ``s``
+lives in slot ``s % capacity``. The producer writes a row first and bumps
+the sequence after, so rows below the sequence are complete. A reader
+copies its window, re-reads the sequence and keeps only rows the producer
+cannot have overwritten in the meantime (a seqlock without a lock).
+`latest(n, copy=False)` returns views into the shared block instead: these
+are zero-copy but only valid until the producer wraps around.
+
+The *generation* is bumped whenever a new run starts (`on_point` with a
+different run, or `new_generation`) and the sequence at that moment is kept,
+so a viewer can reset its plot and show only the current run (`current`).
+"""
+import json
+from multiprocessing import shared_memory
+
+import numpy as np
+
+MAGIC = 0x52494E47     # "RING"
+_HEADER_WORDS = 8
+_NAMES_BYTES = 1024
+_DATA_OFFSET = _HEADER_WORDS * 8 + _NAMES_BYTES
+
+# header word indexes
+_MAGIC, _CAPACITY, _NCOLS, _SEQ, _GENERATION, _GEN_START = range(6)
+
+_created = set()    # blocks created by this process
+
+
+def _attach_block(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        block = shared_memory.SharedMemory(name=name)
+        if block.name not in _created:
+            # Python < 3.13: the resource tracker would unlink the producer's
+            # block when this (viewer) process exits
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+class RingBuffer:
+    """Fixed-capacity ring of float64 columns in shared memory."""
+
+    def __init__(self, block, owner=False):
+        self.block = block
+        self.owner = owner
+        self.header = np.ndarray((_HEADER_WORDS,), np.int64, block.buf)
+        if self.header[_MAGIC] != MAGIC:
+            raise ValueError(f'Shared memory block {block.name!r} is not a ring buffer')
+        self.capacity = int(self.header[_CAPACITY])
+        raw = bytes(block.buf[_HEADER_WORDS * 8:_DATA_OFFSET]).rstrip(b'\0')
+        self.names = tuple(json.loads(raw.decode('utf-8')))
+        data = np.ndarray((len(self.names), self.capacity), np.float64, block.buf, _DATA_OFFSET)
+        self.data = data
+        self.columns = dict(zip(self.names, data))
+        self._run = None
+
+    @classmethod
+    def create(cls, names, capacity=1 << 20, name=None):
+        """New ring buffer with columns `names`; `name=None` picks a unique name."""
+        names = tuple(names)
+        encoded = json.dumps(names).encode('utf-8')
+        if len(encoded) > _NAMES_BYTES:
+            raise ValueError('Too many or too long column names for a ring buffer')
+        block = shared_memory.SharedMemory(
+            name=name, create=True, size=_DATA_OFFSET + len(names) * capacity * 8)
+        header = np.ndarray((_HEADER_WORDS,), np.int64, block.buf)
+        header[:] = 0
+        header[_CAPACITY] = capacity
+        header[_NCOLS] = len(names)
+        block.buf[_HEADER_WORDS * 8:_HEADER_WORDS * 8 + len(encoded)] = encoded
+        header[_MAGIC] = MAGIC
+        _created.add(block.name)
+        return cls(block, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to an existing ring buffer (zero-copy, read side)."""
+        return cls(_attach_block(name))
+
+    @property
+    def name(self):
+        return self.block.name
+
+    @property
+    def seq(self):
+        """Number of rows appended so far."""
+        return int(self.header[_SEQ])
+
+    @property
+    def generation(self):
+        return int(self.header[_GENERATION])
+
+    @property
+    def generation_start(self):
+        """Sequence at which the current generation (run) started."""
+        return int(self.header[_GEN_START])
+
+    def __len__(self):
+        return min(self.seq, self.capacity)
+
+    # ---------- producer ----------
+
+    def append(self, *values):
+        """Append one row (one value per column)."""
+        seq = int(self.header[_SEQ])
+        slot = seq % self.capacity
+        self.data[:, slot] = values
+        self.header[_SEQ] = seq + 1
+
+    def extend(self, *columns):
+        """Append rows given as one array per column.
+
+        The rows are written first and the sequence is published once at the
+        end, so readers never see it ahead of the data.
+        """
+        columns = [np.asarray(c, np.float64) for c in columns]
+        total = len(columns[0])
+        seq = int(self.header[_SEQ])
+        # more rows than fit: only the last `capacity` are kept, at their slots
+        skipped = max(total - self.capacity, 0)
+        if skipped:
+            columns = [c[skipped:] for c in columns]
+        n = total - skipped
+        start = (seq + skipped) % self.capacity
+        first = min(n, self.capacity - start)
+        for row, column in zip(self.data, columns):
+            row[start:start + first] = column[:first]
+            row[:n - first] = column[first:]
+        self.header[_SEQ] = seq + total
+
+    def new_generation(self):
+        self.header[_GEN_START] = self.header[_SEQ]
+        self.header[_GENERATION] += 1
+
+    def on_point(self, run, x, y, t_host):
+        """`MethodRun` ``on_point`` hook for an ("x", "y", "t_host") buffer."""
+        if run is not self._run:
+            self._run = run
+            self.new_generation()
+        self.append(x, y, t_host)
+
+    # ---------- viewers ----------
+
+    def latest(self, n=None, copy=True):
+        """(sequence, {name: array}) of the last `n` rows (default: all kept).
+
+        With ``copy=True`` the arrays are private copies that contain only
+        rows the producer cannot have overwritten while they were read (so
+        possibly fewer than `n`, and never the oldest slot of a full ring). With ``copy=False`` they are views into
+        shared memory if the window does not wrap around (a copy otherwise).
+        """
+        seq = self.seq
+        n = min(seq, self.capacity) if n is None else min(n, seq, self.capacity)
+        start = (seq - n) % self.capacity
+        if not copy and start + n <= self.capacity:
+            return seq, {name: column[start:start + n] for name, column in self.columns.items()}
+        index = (np.arange(seq - n, seq) % self.capacity) if n else np.empty(0, np.intp)
+        window = self.data[:, index]
+        # rows up to seq_after - capacity may have been overwritten during the copy
+        # (the row being written when seq was re-read included)
+        overwritten = max(self.seq - self.capacity + 1 - (seq - n), 0)
+        if overwritten:
+            window = window[:, min(overwritten, n):]
+        return seq, dict(zip(self.names, window))
+
+    def current(self, copy=True):
+        """(generation, sequence, {name: array}) of the current run's rows."""
+        generation = self.generation
+        n = self.seq - self.generation_start
+        seq, columns = self.latest(n, copy)
+        return generation, seq, columns
+
+    def since(self, seq):
+        """(sequence, {name: array}) of the rows appended after sequence `seq`."""
+        return self.latest(max(self.seq - seq, 0))
+
+    # ---------- lifetime ----------
+
+    def close(self):
+        self.header = self.data = self.columns = None
+        self.block.close()
+
+    def unlink(self):
+        """Free the shared block's name (producer side); mapped views stay valid."""
+        self.block.unlink()
+        _created.discard(self.block.name)
@@ -0,0 +1,185 @@
+"""
+Parameterized MethodSCRIPT templates.
+
+A template is a MethodSCRIPT with ``${name}`` placeholders and a header that
+declares the parameters, their kind and default value::
+
+    #@ e_ca: potential = 100m
+    #@ run_time: time = 120
+    e
+    var c
+    ...
+    meas_loop_ca p c d ${interval} ${run_time}
+
+Values are checked against the kind (see `KINDS`) and may be given as
+numbers in SI base units (0.1), MethodSCRIPT literals ('100m') or with a
+unit ('100 mV', '2 kHz'). They are written into the script as MethodSCRIPT
+literals with an SI prefix and integer mantissa.
+
+Rendering strips comment lines and returns the final ASCII bytes, which
+are cached per distinct parameter set, so a campaign renders every
+variant once up front and the per-cell loop only looks scripts up.
+"""
+import collections
+import dataclasses
+import os
+import re
+import string
+
+from palmsens.mscript import SI_PREFIX_FACTOR
+
+# unit, value must be > 0, value must be >= 0, value must be an integer
+Kind = collections.namedtuple('Kind', ['unit', 'positive', 'non_negative', 'integer'])
+
+KINDS = {
+    'potential': Kind('V', False, False, False),
+    'current': Kind('A', True, False, False),
+    'time': Kind('s', False, True, False),
+    'rate': Kind('V/s', True, False, False),
+    'frequency': Kind('Hz', True, False, False),
+    'count': Kind('', False, True, True),
+    'int': Kind('', False, False, True),
+}
+
+# Prefixes usable in MethodSCRIPT literals, largest first.
+_PREFIXES = sorted(((p.strip(), f) for p, f in SI_PREFIX_FACTOR.items() if p != 'i'),
+                   key=lambda item: -item[1])
+
+_DECLARATION = re.compile(r'^#@\s*(\w+)\s*:\s*(\w+)\s*(?:=\s*(.+?))?\s*$')
+_VALUE = re.compile(r'^([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)\s*([afpnumkMGTPE]?)\s*([A-Za-z/]*)$')
+
+
+def format_si(value):
+    """MethodSCRIPT literal of `value`: integer mantissa with SI prefix (0.1 -> '100m')."""
+    if value == 0:
+        return '0'
+    for prefix, factor in _PREFIXES:
+        mantissa = value / factor
+        if abs(mantissa) >= 1 and abs(mantissa - round(mantissa)) < 1e-9 * abs(mantissa):
+            return f'{int(round(mantissa))}{prefix}'
+    # not representable exactly: round in the smallest prefix
+    prefix, factor = _PREFIXES[-1]
+    return f'{int(round(value / factor))}{prefix}'
+
+
+@dataclasses.dataclass(frozen=True)
+class Param:
+    name: str
+    kind: str
+    default: object = None
+
+    def coerce(self, value):
+        """Check `value` and convert it to a number in SI base units."""
+        kind = KINDS[self.kind]
+        if isinstance(value, bool):
+            raise TypeError(f'{self.name}: expected a {self.kind}, got {value!r}')
+        if isinstance(value, str):
+            match = _VALUE.match(value.strip())
+            if not match:
+                raise ValueError(f'{self.name}: cannot parse {value!r} as a {self.kind}')
+            number, prefix, unit = match.groups()
+            if unit and unit != kind.unit:
+                raise ValueError(f'{self.name}: unit {unit!r} is not {kind.unit or "dimensionless"}')
+            value = float(number) * SI_PREFIX_FACTOR[prefix or ' ']
+        elif not isinstance(value, (int, float)):
+            raise TypeError(f'{self.name}: expected a {self.kind}, got {value!r}')
+        if kind.integer:
+            if value != int(value):
+                raise ValueError(f'{self.name}: {self.kind} must be an integer, got {value!r}')
+            value = int(value)
+        else:
+            value = float(value)
+        if kind.positive and value <= 0:
+            raise ValueError(f'{self.name}: {self.kind} must be > 0, got {value!r}')
+        if kind.non_negative and value < 0:
+            raise ValueError(f'{self.name}: {self.kind} must be >= 0, got {value!r}')
+        return value
+
+    def format(self, value):
+        return str(value) if KINDS[self.kind].integer else format_si(value)
+
+
+class ScriptTemplate:
+    """A MethodSCRIPT template; `render` returns the script as ASCII bytes."""
+
+    def __init__(self, text, name='<template>'):
+        self.name = name
+        self.params = {}
+        body = []
+        for line in text.splitlines(keepends=True):
+            stripped = line.strip()
+            match = _DECLARATION.match(stripped)
+            if match:
+                param_name, kind, default = match.groups()
+                if kind not in KINDS:
+                    raise ValueError(f'{name}: unknown parameter kind {kind!r} of {param_name}')
+                param = Param(param_name, kind)
+                if default is not None:
+                    param = Param(param_name, kind, param.coerce(default))
+                self.params[param_name] = param
+            elif not stripped.startswith('#'):
+                body.append(line)
+        self._template = string.Template(''.join(body))
+        used = {m.group('named') or m.group('braced')
+                for m in self._template.pattern.finditer(self._template.template)} - {None}
+        undeclared = used - set(self.params)
+        if undeclared:
+            raise ValueError(f'{name}: undeclared parameter(s) {", ".join(sorted(undeclared))}')
+        self._rendered = {}
+
+    def __repr__(self):
+        return f'ScriptTemplate({self.name!r}, params={list(self.params)})'
+
+    def resolve(self, params=None):
+        """Defaults completed with `params`, checked and converted (SI base units)."""
+        params = dict(params or {})
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise ValueError(f'{self.name}: unknown parameter(s) {", ".join(sorted(unknown))}')
+        values = {}
+        for name, param in self.params.items():
+            if name in params:
+                values[name] = param.coerce(params[name])
+            elif param.default is not None:
+                values[name] = param.default
+            else:
+                raise ValueError(f'{self.name}: parameter {name!r} has no default')
+        return values
+
+    def render(self, params=None):
+        """The script for `params` (missing ones take their default), as bytes."""
+        values = self.resolve(params)
+        key = tuple(sorted(values.items()))
+        data = self._rendered.get(key)
+        if data is None:
+            text = self._template.substitute(
+                {name: self.params[name].format(value) for name, value in values.items()})
+            data = self._rendered[key] = text.encode('ascii')
+        return data
+
+
+_templates = {}
+
+
+def load_template(path):
+    """Parse a template file; cached until the file changes."""
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    cached = _templates.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding='ascii') as f:
+            cached = _templates[path] = (mtime, ScriptTemplate(f.read(), os.path.basename(path)))
+    return cached[1]
+
+
+def sweep_params(base, sweep, index):
+    """Parameters of the `index`-th cell of a sweep.
+
+    `base` holds fixed values, `sweep` maps parameter names to lists of
+    values; cell `index` takes element ``index % len(values)`` of every list.
+    """
+    params = dict(base or {})
+    for name, values in (sweep or {}).items():
+        if values:
+            params[name] = values[index % len(values)]
+    return params
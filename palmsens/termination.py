@@ -0,0 +1,207 @@
+"""
+Adaptive early termination of MethodSCRIPT measurements.
+
+A script such as ``meas_loop_ca ... 120`` always runs for its full duration,
+even when the signal has long been flat. An `AdaptiveTerminator` watches the
+data packages while they stream in, feeds them to one or more convergence
+criteria and, once they are met, tells the caller to abort the script
+(``Z``). The data received up to that point is kept and the reason for the
+stop is recorded.
+
+Criteria work on (x, y) pairs taken from the packages, normally
+(time, current) or (time, potential):
+    - `RollingSlope`: least-squares slope over the last points is small,
+    - `RelativeStd`: standard deviation relative to the mean is small,
+    - `OcpDrift`: potential drift over a time window is below X mV/min.
+"""
+import collections
+import logging
+import math
+
+import numpy as np
+
+LOG = logging.getLogger(__name__)
+
+
+class Criterion:
+    """Base class of a convergence criterion over a rolling window."""
+
+    name = 'criterion'
+
+    def __init__(self, window=20):
+        if window < 2:
+            raise ValueError('window must be at least 2 points.')
+        self.window = window
+        self._points = collections.deque(maxlen=window)
+        self.last_value = None
+
+    def reset(self):
+        self._points.clear()
+        self.last_value = None
+
+    def update(self, x, y):
+        """Add a point; return True if the criterion is met."""
+        self._points.append((x, y))
+        if len(self._points) < self.window:
+            return False
+        return self._check(np.asarray(self._points, dtype=float))
+
+    def _check(self, points):
+        raise NotImplementedError
+
+    def describe(self):
+        return f'{self.name}={self.last_value:.3g}' if self.last_value is not None else self.name
+
+
+def _slope(points):
+    x = points[:, 0] - points[:, 0].mean()
+    denom = float(x @ x)
+    if denom == 0.0:
+        return math.inf
+    return float(x @ (points[:, 1] - points[:, 1].mean())) / denom
+
+
+class RollingSlope(Criterion):
+    """|dy/dx| over the last `window` points is at most `max_slope`."""
+
+    name = 'slope'
+
+    def __init__(self, max_slope, window=20):
+        super().__init__(window)
+        self.max_slope = abs(max_slope)
+
+    def _check(self, points):
+        self.last_value = _slope(points)
+        return abs(self.last_value) <= self.max_slope
+
+
+class RelativeStd(Criterion):
+    """std(y) / |mean(y)| over the last `window` points is at most `max_rel_std`."""
+
+    name = 'rel_std'
+
+    def __init__(self, max_rel_std, window=20):
+        super().__init__(window)
+        self.max_rel_std = max_rel_std
+
+    def _check(self, points):
+        y = points[:, 1]
+        mean = abs(float(y.mean()))
+        self.last_value = float(y.std()) / mean if mean > 0 else math.inf
+        return self.last_value <= self.max_rel_std
+
+
+class OcpDrift(Criterion):
+    """Potential drift over the last `window_s` seconds is below `max_mv_per_min`.
+
+    x must be the time in seconds and y the potential in volts.
+    """
+
+    name = 'drift_mV/min'
+
+    def __init__(self, max_mv_per_min=1.0, window_s=30.0):
+        super().__init__(window=2)
+        self.max_mv_per_min = abs(max_mv_per_min)
+        self.window_s = window_s
+        self._points = collections.deque()
+
+    def update(self, x, y):
+        self._points.append((x, y))
+        while self._points and x - self._points[0][0] > self.window_s:
+            self._points.popleft()
+        if len(self._points) < 2 or x - self._points[0][0] < 0.9 * self.window_s:
+            return False
+        self.last_value = _slope(np.asarray(self._points, dtype=float)) * 1e3 * 60.0
+        return abs(self.last_value) <= self.max_mv_per_min
+
+
+class AdaptiveTerminator:
+    """Decide on the fly when a streaming measurement may be aborted.
+
+    `x_column` / `y_column` select the variables of each data package that are
+    passed to the criteria. Packages with fewer than `min_vars` variables
+    (e.g. the OCP pretreatment of the chronoamperometry script) are ignored,
+    as are packages of other curves if `curve` is given. With ``require="all"`` every
+    criterion must be met, with ``"any"`` one is enough. Nothing stops before
+    x reaches `min_x` (e.g. a minimum run time in seconds).
+    """
+
+    def __init__(self, criteria, x_column=0, y_column=-1, require='all', min_x=0.0, curve=None,
+                 min_vars=2):
+        if not criteria:
+            raise ValueError('AdaptiveTerminator needs at least one criterion.')
+        if require not in ('all', 'any'):
+            raise ValueError(f"require must be 'all' or 'any', not {require!r}")
+        self.criteria = list(criteria)
+        self.x_column = x_column
+        self.y_column = y_column
+        self.require = require
+        self.min_x = min_x
+        self.curve = curve
+        self.min_vars = min_vars
+        self.stop_reason = None
+        self.stop_x = None
+
+    def reset(self):
+        for criterion in self.criteria:
+            criterion.reset()
+        self.stop_reason = None
+        self.stop_x = None
+
+    def feed(self, package, curve_index=0):
+        """Feed one parsed data package; return the stop reason once met, else None."""
+        if self.stop_reason is not None:
+            return self.stop_reason
+        if self.curve is not None and curve_index != self.curve:
+            return None
+        if len(package) < self.min_vars:
+            return None
+        try:
+            x = package[self.x_column].value
+            y = package[self.y_column].value
+        except IndexError:
+            return None
+        if math.isnan(x) or math.isnan(y):
+            return None
+        met = [criterion.update(x, y) for criterion in self.criteria]
+        if x < self.min_x:
+            return None
+        if all(met) if self.require == 'all' else any(met):
+            self.stop_x = x
+            self.stop_reason = 'converged at x=%g: %s' % (
+                x, ', '.join(c.describe() for c, m in zip(self.criteria, met) if m))
+            LOG.info('Adaptive stop: %s', self.stop_reason)
+        return self.stop_reason
+
+
+def build_terminator(spec):
+    """Build an `AdaptiveTerminator` from a plain config dict, or None.
+
+    Recognised keys: ``max_slope``, ``max_rel_std``, ``max_drift_mv_per_min``
+    (at least one of them), ``window`` (points), ``window_s`` (seconds, for
+    the drift), ``min_time`` (s), ``require``, ``curve``, ``x_column``,
+    ``y_column`` and ``min_vars``. Example::
+
+        {"max_slope": 1e-10, "window": 20, "min_time": 30}
+    """
+    if not spec:
+        return None
+    window = int(spec.get('window', 20))
+    criteria = []
+    if 'max_slope' in spec:
+        criteria.append(RollingSlope(spec['max_slope'], window=window))
+    if 'max_rel_std' in spec:
+        criteria.append(RelativeStd(spec['max_rel_std'], window=window))
+    if 'max_drift_mv_per_min' in spec:
+        criteria.append(OcpDrift(spec['max_drift_mv_per_min'], window_s=spec.get('window_s', 30.0)))
+    if not criteria:
+        raise ValueError(f'No termination criterion in {spec!r}')
+    return AdaptiveTerminator(
+        criteria,
+        x_column=spec.get('x_column', 0),
+        y_column=spec.get('y_column', -1),
+        require=spec.get('require', 'all'),
+        min_x=spec.get('min_time', 0.0),
+        curve=spec.get('curve'),
+        min_vars=spec.get('min_vars', 2),
+    )
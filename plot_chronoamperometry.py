@@ -8,6 +8,7 @@ import pandas as pd
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+import palmsens.decimate
 import palmsens.instrument
 import palmsens.mscript
 import palmsens.serial
@@ -67,7 +68,10 @@ def emstat_chronoamperometry():
     data_file.to_csv(csv_file_path, index=False)
 
     plt.figure(1)
-    plt.plot(applied_time, measured_current)
+    # reduce to the axes' pixel columns; limits from all points, trace unchanged
+    palmsens.decimate.fit_view(plt.gca(), applied_time, measured_current)
+    plot_x, plot_y = palmsens.decimate.for_axes(plt.gca(), applied_time, measured_current)
+    plt.plot(plot_x, plot_y)
     plt.title('Chronoamperometry measurement')
     plt.xlabel('time(s)')
     plt.ylabel('measured Current (A)')
@@ -51,6 +51,7 @@ import shutil
 import matplotlib.pyplot as plt
 
 # Local imports
+import palmsens.decimate
 import palmsens.instrument
 import palmsens.mscript
 import palmsens.serial
@@ -124,7 +125,10 @@ def emstat_cv():
 
     # Plot the results.
     plt.figure(1)
-    plt.plot(applied_potential, measured_current)
+    # reduce to the axes' pixel columns; limits from all points, trace unchanged
+    palmsens.decimate.fit_view(plt.gca(), applied_potential, measured_current)
+    plot_x, plot_y = palmsens.decimate.for_axes(plt.gca(), applied_potential, measured_current)
+    plt.plot(plot_x, plot_y)
     plt.title('Voltammogram')
     plt.xlabel('Applied Potential (V)')
     plt.ylabel('Measured Current (A)')
@@ -10,6 +10,7 @@ import shutil
 import matplotlib.pyplot as plt
 
 # Local imports
+import palmsens.decimate
 import palmsens.instrument
 import palmsens.mscript
 import palmsens.serial
@@ -87,7 +88,10 @@ def emstat_ocp():
     
     # Plot the results.
     plt.figure(1)
-    plt.plot(applied_time, measured_potential)
+    # reduce to the axes' pixel columns; limits from all points, trace unchanged
+    palmsens.decimate.fit_view(plt.gca(), applied_time, measured_potential)
+    plot_x, plot_y = palmsens.decimate.for_axes(plt.gca(), applied_time, measured_potential)
+    plt.plot(plot_x, plot_y)
     plt.title('OCP Plot')
     plt.xlabel('Applied time (seconds)')
     plt.ylabel('Measured potential (V)')
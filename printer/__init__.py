@@ -2,7 +2,32 @@
 Printer control helpers (Ender/Marlin).
 """
 from .printer_controller import PrinterController
-from .printer_setup import send_gcode, check_printer
+from .printer_setup import (send_gcode, check_printer, open_printer, close_printer,
+                            find_printer, release_port)
+from .plate_layout import PlateLayout, get_plate_layout, build_plate_layout
+from .height_map import HeightMap, load_height_map
+from .motion import MotionPlanner, MotionProfile
+from .jog import JogCoalescer, PositionPoller
+from .program import GCodeProgram, compile_program
 
-__all__ = ["PrinterController", "send_gcode", "check_printer"]
+__all__ = [
+    "PrinterController",
+    "send_gcode",
+    "check_printer",
+    "open_printer",
+    "close_printer",
+    "find_printer",
+    "release_port",
+    "PlateLayout",
+    "get_plate_layout",
+    "build_plate_layout",
+    "HeightMap",
+    "load_height_map",
+    "MotionPlanner",
+    "MotionProfile",
+    "JogCoalescer",
+    "PositionPoller",
+    "GCodeProgram",
+    "compile_program",
+]
 __version__ = "0.1.0"
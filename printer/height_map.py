@@ -0,0 +1,255 @@
+"""
+Per-cell work heights for the printer stage.
+
+Instead of one global WORK_Z / SAFE_Z pair, a height map stores the Z that was
+measured (e.g. jogged to and read back with M114) at a few reference wells and
+interpolates a work height for every cell of a plate layout. It also stores
+the Z of the plate rim (the top of the well walls), either one value for the
+whole plate or measured at reference wells and interpolated the same way.
+Travel between two cells then only has to clear the highest rim on the way
+plus a small clearance, rather than lifting to a conservative global safe
+height. The work height is where the tip dips into the liquid, below the
+rim, so it never decides how high the head must travel.
+
+Two interpolation methods are available:
+    - ``"bilinear"``: references must cover a full grid of rows x columns
+      (e.g. the four corners); interpolation is done in row/column space.
+    - ``"tps"``: thin-plate spline through scattered references (>= 3,
+      not all on one line), evaluated at the calibrated stage X/Y.
+``"auto"`` picks bilinear when the references form a grid and falls back to a
+thin-plate spline otherwise. A single reference gives a flat plate.
+"""
+import json
+
+import numpy as np
+
+from .plate_layout import build_plate_layout
+
+
+def _interp_weights(x, xp):
+    """Return (i0, i1, w) such that f(x) = (1-w)*fp[i0] + w*fp[i1] (clamped)."""
+    x = np.clip(x, xp[0], xp[-1])
+    i1 = np.clip(np.searchsorted(xp, x, side="right"), 1, max(len(xp) - 1, 1))
+    i0 = i1 - 1
+    if len(xp) == 1:
+        return np.zeros_like(i0), np.zeros_like(i0), np.zeros(len(x))
+    w = (x - xp[i0]) / (xp[i1] - xp[i0])
+    return i0, i1, w
+
+
+def _tps_kernel(r):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(r > 0, r * r * np.log(r), 0.0)
+
+
+class HeightMap:
+    """Interpolated work Z and rim Z for every cell of a plate layout.
+
+    `rim_z` is the Z at which the tip just clears the plate rim: one number
+    for the whole plate, or ``{well: z}`` measured at reference wells (need
+    not be the work height references). Retract and travel heights are the
+    rim plus `clearance`. Rim references are interpolated with `rim_method`.
+    """
+
+    def __init__(self, layout, references, rim_z, clearance=3.0, method="auto",
+                 rim_method="auto"):
+        if not references:
+            raise ValueError("A height map needs at least one reference height.")
+        if clearance < 0:
+            raise ValueError("clearance must be >= 0 (a negative clearance leaves the tip "
+                             "below the rim).")
+        self.layout = layout
+        self.references = self._normalize(references)
+        self.clearance = float(clearance)
+        self.method = self._resolve_method(self.references, method)
+        self.table = self._interpolate(self.references, self.method)
+        self.table.setflags(write=False)
+
+        if isinstance(rim_z, dict):
+            if not rim_z:
+                raise ValueError("rim_z needs at least one reference height.")
+            self.rim_z = self._normalize(rim_z)
+            self.rim_method = self._resolve_method(self.rim_z, rim_method)
+            self.rim = self._interpolate(self.rim_z, self.rim_method)
+        else:
+            self.rim_z = float(rim_z)
+            self.rim_method = None
+            self.rim = np.full(len(self.table), self.rim_z)
+        self.rim.setflags(write=False)
+
+        below = np.flatnonzero(self.rim < self.table - 1e-6)
+        if below.size:
+            wells = ", ".join(layout.well_name(i + 1) for i in below[:5])
+            raise ValueError(f"Rim is below the work height at {wells}; "
+                             "check rim_z against the reference heights.")
+
+    def __repr__(self):
+        return (f"HeightMap({self.layout.name!r}, {len(self.references)} references, "
+                f"method={self.method!r}, rim_z={self.rim_z!r}, clearance={self.clearance})")
+
+    # ---------- interpolation ----------
+
+    def _normalize(self, heights):
+        layout = self.layout
+        return {layout.well_name(layout.index(w)): float(z) for w, z in heights.items()}
+
+    def _ref_arrays(self, heights):
+        idx = np.array([self.layout.index(w) for w in heights], dtype=int) - 1
+        z = np.array(list(heights.values()), dtype=float)
+        return idx, z
+
+    def _is_grid(self, heights):
+        idx, _ = self._ref_arrays(heights)
+        rows = np.unique(self.layout.row_index[idx])
+        cols = np.unique(self.layout.col_index[idx])
+        return len(idx) == len(rows) * len(cols)
+
+    def _resolve_method(self, heights, method):
+        if method not in ("auto", "bilinear", "tps"):
+            raise ValueError(f"Unknown interpolation method: {method!r}")
+        if len(heights) == 1:
+            return "bilinear"
+        grid = self._is_grid(heights)
+        if method == "bilinear" and not grid:
+            raise ValueError("Bilinear interpolation needs references on a full row x column grid.")
+        if method == "auto":
+            method = "bilinear" if grid else "tps"
+        if method == "tps" and len(heights) < 3:
+            raise ValueError("Thin-plate interpolation needs at least three references.")
+        return method
+
+    def _interpolate(self, heights, method):
+        idx, z = self._ref_arrays(heights)
+        if method == "bilinear":
+            return self._bilinear(idx, z)
+        return self._thin_plate(idx, z)
+
+    def _bilinear(self, idx, z):
+        layout = self.layout
+        ref_rows = layout.row_index[idx]
+        ref_cols = layout.col_index[idx]
+        rows = np.unique(ref_rows)
+        cols = np.unique(ref_cols)
+        grid = np.empty((len(rows), len(cols)))
+        grid[np.searchsorted(rows, ref_rows), np.searchsorted(cols, ref_cols)] = z
+
+        r0, r1, wr = _interp_weights(layout.row_index.astype(float), rows.astype(float))
+        c0, c1, wc = _interp_weights(layout.col_index.astype(float), cols.astype(float))
+        return ((1 - wr) * (1 - wc) * grid[r0, c0] + (1 - wr) * wc * grid[r0, c1]
+                + wr * (1 - wc) * grid[r1, c0] + wr * wc * grid[r1, c1])
+
+    def _thin_plate(self, idx, z):
+        pts = self.layout.table[idx]
+        n = len(pts)
+        poly = np.column_stack([np.ones(n), pts])
+        if np.linalg.matrix_rank(poly) < 3:
+            raise ValueError("Thin-plate references must not lie on a single line.")
+        kernel = _tps_kernel(np.linalg.norm(pts[:, None, :] - pts[None, :, :], axis=-1))
+        system = np.zeros((n + 3, n + 3))
+        system[:n, :n] = kernel
+        system[:n, n:] = poly
+        system[n:, :n] = poly.T
+        rhs = np.concatenate([z, np.zeros(3)])
+        coeffs = np.linalg.solve(system, rhs)
+        weights, affine = coeffs[:n], coeffs[n:]
+
+        cells = self.layout.table
+        dist = np.linalg.norm(cells[:, None, :] - pts[None, :, :], axis=-1)
+        return (_tps_kernel(dist) @ weights + affine[0]
+                + cells[:, 0] * affine[1] + cells[:, 1] * affine[2])
+
+    # ---------- lookup ----------
+
+    def work_z(self, cells):
+        """Return the interpolated work Z for one cell or a sequence of cells."""
+        if isinstance(cells, (str, int, np.integer)):
+            return float(self.table[self.layout.index(cells) - 1])
+        idx = np.array([self.layout.index(c) for c in cells], dtype=int)
+        return self.table[idx - 1]
+
+    def rim_at(self, cells):
+        """Return the rim Z for one cell or a sequence of cells."""
+        if isinstance(cells, (str, int, np.integer)):
+            return float(self.rim[self.layout.index(cells) - 1])
+        idx = np.array([self.layout.index(c) for c in cells], dtype=int)
+        return self.rim[idx - 1]
+
+    def retract_z(self, cell):
+        """Lowest Z that clears the rim of `cell` itself."""
+        return self.rim_at(cell) + self.clearance
+
+    def travel_z(self, from_cell, to_cell):
+        """Lowest Z that clears the rim of every cell in the rectangle between two cells.
+
+        The head travels in a straight XY line, so every well in the bounding
+        box of the two cells is considered. `from_cell` may be ``None`` (head
+        position unknown), in which case the whole plate must be cleared.
+        """
+        layout = self.layout
+        if from_cell is None:
+            return float(self.rim.max()) + self.clearance
+        a = layout.index(from_cell) - 1
+        b = layout.index(to_cell) - 1
+        r_lo, r_hi = sorted((layout.row_index[a], layout.row_index[b]))
+        c_lo, c_hi = sorted((layout.col_index[a], layout.col_index[b]))
+        block = self.rim.reshape(layout.rows, layout.cols)[r_lo:r_hi + 1, c_lo:c_hi + 1]
+        return float(block.max()) + self.clearance
+
+    def path_clear(self, p0, z0, p1, z1):
+        """Check that a straight move from (p0, z0) to (p1, z1) clears the plate.
+
+        Every well whose centre lies within half a pitch of the XY segment must
+        be passed at or above its rim Z plus the clearance, with Z varying
+        linearly along the move.
+        """
+        p0 = np.asarray(p0, dtype=float)
+        p1 = np.asarray(p1, dtype=float)
+        seg = p1 - p0
+        length2 = float(seg @ seg)
+        cells = self.layout.table
+        if length2 == 0.0:
+            s = np.zeros(len(cells))
+        else:
+            s = np.clip((cells - p0) @ seg / length2, 0.0, 1.0)
+        dist = np.linalg.norm(cells - (p0 + s[:, None] * seg), axis=1)
+        near = dist <= 0.5 * max(self.layout.pitch_x, self.layout.pitch_y)
+        z_along = z0 + s[near] * (z1 - z0)
+        return bool(np.all(z_along >= self.rim[near] + self.clearance - 1e-6))
+
+    # ---------- persistence ----------
+
+    def to_dict(self):
+        return {
+            "plate_type": self.layout.name,
+            "references": self.references,
+            "rim_z": self.rim_z,
+            "clearance": self.clearance,
+            "method": self.method,
+            "rim_method": self.rim_method,
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def load_height_map(path, layout=None):
+    """Load a height map saved with `HeightMap.save`.
+
+    If `layout` is given (e.g. a calibrated layout) it is used instead of the
+    nominal layout of the stored plate type.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if "rim_z" not in data:
+        raise ValueError(f"Height map {path} has no 'rim_z'; add the Z at which the tip "
+                         "clears the plate rim (one value or {well: z}).")
+    if layout is None:
+        layout = build_plate_layout(data.get("plate_type", "4x4"))
+    elif data.get("plate_type", layout.name) != layout.name:
+        raise ValueError(f"Height map is for plate '{data['plate_type']}', "
+                         f"not '{layout.name}'.")
+    return HeightMap(layout, data["references"], data["rim_z"],
+                     clearance=data.get("clearance", 3.0),
+                     method=data.get("method", "auto"),
+                     rim_method=data.get("rim_method") or "auto")
@@ -0,0 +1,93 @@
+"""
+Interactive positioning helpers for a session `PrinterController`.
+
+`JogCoalescer` merges jog clicks that arrive within a short window into one
+relative move, so five quick clicks on "X+" become a single ``G1 X5`` instead
+of five G91/G1/G90 round trips. `PositionPoller` sends M114 in the background
+and reports the position parsed by the controller's reader thread.
+"""
+import threading
+
+
+class JogCoalescer:
+    """Accumulate relative jogs and send them as one move after `window` s."""
+
+    def __init__(self, printer, window=0.15, feed=2000):
+        self.printer = printer
+        self.window = window
+        self.feed = feed
+        self._pending = {"X": 0.0, "Y": 0.0, "Z": 0.0}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def jog(self, dx=0.0, dy=0.0, dz=0.0, feed=None):
+        with self._lock:
+            self._pending["X"] += dx
+            self._pending["Y"] += dy
+            self._pending["Z"] += dz
+            if feed is not None:
+                self.feed = feed
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.window, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Send the accumulated jog now (no-op if nothing is pending)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            parts = [f"{axis}{delta:g}" for axis, delta in self._pending.items() if abs(delta) > 1e-9]
+            self._pending = {"X": 0.0, "Y": 0.0, "Z": 0.0}
+        if parts:
+            self.printer.send_many(["G91", "G1 " + " ".join(parts) + f" F{self.feed}", "G90"])
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = {"X": 0.0, "Y": 0.0, "Z": 0.0}
+
+
+class PositionPoller:
+    """Periodically request M114 and call `on_update(position)`."""
+
+    def __init__(self, printer, interval=0.5, on_update=None):
+        self.printer = printer
+        self.interval = interval
+        self.on_update = on_update
+        self._stop = threading.Event()
+        self._thread = None
+        self._last = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.printer.pollers.add(self)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="printer-position-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        self.printer.pollers.discard(self)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.printer.is_connected and not self.printer.simulate:
+                try:
+                    self.printer.request_position()
+                except Exception as e:
+                    print(f"[PositionPoller] {e}")
+            position = dict(self.printer.position)
+            if position != self._last:
+                self._last = position
+                if self.on_update is not None:
+                    self.on_update(position)
+            self._stop.wait(self.interval)
@@ -0,0 +1,227 @@
+"""
+Motion planning on top of a G-code sender.
+
+`MotionPlanner` keeps track of the last commanded position and only sends
+what actually moves the head:
+    - moves to the position the head is already at are dropped,
+    - axes that do not change are left out of a move,
+    - travel uses G0 at the profile's travel feedrate, Z uses its own feedrate,
+    - the feedrate is only sent when it changes,
+    - where a `path_clear` check says the plate geometry allows it, the lift
+      out of one cell is blended with the XY travel to the next one.
+
+It also estimates the motion time of every move with a trapezoidal velocity
+profile, both for the planned G-code and for the fixed legacy sequence
+(``G1 Z{safe} F1500`` / ``G1 X.. Y.. F3000`` / ``G1 Z{work} F1500`` per cell,
+with the legacy global safe/work heights rather than the planned ones), so a
+campaign can report how much motion time the planner saved.
+"""
+import math
+from dataclasses import dataclass
+
+from telemetry.tracing import traced
+
+# Feedrates (mm/min) of the fixed per-cell sequence the planner replaces.
+LEGACY_Z_FEED = 1500.0
+LEGACY_XY_FEED = 3000.0
+# Global Z heights (mm) of the fixed per-cell sequence.
+LEGACY_SAFE_Z = 0.0
+LEGACY_WORK_Z = -25.0
+
+_EPS = 1e-3  # mm; positions closer than this are treated as equal
+
+
+@dataclass
+class MotionProfile:
+    travel_feed: float = 6000.0   # mm/min, XY travel (G0)
+    z_feed: float = 1500.0        # mm/min, Z moves
+    accel: float = 500.0          # mm/s^2, XY acceleration
+    z_accel: float = 100.0        # mm/s^2, Z acceleration
+    blend: bool = True            # allow blended lift + travel where safe
+
+
+def move_time(distance, feed, accel):
+    """Time (s) for a point-to-point move with a trapezoidal velocity profile.
+
+    `feed` is in mm/min (as in G-code), `accel` in mm/s^2.
+    """
+    distance = abs(distance)
+    if distance < _EPS:
+        return 0.0
+    v = feed / 60.0
+    if accel <= 0:
+        return distance / v
+    if distance >= v * v / accel:
+        # accelerate to v, cruise, decelerate
+        return distance / v + v / accel
+    # triangular profile, never reaches v
+    return 2.0 * math.sqrt(distance / accel)
+
+
+class MotionPlanner:
+    """Position-tracking G-code emitter.
+
+    `send` is called with one G-code line per move, e.g.
+    ``PrinterController.send_gcode``. The position starts unknown, so the
+    first move always sends every requested axis. `legacy_safe_z` and
+    `legacy_work_z` are the heights the legacy sequence used for every cell.
+    """
+
+    def __init__(self, send, profile=None, legacy_safe_z=LEGACY_SAFE_Z,
+                 legacy_work_z=LEGACY_WORK_Z):
+        self.send = send
+        self.profile = profile or MotionProfile()
+        self.legacy_safe_z = legacy_safe_z
+        self.legacy_work_z = legacy_work_z
+        self.position = {"X": None, "Y": None, "Z": None}
+        self._legacy_position = dict(self.position)
+        self._feed = None
+        self._absolute = False
+        self.commands_sent = 0
+        self.moves_elided = 0
+        self.moves_blended = 0
+        self.planned_time = 0.0
+        self.legacy_time = 0.0
+
+    # ---------- state ----------
+
+    def invalidate(self):
+        """Forget the position (after homing, motor off, reset, ...)."""
+        self.position = {"X": None, "Y": None, "Z": None}
+        self._legacy_position = dict(self.position)
+        self._feed = None
+        self._absolute = False
+
+    def set_position(self, x=None, y=None, z=None):
+        """Set the known position, e.g. from an M114 readout."""
+        for axis, value in (("X", x), ("Y", y), ("Z", z)):
+            if value is not None:
+                self.position[axis] = float(value)
+                self._legacy_position[axis] = float(value)
+
+    # ---------- moves ----------
+
+    def _emit(self, line):
+        self.send(line)
+        self.commands_sent += 1
+
+    def _ensure_absolute(self):
+        if not self._absolute:
+            self._emit("G90")
+            self._absolute = True
+
+    def _estimate(self, start, target, xy_feed, z_feed):
+        """Motion time from `start` to `target` (dicts of axis -> mm)."""
+        def delta(axis):
+            if target.get(axis) is None or start.get(axis) is None:
+                return 0.0
+            return target[axis] - start[axis]
+        xy = math.hypot(delta("X"), delta("Y"))
+        t_xy = move_time(xy, xy_feed, self.profile.accel)
+        t_z = move_time(delta("Z"), z_feed, self.profile.z_accel)
+        return max(t_xy, t_z)
+
+    def move(self, x=None, y=None, z=None, rapid=True, feed=None):
+        """Move to an absolute position; unchanged axes are dropped.
+
+        Returns ``True`` if a command was sent, ``False`` if the move was a
+        no-op and elided.
+        """
+        requested = {"X": x, "Y": y, "Z": z}
+        target = {}
+        for axis, value in requested.items():
+            if value is None:
+                continue
+            current = self.position[axis]
+            if current is None or abs(current - value) >= _EPS:
+                target[axis] = float(value)
+        if not target:
+            self.moves_elided += 1
+            return False
+
+        xy_move = "X" in target or "Y" in target
+        if feed is None:
+            feed = self.profile.travel_feed if xy_move else self.profile.z_feed
+        z_feed = self.profile.z_feed if xy_move else feed
+        self.planned_time += self._estimate(self.position, target, feed, z_feed)
+
+        self._ensure_absolute()
+        parts = ["G0" if rapid else "G1"]
+        parts += [f"{axis}{value:.2f}" for axis, value in target.items()]
+        if feed != self._feed:
+            parts.append(f"F{feed:.0f}")
+            self._feed = feed
+        self._emit(" ".join(parts))
+        self.position.update(target)
+        return True
+
+    def _legacy(self, x=None, y=None, z=None):
+        """Account for one move of the fixed legacy sequence."""
+        target = {axis: v for axis, v in (("X", x), ("Y", y), ("Z", z)) if v is not None}
+        xy_move = "X" in target or "Y" in target
+        feed = LEGACY_XY_FEED if xy_move else LEGACY_Z_FEED
+        self.legacy_time += self._estimate(self._legacy_position, target, feed, feed)
+        self._legacy_position.update(target)
+
+    # ---------- high-level sequences ----------
+
+    @traced("motion.visit")
+    def visit(self, x, y, work_z, travel_z, approach_z=None, path_clear=None):
+        """Bring the head from wherever it is down to `work_z` at `(x, y)`.
+
+        `travel_z` is the lowest Z that clears the plate between the current
+        position and the target. If blending is enabled and
+        ``path_clear(p0, z0, p1, z1)`` confirms that a straight line from the
+        current position to `(x, y, approach_z)` clears every well on the way,
+        lift and travel are merged into one move. Otherwise the head lifts to
+        `travel_z` (only if it is lower), travels, and plunges.
+        """
+        self._legacy(z=self.legacy_safe_z)
+        self._legacy(x=x, y=y)
+        self._legacy(z=self.legacy_work_z)
+
+        pos = self.position
+        known = None not in pos.values()
+        if approach_z is None:
+            approach_z = travel_z
+        if (self.profile.blend and known and path_clear is not None
+                and min(pos["Z"], approach_z) < travel_z - _EPS
+                and path_clear((pos["X"], pos["Y"]), pos["Z"], (x, y), approach_z)):
+            if self.move(x=x, y=y, z=approach_z):
+                self.moves_blended += 1
+        else:
+            if pos["Z"] is None or pos["Z"] < travel_z - _EPS:
+                self.move(z=travel_z)
+            self.move(x=x, y=y)
+        self.move(z=work_z, feed=self.profile.z_feed)
+
+    @traced("motion.retract")
+    def retract(self, z):
+        """Lift straight up to `z` (never lowers the head)."""
+        self._legacy(z=self.legacy_safe_z)
+        if self.position["Z"] is not None and self.position["Z"] >= z - _EPS:
+            self.moves_elided += 1
+            return False
+        return self.move(z=z)
+
+    @traced("motion.park")
+    def park(self, x, y, z):
+        """Lift to `z` if needed and travel to `(x, y)`."""
+        self._legacy(z=self.legacy_safe_z)
+        self._legacy(x=x, y=y)
+        if self.position["Z"] is None or self.position["Z"] < z - _EPS:
+            self.move(z=z)
+        self.move(x=x, y=y)
+
+    # ---------- reporting ----------
+
+    def report(self):
+        """Summary of sent/elided commands and estimated motion time (s)."""
+        return {
+            "commands_sent": self.commands_sent,
+            "moves_elided": self.moves_elided,
+            "moves_blended": self.moves_blended,
+            "planned_motion_s": round(self.planned_time, 2),
+            "legacy_motion_s": round(self.legacy_time, 2),
+            "motion_saved_s": round(self.legacy_time - self.planned_time, 2),
+        }
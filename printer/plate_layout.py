@@ -0,0 +1,214 @@
+"""
+Plate layouts for the printer stage.
+
+A layout maps wells (``"A1"``, ``"H12"``) or 1-based cell indices to stage
+X/Y coordinates. Cell indices run row-major, so cell 1 is ``A1``, cell 2 is
+``A2`` and so on, matching the numbering used by ``CellSelector``. Rows are
+spaced along Y and columns along X.
+
+The coordinate table of a layout is computed once when the layout is built.
+It can be corrected with an affine transform fitted to three (or more)
+measured reference wells, which absorbs plate offset, rotation, skew and
+pitch error. Looking up coordinates for a set of cells is then a single
+array indexing operation.
+"""
+import functools
+import re
+
+import numpy as np
+
+ROW_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Nominal geometry per plate type (mm). "4x4" is the 16-cell holder used by
+# RunMeasurementLoop so far (STEP = 50, START_X/Y = 0).
+PLATE_TYPES = {
+    "4x4": dict(rows=4, cols=4, pitch_x=50.0, pitch_y=50.0, origin=(0.0, 0.0)),
+    "24": dict(rows=4, cols=6, pitch_x=19.3, pitch_y=19.3, origin=(0.0, 0.0)),
+    "96": dict(rows=8, cols=12, pitch_x=9.0, pitch_y=9.0, origin=(0.0, 0.0)),
+    "384": dict(rows=16, cols=24, pitch_x=4.5, pitch_y=4.5, origin=(0.0, 0.0)),
+}
+
+_WELL_RE = re.compile(r"^([A-Z])(\d+)$")
+_ROW_RE = re.compile(r"^[A-Z]$")
+_COL_RE = re.compile(r"^\d+$")
+
+
+class PlateLayout:
+    """Precomputed well coordinate table for one plate type."""
+
+    def __init__(self, name, rows, cols, pitch_x, pitch_y=None,
+                 origin=(0.0, 0.0), transform=None):
+        if rows > len(ROW_LETTERS):
+            raise ValueError(f"At most {len(ROW_LETTERS)} rows are supported, got {rows}.")
+        self.name = name
+        self.rows = int(rows)
+        self.cols = int(cols)
+        self.pitch_x = float(pitch_x)
+        self.pitch_y = float(pitch_y if pitch_y is not None else pitch_x)
+        self.origin = (float(origin[0]), float(origin[1]))
+        # 3x2 affine matrix applied as [x, y, 1] @ transform.
+        self.transform = (np.asarray(transform, dtype=float) if transform is not None
+                          else np.array([[1.0, 0.0], [0.0, 1.0], [0.0, 0.0]]))
+
+        row_idx, col_idx = np.divmod(np.arange(self.n_wells), self.cols)
+        self.row_index = row_idx
+        self.col_index = col_idx
+        self.nominal = np.column_stack([
+            self.origin[0] + col_idx * self.pitch_x,
+            self.origin[1] + row_idx * self.pitch_y,
+        ])
+        self.table = self._apply(self.nominal)
+        for array in (self.row_index, self.col_index, self.nominal, self.table):
+            array.setflags(write=False)
+
+    def __repr__(self):
+        return (f"PlateLayout({self.name!r}, rows={self.rows}, cols={self.cols}, "
+                f"pitch=({self.pitch_x}, {self.pitch_y}), origin={self.origin})")
+
+    @property
+    def n_wells(self):
+        return self.rows * self.cols
+
+    @property
+    def park_xy(self):
+        """Calibrated position of the layout origin (used for the final park)."""
+        return tuple(float(v) for v in self._apply(np.array([self.origin]))[0])
+
+    def _apply(self, xy):
+        return np.column_stack([xy, np.ones(len(xy))]) @ self.transform
+
+    # ---------- naming ----------
+
+    def well_name(self, cell):
+        """Return the well name (e.g. ``"B3"``) of a 1-based cell index."""
+        row, col = divmod(self._check_index(cell) - 1, self.cols)
+        return f"{ROW_LETTERS[row]}{col + 1}"
+
+    def index(self, well):
+        """Return the 1-based cell index of a well name or index."""
+        if isinstance(well, (int, np.integer)):
+            return self._check_index(int(well))
+        row, col = self._parse_well(well)
+        return row * self.cols + col + 1
+
+    def _check_index(self, cell):
+        if not 1 <= cell <= self.n_wells:
+            raise ValueError(f"Cell {cell} is outside plate '{self.name}' (1..{self.n_wells}).")
+        return cell
+
+    def _parse_well(self, well):
+        match = _WELL_RE.match(str(well).strip().upper())
+        if not match:
+            raise ValueError(f"Invalid well name: {well!r}")
+        row = ROW_LETTERS.index(match.group(1))
+        col = int(match.group(2)) - 1
+        if row >= self.rows or not 0 <= col < self.cols:
+            raise ValueError(f"Well {well!r} is outside plate '{self.name}'.")
+        return row, col
+
+    # ---------- lookup ----------
+
+    def xy(self, cells):
+        """Return calibrated X/Y for one or more cells.
+
+        `cells` may be a single 1-based index or well name, or a sequence of
+        them. A single cell returns an array of shape (2,), a sequence returns
+        an array of shape (n, 2).
+        """
+        if isinstance(cells, (str, int, np.integer)):
+            return self.table[self.index(cells) - 1]
+        cells = list(cells)
+        if cells and all(isinstance(c, (int, np.integer)) for c in cells):
+            idx = np.asarray(cells, dtype=int)
+            if idx.min() < 1 or idx.max() > self.n_wells:
+                raise ValueError(f"Cell indices must be within 1..{self.n_wells}.")
+        else:
+            idx = np.array([self.index(c) for c in cells], dtype=int)
+        return self.table[idx - 1] if len(idx) else np.empty((0, 2))
+
+    # ---------- selection ----------
+
+    def select(self, spec="*", row_step=1, col_step=1):
+        """Return the sorted 1-based cell indices matched by `spec`.
+
+        `spec` is a comma separated list of:
+            - ``*``            all wells
+            - ``B3``           a single well
+            - ``A1:H6``        a rectangular block of wells
+            - ``C`` / ``A:C``  whole row(s)
+            - ``5`` / ``1:6``  whole column(s)
+
+        `row_step` / `col_step` keep every n-th row / column of each item,
+        counted from the item's first row / column (``col_step=2`` selects
+        every other column).
+        """
+        if row_step < 1 or col_step < 1:
+            raise ValueError("row_step and col_step must be >= 1.")
+        mask = np.zeros((self.rows, self.cols), dtype=bool)
+        for token in str(spec).replace(" ", "").upper().split(","):
+            if not token:
+                continue
+            r0, r1, c0, c1 = self._parse_block(token)
+            mask[r0:r1 + 1:row_step, c0:c1 + 1:col_step] = True
+        return (np.flatnonzero(mask.ravel()) + 1).tolist()
+
+    def _parse_block(self, token):
+        if token == "*":
+            return 0, self.rows - 1, 0, self.cols - 1
+        first, _, last = token.partition(":")
+        last = last or first
+        if _WELL_RE.match(first) and _WELL_RE.match(last):
+            (ra, ca), (rb, cb) = self._parse_well(first), self._parse_well(last)
+            return min(ra, rb), max(ra, rb), min(ca, cb), max(ca, cb)
+        if _ROW_RE.match(first) and _ROW_RE.match(last):
+            ra, rb = ROW_LETTERS.index(first), ROW_LETTERS.index(last)
+            if max(ra, rb) >= self.rows:
+                raise ValueError(f"Row range {token!r} is outside plate '{self.name}'.")
+            return min(ra, rb), max(ra, rb), 0, self.cols - 1
+        if _COL_RE.match(first) and _COL_RE.match(last):
+            ca, cb = int(first) - 1, int(last) - 1
+            if min(ca, cb) < 0 or max(ca, cb) >= self.cols:
+                raise ValueError(f"Column range {token!r} is outside plate '{self.name}'.")
+            return 0, self.rows - 1, min(ca, cb), max(ca, cb)
+        raise ValueError(f"Invalid selection item: {token!r}")
+
+    # ---------- calibration ----------
+
+    def calibrate(self, references):
+        """Return a copy of this layout corrected by measured reference wells.
+
+        `references` maps at least three non-collinear wells (names or 1-based
+        indices) to the stage X/Y actually measured there, e.g.
+        ``{"A1": (1.2, 0.4), "A12": (100.5, 1.1), "H1": (0.3, 63.9)}``.
+        With exactly three wells the affine fit is exact; with more it is a
+        least-squares fit.
+        """
+        if len(references) < 3:
+            raise ValueError("At least three reference wells are needed for calibration.")
+        idx = np.array([self.index(w) for w in references], dtype=int)
+        measured = np.array([tuple(v)[:2] for v in references.values()], dtype=float)
+        design = np.column_stack([self.nominal[idx - 1], np.ones(len(idx))])
+        if np.linalg.matrix_rank(design) < 3:
+            raise ValueError("Reference wells must not lie on a single line.")
+        transform, *_ = np.linalg.lstsq(design, measured, rcond=None)
+        return PlateLayout(self.name, self.rows, self.cols, self.pitch_x, self.pitch_y,
+                           self.origin, transform=transform)
+
+
+@functools.lru_cache(maxsize=None)
+def get_plate_layout(plate_type="4x4"):
+    """Return the (cached, uncalibrated) layout for a known plate type."""
+    try:
+        geometry = PLATE_TYPES[str(plate_type)]
+    except KeyError:
+        raise ValueError(f"Unknown plate type {plate_type!r}. "
+                         f"Known types: {', '.join(PLATE_TYPES)}") from None
+    return PlateLayout(str(plate_type), **geometry)
+
+
+def build_plate_layout(plate_type="4x4", references=None):
+    """Return the layout for `plate_type`, calibrated if `references` are given."""
+    layout = get_plate_layout(plate_type)
+    if references:
+        layout = layout.calibrate(references)
+    return layout
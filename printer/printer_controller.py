@@ -1,5 +1,30 @@
+import queue
+import re
 import serial
+import threading
 import time
+from contextlib import contextmanager
+
+from telemetry.linkstats import link_stats
+from telemetry.tracing import span, traced
+
+# Park position used by safe_park (X, Y, Z).
+PARK_POSITION = (0.0, 200.0, 150.0)
+
+# Commands after which the firmware no longer knows where the axes are.
+_INVALIDATE_HOMING = ("M112", "M18", "M84", "M999")
+
+_M114_RE = re.compile(r"X:\s*([-\d.]+)\s+Y:\s*([-\d.]+)\s+Z:\s*([-\d.]+)")
+_AXIS_RE = re.compile(r"([XYZ])\s*(-?[\d.]+)")
+
+
+def parse_m114(line):
+    """Return (x, y, z) from an M114 reply line, or None."""
+    match = _M114_RE.search(line)
+    if match:
+        return tuple(float(v) for v in match.groups())
+    return None
+
 
 class PrinterController:
     def __init__(self, port="COM4", baud=115200, simulate=True):
@@ -7,35 +32,378 @@ class PrinterController:
         self.baud = baud
         self.simulate = simulate
         self.ser = None
+        self._connected = False
+        # Machine state for this session. Opening the port resets a Marlin
+        # board, so everything is unknown again after (re)connecting.
+        self.homed = False
+        self.position = {"X": None, "Y": None, "Z": None}
+        self._relative = False
+        # Serialises writes from the GUI, pollers and campaign code.
+        self._lock = threading.RLock()
+        # Optional background reader (see start_reader).
+        self._reader = None
+        self._reader_stop = threading.Event()
+        self._replies = queue.Queue(maxsize=1000)
+        self._on_line = None
+        # running PositionPollers (e.g. of a manual control panel)
+        self.pollers = set()
+        # who has claimed the session (see claim), e.g. a running campaign
+        self.owner = None
+        self._resume_reader = False
+        # bytes/lines/timeouts of this port (see telemetry.linkstats)
+        self.link = link_stats(f"printer:{port}")
 
+    @property
+    def is_connected(self):
+        if self.simulate:
+            return self._connected
+        return self._connected and self.ser is not None and self.ser.is_open
+
+    @property
+    def position_known(self):
+        return None not in self.position.values()
+
+    @traced("printer.connect")
     def connect(self):
+        self.invalidate_state()
         if self.simulate:
             print(f"[PrinterController] SIMULATION: Pretending to connect to {self.port} @ {self.baud}")
+            self._connected = True
             return True
         try:
             self.ser = serial.Serial(self.port, self.baud, timeout=2)
             time.sleep(2)
+            self.ser.reset_input_buffer()
             print(f"[PrinterController] Connected to {self.port} @ {self.baud}")
+            self.link.connected()
+            self._connected = True
             return True
         except Exception as e:
             print(f"[PrinterController] ERROR: {e}")
+            self.link.incr("errors")
+            self.ser = None
             return False
 
-    def send_gcode(self, command):
-        if self.simulate:
-            print(f"[PrinterController] SIMULATION: {command}")
+    # ---------- machine state ----------
+
+    def invalidate_state(self):
+        """Forget homing and position (reset, motors off, reconnect)."""
+        self.homed = False
+        self.position = {"X": None, "Y": None, "Z": None}
+        self._relative = False
+
+    def _track(self, command):
+        """Update the session state from an outgoing command."""
+        code = command.split(";", 1)[0].strip().upper()
+        if not code:
             return
-        if self.ser:
-            self.ser.write((command + "\n").encode())
-            self.ser.flush()
-            print(f"[PrinterController] Sent: {command}")
+        word = code.split()[0]
+        if word in _INVALIDATE_HOMING:
+            self.invalidate_state()
+        elif word == "G28":
+            axes = [a for a in "XYZ" if a in code[3:]]
+            if not axes or set(axes) == set("XYZ"):
+                self.homed = True
+            # home position depends on the firmware; read it back with M114
+            for axis in axes or "XYZ":
+                self.position[axis] = None
+        elif word == "G90":
+            self._relative = False
+        elif word == "G91":
+            self._relative = True
+        elif word == "G92":
+            for axis, value in _AXIS_RE.findall(code[3:]):
+                self.position[axis] = float(value)
+        elif word in ("G0", "G1"):
+            for axis, value in _AXIS_RE.findall(code[2:]):
+                if self._relative:
+                    if self.position[axis] is not None:
+                        self.position[axis] += float(value)
+                else:
+                    self.position[axis] = float(value)
+        elif word == "M410":
+            # quick stop: moves are cut short, the planned position is stale
+            self.position = {"X": None, "Y": None, "Z": None}
+
+    # ---------- I/O ----------
+
+    def send_gcode(self, command, quiet=False):
+        with self._lock, span("printer.send", gcode=command):
+            self._track(command)
+            if self.simulate:
+                if not quiet:
+                    print(f"[PrinterController] SIMULATION: {command}")
+                return
+            if self.ser:
+                data = (command + "\n").encode()
+                self.ser.write(data)
+                self.ser.flush()
+                self.link.tx(len(data))
+                if not quiet:
+                    print(f"[PrinterController] Sent: {command}")
+
+    def send_and_wait(self, command, timeout=30.0, quiet=False):
+        """Send one command and wait for its ``ok`` (flow control for single moves)."""
+        with self._lock:
+            self.send_gcode(command, quiet=quiet)
+            self.wait_ok(timeout=timeout)
+
+    def send_many(self, commands, quiet=False):
+        """Send several commands back to back without interleaving other writers."""
+        with self._lock:
+            for command in commands:
+                self.send_gcode(command, quiet=quiet)
+
+    def _readline(self, timeout):
+        """Next reply line, from the background reader if it runs."""
+        if self._reader is not None:
+            try:
+                return self._replies.get(timeout=timeout)
+            except queue.Empty:
+                self.link.incr("timeouts")
+                return ""
+        raw = self.ser.readline()
+        if raw:
+            self.link.rx(len(raw))
+        else:
+            self.link.incr("timeouts")
+        return raw.decode(errors="ignore").strip()
+
+    @traced("printer.read_reply")
+    def read_reply(self, timeout=5.0):
+        """Read reply lines until the firmware's ``ok`` (or `timeout` s)."""
+        lines = []
+        if self.simulate or not self.ser:
+            return lines
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            line = self._readline(timeout=max(deadline - time.monotonic(), 0.0))
+            if not line:
+                continue
+            lines.append(line)
+            if line.startswith("ok"):
+                break
+        return lines
+
+    @traced("printer.wait_ok")
+    def wait_ok(self, timeout=30.0):
+        """Wait for the next ``ok``.
+
+        ``echo:busy`` keep-alives (sent during long moves and dwells) restart
+        the timeout. Raises RuntimeError on a firmware error and TimeoutError
+        if nothing arrives in time.
+        """
+        if self.simulate or not self.ser:
+            return True
+        started = time.monotonic()
+        deadline = started + timeout
+        while time.monotonic() < deadline:
+            line = self._readline(timeout=max(deadline - time.monotonic(), 0.0))
+            if not line:
+                continue
+            if line.startswith("ok"):
+                self.link.observe("reply_s", time.monotonic() - started)
+                return True
+            if line.startswith("echo:busy"):
+                deadline = time.monotonic() + timeout
+            elif line.startswith("Error") or line.startswith("!!"):
+                self.link.incr("errors")
+                raise RuntimeError(f"Printer error: {line}")
+            else:
+                xyz = parse_m114(line)
+                if xyz is not None:
+                    self.position = dict(zip("XYZ", xyz))
+        self.link.incr("ack_timeouts")
+        raise TimeoutError(f"No 'ok' from printer on {self.port} within {timeout} s")
+
+    def discard_replies(self, quiet_s=0.0):
+        """Drop reply lines nobody waits for, after `quiet_s` s for late ones."""
+        if self.simulate or not self.ser:
+            return
+        if quiet_s > 0:
+            time.sleep(quiet_s)
+        if self._reader is not None:
+            while True:
+                try:
+                    self._replies.get_nowait()
+                except queue.Empty:
+                    break
+        else:
+            self.ser.reset_input_buffer()
 
-    def safe_park(self):
-        self.send_gcode("G28")  # Home all axes
-        self.send_gcode("G1 X0 Y200 Z150 F3000")
+    @traced("printer.sync")
+    def sync(self, timeout=120.0, quiet_s=0.2):
+        """Wait until all queued moves are done and drop any pending replies.
+
+        Replies still owed for earlier commands (e.g. fire-and-forget moves or
+        an M114 poll) are discarded, then ``M400`` is sent and its ``ok``
+        awaited, and the input is cleared again, so the next `wait_ok` is
+        answered by the next command sent.
+        """
+        with self._lock:
+            if self.simulate or not self.ser:
+                return
+            self.discard_replies(quiet_s)
+            self.send_gcode("M400", quiet=True)
+            self.wait_ok(timeout=timeout)
+            self.discard_replies()
+
+    @contextmanager
+    def exclusive(self):
+        """Own the session from this thread, e.g. while a program streams.
+
+        Other writers wait until the block ends, `request_position` polls are
+        skipped and the background reader is paused (and restarted after),
+        so every reply reaches the owner's `wait_ok`.
+        """
+        with self._lock:
+            reader_running = self._reader is not None
+            on_line = self._on_line
+            self.stop_reader()
+            try:
+                yield self
+            finally:
+                if reader_running:
+                    self.start_reader(on_line)
+
+    def claim(self, owner):
+        """Reserve the session for `owner` (e.g. a campaign) until `release`.
+
+        Unlike `exclusive` this spans many calls from any thread: while it is
+        claimed, `request_position` polls are skipped and the background
+        reader is paused (restarted on release), so no poll's ``ok`` is taken
+        for the owner's. Manual controls check `owner` and refuse moves.
+        Raises RuntimeError if someone else holds the claim.
+        """
+        with self._lock:
+            if self.owner is not None and self.owner != owner:
+                raise RuntimeError(f"Printer on {self.port} is in use by {self.owner}")
+            if self.owner is None:
+                self._resume_reader = self._reader is not None
+                self.stop_reader()
+            self.owner = owner
+            print(f"[PrinterController] Session claimed by {owner}")
+
+    def release(self, owner):
+        """End the claim of `owner` and restart the reader if it was paused."""
+        with self._lock:
+            if self.owner != owner:
+                return
+            self.owner = None
+            if self._resume_reader:
+                self._resume_reader = False
+                self.start_reader(self._on_line)
+            print(f"[PrinterController] Session released by {owner}")
+
+    # ---------- background reader ----------
+
+    def start_reader(self, on_line=None):
+        """Read replies on a background thread.
+
+        Every line updates the position if it is an M114 report, is passed to
+        `on_line` (if given) and queued for `read_reply`. This lets a GUI keep
+        one connection open and react to replies without blocking.
+        """
+        self._on_line = on_line
+        if self.owner is not None:
+            # started when the claim ends
+            self._resume_reader = True
+            return
+        if self.simulate or self._reader is not None or not self.ser:
+            return
+        self._reader_stop.clear()
+        self._reader = threading.Thread(target=self._read_loop, name=f"printer-reader-{self.port}",
+                                        daemon=True)
+        self._reader.start()
+
+    def stop_reader(self):
+        if self._reader is None:
+            return
+        self._reader_stop.set()
+        self._reader.join(timeout=3)
+        self._reader = None
+
+    def _read_loop(self):
+        while not self._reader_stop.is_set():
+            try:
+                raw = self.ser.readline()
+            except Exception as e:
+                print(f"[PrinterController] Reader stopped: {e}")
+                self.link.incr("errors")
+                break
+            if raw:
+                self.link.rx(len(raw))
+            line = raw.decode(errors="ignore").strip()
+            if not line:
+                continue
+            xyz = parse_m114(line)
+            if xyz is not None:
+                self.position = dict(zip("XYZ", xyz))
+            if self._replies.full():
+                self._replies.get_nowait()
+            self._replies.put_nowait(line)
+            if self._on_line is not None:
+                self._on_line(line)
+        self._reader = None
+
+    def request_position(self):
+        """Send M114 without waiting; the reader thread picks up the reply.
+
+        Skipped (returns False) while the session is claimed or another
+        thread holds it, e.g. during `exclusive`.
+        """
+        if self.owner is not None or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self.send_gcode("M114", quiet=True)
+        finally:
+            self._lock.release()
+        return True
+
+    def query_position(self):
+        """Read the current position with M114 and update the session state."""
+        if self.simulate:
+            print(f"[PrinterController] SIMULATION: M114 → {self.position}")
+            return tuple(self.position.values())
+        if self.ser and self._reader is None:
+            self.ser.reset_input_buffer()
+        self.send_gcode("M114")
+        for line in self.read_reply():
+            xyz = parse_m114(line)
+            if xyz is not None:
+                self.position = dict(zip("XYZ", xyz))
+                return xyz
+        return None
+
+    @traced("printer.home")
+    def home(self, force=False):
+        """Home all axes unless this session already knows they are homed."""
+        if self.homed and not force:
+            print("[PrinterController] Already homed in this session, skipping G28")
+            return False
+        with self._lock:
+            # replies still owed (e.g. to a poll) must not be taken for G28's
+            self.sync()
+            self.send_and_wait("G28", timeout=120.0)  # Home all axes
+            if not self.simulate:
+                self.query_position()
+        return True
+
+    def safe_park(self, force_home=False):
+        self.home(force=force_home)
+        x, y, z = PARK_POSITION
+        if self.position == {"X": x, "Y": y, "Z": z} and not self._relative:
+            print("[PrinterController] Already at safe park position")
+            return
+        self.send_gcode("G90")
+        self.send_gcode(f"G1 X{x:g} Y{y:g} Z{z:g} F3000")
         print("[PrinterController] Moved to safe park position")
 
     def disconnect(self):
+        self.stop_reader()
         if self.ser:
             self.ser.close()
+            self.ser = None
             print("[PrinterController] Disconnected")
+        self._connected = False
+        self.invalidate_state()
@@ -1,15 +1,62 @@
 from .printer_controller import PrinterController
 
+# One open controller per port, kept for the whole Python session so the
+# homing/position state survives between nodes. Re-opening a port resets the
+# board, which is exactly what this avoids.
+_SESSIONS = {}
+
+
+def open_printer(port="COM4", baudrate=115200, simulate=True):
+    """Return the connected session controller for `port`, connecting if needed."""
+    printer = _SESSIONS.get(port)
+    if printer is not None and (printer.simulate != simulate or printer.baud != baudrate):
+        close_printer(port)
+        printer = None
+    if printer is None:
+        printer = PrinterController(port=port, baud=baudrate, simulate=simulate)
+        _SESSIONS[port] = printer
+    if not printer.is_connected and not printer.connect():
+        _SESSIONS.pop(port, None)
+        return None
+    return printer
+
+
+def find_printer(port="COM4"):
+    """The session controller for `port` if one is open, without connecting."""
+    return _SESSIONS.get(port)
+
+
+def release_port(port="COM4"):
+    """Close the session for `port` so another process can open the port.
+
+    Raises RuntimeError while a manual control panel (a running
+    `PositionPoller`) still uses the session.
+    """
+    printer = _SESSIONS.get(port)
+    if printer is None:
+        return
+    if printer.pollers:
+        raise RuntimeError(f"The printer control panel is still connected to {port}; "
+                           "press its Disconnect button first.")
+    close_printer(port)
+
+
+def close_printer(port="COM4"):
+    """Disconnect and forget the session controller for `port`."""
+    printer = _SESSIONS.pop(port, None)
+    if printer is not None:
+        printer.disconnect()
+
+
 def send_gcode(command, port="COM4", baudrate=115200, simulate=True):
-    printer = PrinterController(port=port, baud=baudrate, simulate=simulate)
-    if printer.connect():
+    printer = open_printer(port=port, baudrate=baudrate, simulate=simulate)
+    if printer is not None:
         printer.send_gcode(command)
-        printer.disconnect()
+
 
 def check_printer(port="COM4", baudrate=115200, simulate=True, safe_park=False):
-    printer = PrinterController(port=port, baud=baudrate, simulate=simulate)
-    connected = printer.connect()
+    printer = open_printer(port=port, baudrate=baudrate, simulate=simulate)
+    connected = printer is not None
     if connected and safe_park:
         printer.safe_park()
-    printer.disconnect()
     return connected
@@ -0,0 +1,189 @@
+"""
+Whole-campaign G-code programs.
+
+Instead of issuing one move at a time from Python, the motion of a whole
+campaign (all cells x repeats) is compiled up front into a `GCodeProgram`:
+the moves from `MotionPlanner`, dwells (G4) for settling and pauses, and a
+sync marker wherever a measurement happens. A sync marker is an ``M400``
+(wait until all moves are finished) carrying the visit as a JSON comment::
+
+    M400 ; SYNC {"cell": 5, "repeat": 0}
+
+The program can be saved and reviewed before anything moves, is checked
+against soft limits, and is then streamed to the printer with ``ok``-based
+flow control. At every sync marker streaming stops until the measurement
+callback returns.
+"""
+import json
+import re
+
+from .motion import MotionPlanner
+from telemetry.tracing import traced
+
+SYNC_TAG = "; SYNC "
+
+_AXIS_RE = re.compile(r"([XYZF])\s*(-?[\d.]+)")
+
+
+class GCodeProgram:
+    """A list of G-code lines with sync points."""
+
+    def __init__(self, lines=None):
+        self.lines = []
+        self.sync_points = {}
+        self.motion = None
+        for line in lines or []:
+            self.append(line)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def append(self, line):
+        line = line.rstrip("\n")
+        if SYNC_TAG in line:
+            self.sync_points[len(self.lines)] = json.loads(line.split(SYNC_TAG, 1)[1])
+        self.lines.append(line)
+
+    def comment(self, text):
+        self.lines.append(f"; {text}")
+
+    def dwell(self, seconds):
+        if seconds > 0:
+            self.append(f"G4 P{int(round(seconds * 1000))}")
+
+    def sync(self, payload):
+        """Add a sync point; streaming pauses here and hands `payload` to the callback."""
+        self.append("M400 " + SYNC_TAG + json.dumps(payload, sort_keys=True))
+
+    # ---------- persistence ----------
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+    def save(self, path):
+        with open(path, "w", encoding="ascii") as f:
+            f.write(self.text())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="ascii") as f:
+            return cls(f.read().splitlines())
+
+    # ---------- validation ----------
+
+    def validate(self, soft_limits):
+        """Return a list of soft-limit violations (empty if the program is fine).
+
+        `soft_limits` maps axes to ``(min, max)``, e.g.
+        ``{"X": (0, 220), "Y": (0, 220), "Z": (-30, 150)}``. Axes without
+        limits are not checked. Relative moves are followed from the last
+        absolute position; moves before any absolute position are skipped.
+        """
+        errors = []
+        position = {"X": None, "Y": None, "Z": None}
+        relative = False
+        for number, raw in enumerate(self.lines, 1):
+            code = raw.split(";", 1)[0].strip().upper()
+            if not code:
+                continue
+            word = code.split()[0]
+            if word == "G90":
+                relative = False
+            elif word == "G91":
+                relative = True
+            elif word == "G28":
+                position = {"X": None, "Y": None, "Z": None}
+            elif word in ("G0", "G1", "G92"):
+                for axis, value in _AXIS_RE.findall(code[len(word):]):
+                    value = float(value)
+                    if axis == "F":
+                        if value <= 0:
+                            errors.append(f"line {number}: non-positive feedrate in {raw!r}")
+                        continue
+                    if relative and word != "G92":
+                        if position[axis] is None:
+                            continue
+                        value += position[axis]
+                    position[axis] = value
+                    if word == "G92" or axis not in soft_limits:
+                        continue
+                    low, high = soft_limits[axis]
+                    if not low <= value <= high:
+                        errors.append(f"line {number}: {axis}{value:g} outside [{low:g}, {high:g}] in {raw!r}")
+        return errors
+
+    def check(self, soft_limits):
+        """Raise ValueError if the program violates `soft_limits`."""
+        errors = self.validate(soft_limits)
+        if errors:
+            shown = "\n  ".join(errors[:20])
+            more = f"\n  ... and {len(errors) - 20} more" if len(errors) > 20 else ""
+            raise ValueError(f"G-code program violates soft limits:\n  {shown}{more}")
+
+    # ---------- streaming ----------
+
+    @traced("printer.stream")
+    def stream(self, printer, on_sync=None, window=4, ack_timeout=30.0):
+        """Send the program to `printer` with ``ok``-based flow control.
+
+        At most `window` commands are unacknowledged at any time (Marlin's
+        default command buffer holds four). At a sync point all outstanding
+        commands are drained, which for ``M400`` means all motion has
+        finished, then ``on_sync(payload)`` is called and streaming resumes
+        when it returns.
+
+        The stream owns the printer session while it runs (see
+        `PrinterController.exclusive`): position polls are skipped and the
+        background reader is paused, and replies still pending from earlier
+        commands are drained first, so every ``ok`` counted belongs to a
+        streamed line.
+        """
+        outstanding = 0
+        print(f"[GCodeProgram] Streaming {len(self.lines)} lines, {len(self.sync_points)} sync points")
+        with printer.exclusive():
+            printer.sync(timeout=ack_timeout)
+            for index, line in enumerate(self.lines):
+                code = line.split(";", 1)[0].strip()
+                if not code:
+                    continue
+                while outstanding >= window:
+                    printer.wait_ok(timeout=ack_timeout)
+                    outstanding -= 1
+                printer.send_gcode(code, quiet=True)
+                outstanding += 1
+                if index in self.sync_points:
+                    while outstanding:
+                        printer.wait_ok(timeout=ack_timeout)
+                        outstanding -= 1
+                    if on_sync is not None:
+                        on_sync(self.sync_points[index])
+            while outstanding:
+                printer.wait_ok(timeout=ack_timeout)
+                outstanding -= 1
+
+
+def compile_program(visits, park, profile=None, path_clear=None, start_position=None,
+                    settle_s=1.0):
+    """Compile the motion of a campaign into a `GCodeProgram`.
+
+    `visits` is a sequence of dicts with ``x``, ``y``, ``work_z``,
+    ``travel_z`` and ``retract_z`` keys, plus any keys that should be passed
+    to the sync callback (e.g. ``cell``, ``repeat``). Optional ``dwell_after``
+    (s) adds a pause after the retract. `park` is the final ``(x, y, z)``.
+    """
+    program = GCodeProgram()
+    planner = MotionPlanner(program.append, profile)
+    if start_position is not None:
+        planner.set_position(*start_position)
+    program.comment(f"campaign program: {len(visits)} visits")
+    motion_keys = {"x", "y", "work_z", "travel_z", "retract_z", "dwell_after"}
+    for visit in visits:
+        planner.visit(visit["x"], visit["y"], visit["work_z"], visit["travel_z"],
+                      approach_z=visit["retract_z"], path_clear=path_clear)
+        program.dwell(settle_s)
+        program.sync({k: v for k, v in visit.items() if k not in motion_keys})
+        planner.retract(visit["retract_z"])
+        program.dwell(visit.get("dwell_after", 0.0))
+    planner.park(*park)
+    program.motion = planner.report()
+    return program
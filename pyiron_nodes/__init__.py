@@ -4,6 +4,7 @@ Expose nodes at package level for convenient imports.
 """
 from .workingnodes_printer import (
     CellSelector,
+    WellSelector,
     ExperimentConfig,
     printer_ready,
     MoveSanity,
@@ -14,6 +15,7 @@ from .workingnodes_printer import (
 
 __all__ = [
     "CellSelector",
+    "WellSelector",
     "ExperimentConfig",
     "printer_ready",
     "MoveSanity",
@@ -6,6 +6,7 @@ import os, time
 
 # --- printer & palmsens helpers ---
 from printer.printer_setup import check_printer, send_gcode
+from printer.plate_layout import get_plate_layout
 from palmsens.palmsens_controller import run_chronoamperometry
 
 # ========== Basic selector & config ==========
@@ -28,6 +29,20 @@ def CellSelector(
     return [i for i, sel in enumerate(flags, start=1) if sel]
 
 
+@as_function_node("selected_cells")
+def WellSelector(
+    plate_type: str = "4x4",
+    selection: str = "*",
+    row_step: int = 1,
+    col_step: int = 1,
+):
+    """
+    Return selected cell indices for any plate type from a range spec.
+    e.g. "A1:H6", "A:C,12", "*" with col_step=2 for every other column.
+    """
+    return get_plate_layout(plate_type).select(selection, row_step=row_step, col_step=col_step)
+
+
 
 '''
 @as_dataclass_node
@@ -70,6 +85,57 @@ class ExperimentConfig:
     setup_no: str = "Setup_1"
 
     selected_cells: list = field(default_factory=list)
+    plate_type: str = "4x4"
+    # measured stage XY of >= 3 reference wells, e.g. {"A1": (0.4, 1.1), ...}
+    plate_reference_points: dict = field(default_factory=dict)
+    # JSON saved by printer.height_map.HeightMap (work heights + rim_z); empty = flat plate (WORK_Z/SAFE_Z)
+    height_map_path: str = ""
+
+    # motion: G0 travel feed / Z feed (mm/min), blend lift+travel where the plate allows
+    travel_feed: int = 6000
+    z_feed: int = 1500
+    blend_moves: bool = True
+    # compile all motion into one G-code program (saved next to the data) and stream it
+    compile_motion: bool = False
+    # e.g. {"X": (0, 220), "Y": (0, 220), "Z": (-30, 150)}; checked before streaming
+    soft_limits: dict = field(default_factory=dict)
+    # skip items already completed in output/<setup_no>/campaign_journal.jsonl
+    resume: bool = False
+    # adaptive early stop per method, e.g.
+    # {"Chronoamperometry": {"max_slope": 1e-10, "window": 20, "min_time": 30}}
+    termination: dict = field(default_factory=dict)
+    # record raw PalmSens serial traffic (*.pscap) next to the data for replay
+    capture_raw: bool = False
+    # narrow the current range window per cell from earlier runs' range metadata
+    # (current-measuring methods only, e.g. CA and CV; OCP keeps its script)
+    learn_ranges: bool = False
+    # fill the method's MethodSCRIPT template (scripts/templates) instead of
+    # using the fixed script, e.g. {"Chronoamperometry": {"e_ca": "150 mV"}}
+    script_params: dict = field(default_factory=dict)
+    # template parameters varied across the selected cells (cell i takes
+    # element i % len), e.g. {"Chronoamperometry": {"e_ca": [0, "100m", "200m"]}}
+    param_sweep: dict = field(default_factory=dict)
+    # run a cell's steps as one chained MethodSCRIPT upload (no per-step early stop)
+    chain_steps: bool = False
+    # schedule motion, acquisition, file writing and plotting as overlapping
+    # tasks (campaign.orchestrator); not used with compile_motion
+    overlap_io: bool = False
+    # record timing spans; saved as output/<setup_no>/trace_*.jsonl and
+    # Chrome trace JSON (open in chrome://tracing or Perfetto)
+    trace: bool = False
+    # serve live Prometheus metrics at http://127.0.0.1:<port>/metrics during
+    # the campaign (cell/step/repeat, points, link errors, ...); 0 = off
+    metrics_port: int = 0
+    # run printer and PalmSens I/O in a separate acquisition process
+    # (campaign.worker), so a busy notebook cannot delay serial reads;
+    # not used with compile_motion
+    worker_process: bool = False
+    # publish the streamed points (x, y, t_host) to a shared-memory ring
+    # buffer of this name (palmsens.ringbuffer) for live viewers; "" = off
+    live_buffer: str = ""
+    # show the running measurement as a live, decimated plot in the output
+    # panel (pyironflow.live_plot); uses live_buffer or an unnamed one
+    live_plot: bool = False
 
     printer_port: str = "COM4"
     palmsens_port: str = "COM5"
@@ -384,9 +450,23 @@ def RunMeasurementLoop(config):
     return {"csv_file_paths": csv_paths, "avg_currents": avg_currents}
 '''
 from pyiron_workflow import as_function_node
-import os, time
-from palmsens.palmsens_controller import run_chronoamperometry, run_cyclic_voltammetry, run_ocp
-from printer.printer_setup import send_gcode
+import json, os, time
+from palmsens.palmsens_controller import METHODS, measure_chain, measure_method
+from palmsens.range_presets import find_cell_stores, mine_range_preset
+from palmsens.mscript_estimate import estimate_script, estimate_script_file
+from palmsens.templates import load_template, sweep_params
+from palmsens.ringbuffer import RingBuffer
+from printer.printer_setup import open_printer
+from printer.plate_layout import build_plate_layout
+from printer.height_map import load_height_map
+from printer.motion import MotionPlanner, MotionProfile
+from printer.program import compile_program
+from campaign.journal import CampaignJournal, item_key
+from campaign.orchestrator import Orchestrator
+from campaign.worker import AcquisitionWorker, RemoteRun
+from telemetry.tracing import disable, enable, span, tags
+from telemetry.metrics_server import METRICS, MetricsServer
+from telemetry import linkstats
 
 @as_function_node("measurement_data", use_cache=False)
 def RunMeasurementLoop(config):
@@ -403,6 +483,32 @@ def RunMeasurementLoop(config):
     delay_between_cells = config.get("delta_cell", 2)
     delay_between_repeats = config.get("delta_repeat", 3)
     num_repeats = config.get("num_repeats", 1)
+    plate_type = config.get("plate_type", "4x4")
+    plate_reference_points = config.get("plate_reference_points") or {}
+    height_map_path = config.get("height_map_path", "")
+    motion_profile = MotionProfile(
+        travel_feed=config.get("travel_feed", 6000),
+        z_feed=config.get("z_feed", 1500),
+        blend=config.get("blend_moves", True),
+    )
+    compile_motion = config.get("compile_motion", False)
+    soft_limits = config.get("soft_limits") or {}
+    resume = config.get("resume", False)
+    termination = {k.strip().upper(): v for k, v in (config.get("termination") or {}).items()}
+    capture_raw = config.get("capture_raw", False)
+    learn_ranges = config.get("learn_ranges", False)
+    chain_steps = config.get("chain_steps", False)
+    overlap_io = config.get("overlap_io", False)
+    trace = config.get("trace", False)
+    metrics_port = config.get("metrics_port", 0)
+    worker_process = config.get("worker_process", False)
+    live_buffer = config.get("live_buffer", "")
+    live_plot = config.get("live_plot", False)
+    if worker_process and compile_motion:
+        print("[RunMeasurementLoop] worker_process is not used with compile_motion")
+        worker_process = False
+    script_params = {k.strip().upper(): v for k, v in (config.get("script_params") or {}).items()}
+    param_sweep = {k.strip().upper(): v for k, v in (config.get("param_sweep") or {}).items()}
 
     # Build a clean steps list: drop None/empty and strip accidental inner quotes
     raw_steps = [
@@ -420,83 +526,435 @@ def RunMeasurementLoop(config):
             if s_clean:
                 steps.append(s_clean)
 
-    STEP = 50
     SAFE_Z = 0
     WORK_Z = -25
-    START_X, START_Y = 0, 0
-
-    csv_paths, avg_currents = [], []
 
-    for repeat_idx in range(num_repeats):
-        print(f"\n=== Repeat {repeat_idx+1} of {num_repeats} ===\n")
-        for cell in selected_cells:
-            print(f"[RunMeasurementLoop] Cell {cell} → running {len(steps)} step(s)")
+    # XY for every selected cell is looked up once from the (calibrated) plate table
+    layout = build_plate_layout(plate_type, plate_reference_points)
+    cell_xy = dict(zip(selected_cells, layout.xy(selected_cells).tolist()))
+    START_X, START_Y = layout.park_xy
 
-            # compute XY for this cell
-            ci = cell - 1
-            row, col = divmod(ci, 4)
-            x = START_X + col * STEP
-            y = START_Y + row * STEP
+    # per-cell work Z and minimal travel lift from a measured height map
+    height_map = load_height_map(height_map_path, layout) if height_map_path else None
 
-            # move to cell and go down once before steps
-            send_gcode(f"G1 Z{SAFE_Z:.2f} F1500", port, baud, simulate)
-            send_gcode(f"G1 X{x:.2f} Y{y:.2f} F3000", port, baud, simulate)
-            send_gcode(f"G1 Z{WORK_Z:.2f} F1500", port, baud, simulate)
-            time.sleep(1)
+    # plan every cell visit (cells x repeats) up front
+    visits = []
+    prev_cell = None
+    for repeat_idx in range(num_repeats):
+        for cell_idx, cell in enumerate(selected_cells):
+            x, y = cell_xy[cell]
+            if height_map is not None:
+                work_z = height_map.work_z(cell)
+                travel_z = height_map.travel_z(prev_cell, cell)
+                retract_z = height_map.retract_z(cell)
+            else:
+                work_z, travel_z, retract_z = WORK_Z, SAFE_Z, SAFE_Z
+            dwell_after = delay_between_cells
+            if cell_idx == len(selected_cells) - 1 and repeat_idx < num_repeats - 1:
+                dwell_after += delay_between_repeats
+            visits.append(dict(
+                cell=cell, repeat=repeat_idx, x=x, y=y,
+                work_z=work_z, travel_z=travel_z, retract_z=retract_z,
+                dwell_after=dwell_after,
+            ))
+            prev_cell = cell
+
+    # method -> script
+    runners = {
+        "CHRONOAMPEROMETRY": "scripts/Script_Chronoamperometry.mscr",
+        "CYCLIC VOLTAMMETRY": "scripts/Script_CV.mscr",
+        "OPEN CIRCUIT POTENTIAL": "scripts/Script_OCP.mscr",
+    }
+    templates = {
+        "CHRONOAMPEROMETRY": "scripts/templates/chronoamperometry.mscr.tmpl",
+        "CYCLIC VOLTAMMETRY": "scripts/templates/cyclic_voltammetry.mscr.tmpl",
+        "OPEN CIRCUIT POTENTIAL": "scripts/templates/open_circuit_potential.mscr.tmpl",
+    }
+    for method in steps:
+        if method.strip().upper() not in runners:
+            print(f"❌ Unknown method '{method}' — skipping")
+    if chain_steps and termination:
+        print("[RunMeasurementLoop] chain_steps: adaptive termination is ignored for chained steps")
+
+    # render every parameterized (cell, method) script once, before anything
+    # moves; bad parameters fail here and the cell loop only looks scripts up
+    cell_scripts = {}
+    for cell_idx, cell in enumerate(selected_cells):
+        for mkey in runners:
+            if mkey in script_params or mkey in param_sweep:
+                params = sweep_params(script_params.get(mkey), param_sweep.get(mkey), cell_idx)
+                cell_scripts[cell, mkey] = (params, load_template(templates[mkey]).render(params))
+
+    def visit_items(visit):
+        return [
+            item_key(visit["repeat"] + 1, visit["cell"], step_idx, method)
+            for step_idx, method in enumerate(steps, 1)
+            if method.strip().upper() in runners
+        ]
+
+    # append-only progress journal; with resume, completed items are skipped
+    journal = CampaignJournal(os.path.join("output", setup_no, "campaign_journal.jsonl"))
+    plan = [key for visit in visits for key in visit_items(visit)]
+    pending = journal.start(plan, resume=resume, setup_no=setup_no, steps=steps,
+                            cells=list(selected_cells), num_repeats=num_repeats,
+                            plate_type=plate_type)
+
+    # rough campaign ETA from static script estimates (measurement time only)
+    step_s = {m: estimate_script_file(path).duration_s
+              for m, path in runners.items() if os.path.exists(path)}
+    rendered_s = {}
+    for data in {data for _, data in cell_scripts.values()}:
+        rendered_s[data] = estimate_script(data.decode("ascii")).duration_s
+    eta_s = 0.0
+    for visit in visits:
+        for step_idx, method in enumerate(steps, 1):
+            mkey = method.strip().upper()
+            key = item_key(visit["repeat"] + 1, visit["cell"], step_idx, method)
+            if mkey not in runners or journal.is_done(key):
+                continue
+            script = cell_scripts.get((visit["cell"], mkey))
+            eta_s += rendered_s[script[1]] if script else step_s.get(mkey, 0.0)
+    print(f"[RunMeasurementLoop] {len(pending)} measurement(s) to run, "
+          f"≈{eta_s / 60:.1f} min of acquisition")
+    visits = [v for v in visits if not all(journal.is_done(k) for k in visit_items(v))]
+
+    announced_repeats = set()
+
+    def record_result(key, result):
+        if result.get("error"):
+            # the run ended on an error (e.g. USB drop): not done, so resume retries it
+            METRICS.inc("campaign_items_failed_total")
+            journal.record_failed(key, result["error"])
+            return
+        METRICS.inc("campaign_items_done_total")
+        journal.record_done(
+            key,
+            outputs={"csv_path": result["csv_path"], "plot_path": result["plot_path"],
+                     "raw_path": result["raw_path"], "capture_path": result["capture_path"]},
+            metrics={**result["metrics"], "n_points": result["n_points"],
+                     "stop_reason": result["stop_reason"]},
+        )
 
-            # run ALL configured steps for this cell (in order)
+    worker = None   # AcquisitionWorker with worker_process
+    printer = None  # kernel session otherwise (claimed while the campaign runs)
+    live = None     # RingBuffer with live_buffer / live_plot
+    live_view = None
+    live_run = None
+
+    def acquire_method(method, **kwargs):
+        if worker is not None:
+            return RemoteRun(worker.measure(method, **kwargs))
+        on_point = live.on_point if live is not None else None
+        return measure_method(method, on_point=on_point, **kwargs)
+
+    def acquire_chain(steps, **kwargs):
+        if worker is not None:
+            return [RemoteRun(result) for result in worker.measure_chain(steps, **kwargs)]
+        on_point = live.on_point if live is not None else None
+        return measure_chain(steps, on_point=on_point, **kwargs)
+
+    def on_worker_points(batch):
+        nonlocal live_run
+        METRICS.inc("palmsens_points_total", len(batch["x"]))
+        if live is not None:
+            if batch["raw_path"] != live_run:
+                live_run = batch["raw_path"]
+                live.new_generation()
+            live.extend(batch["x"], batch["y"], batch["t_host"])
+
+    def prepare_cell(cell, repeat_idx):
+        """Steps of this cell still to measure, with their scripts and learned
+        range presets: [(journal key, step index, method, run kwargs)].
+
+        Needs neither the printer nor the potentiostat (range presets are
+        mined from earlier runs on disk), so it can run during the move.
+        """
+        with tags(cell=cell, repeat=repeat_idx + 1):
+            cell_dir = os.path.join("output", setup_no, f"cell_{cell:02}")
+            todo = []
             for step_idx, method in enumerate(steps, 1):
                 mkey = method.strip().upper()
-                print(f"[RunMeasurementLoop] Cell {cell} → Step {step_idx}: {method}")
-
-                out_dir = os.path.join(
-                    "output", setup_no, f"cell_{cell:02}", f"repeat_{repeat_idx+1:02}"
-                )
-
-                if mkey == "CHRONOAMPEROMETRY":
-                    csv_path, avg = run_chronoamperometry(
-                        port=palmsens_port,
-                        baudrate=palmsens_baud,
-                        script_path="scripts/Script_Chronoamperometry.mscr",
-                        output_path=out_dir,
-                        simulate=simulate,
-                    )
-                elif mkey == "CYCLIC VOLTAMMETRY":
-                    csv_path, avg = run_cyclic_voltammetry(
-                        port=palmsens_port,
-                        baudrate=palmsens_baud,
-                        script_path="scripts/Script_CV.mscr",
-                        output_path=out_dir,
-                        simulate=simulate,
-                    )
-                elif mkey == "OPEN CIRCUIT POTENTIAL":
-                    csv_path, avg = run_ocp(
-                        port=palmsens_port,
-                        baudrate=palmsens_baud,
-                        script_path="scripts/Script_OCP.mscrr",
-                        output_path=out_dir,
-                        simulate=simulate,
-                    )
-                else:
-                    print(f"❌ Unknown method '{method}' — skipping")
+                if mkey not in runners:
                     continue
-
-                csv_paths.append(csv_path)
-                avg_currents.append(avg)
-
-            # retract only AFTER all steps are done for this cell
-            send_gcode(f"G1 Z{SAFE_Z:.2f} F1500", port, baud, simulate)
-            time.sleep(delay_between_cells)
-
-        # wait between repeats
-        if repeat_idx < num_repeats - 1:
-            time.sleep(delay_between_repeats)
-
-    # final park
-    send_gcode(f"G1 Z{SAFE_Z:.2f} F1500", port, baud, simulate)
-    send_gcode(f"G1 X{START_X:.2f} Y{START_Y:.2f} F3000", port, baud, simulate)
-
-    return {"csv_file_paths": csv_paths, "avg_currents": avg_currents}
+                key = item_key(repeat_idx + 1, cell, step_idx, method)
+                if journal.is_done(key):
+                    print(f"[RunMeasurementLoop] Cell {cell} → Step {step_idx}: {method} already done")
+                    continue
+                params, script = cell_scripts.get((cell, mkey), (None, None))
+                todo.append((key, step_idx, method, dict(
+                    method=mkey,
+                    script_path=templates[mkey] if script else runners[mkey],
+                    script_text=script,
+                    script_params=params,
+                    range_preset=(mine_range_preset(find_cell_stores(cell_dir, mkey))
+                                  if learn_ranges and METHODS[mkey].measures_current else None),
+                )))
+            return todo
+
+    def acquire_cell(cell, repeat_idx, on_run=None, todo=None):
+        """Measure ALL configured steps for this cell (in order).
+
+        `todo` is the cell's `prepare_cell` result if it was prepared ahead.
+        Returns [(journal key, MethodRun)]; CSV, plot and journal record are
+        left to the caller (`on_run(key, run)` is called after every step).
+        """
+        METRICS.set("campaign_cell", cell)
+        METRICS.set("campaign_repeat", repeat_idx + 1)
+        with tags(cell=cell, repeat=repeat_idx + 1):
+            if repeat_idx not in announced_repeats:
+                announced_repeats.add(repeat_idx)
+                print(f"\n=== Repeat {repeat_idx+1} of {num_repeats} ===\n")
+            print(f"[RunMeasurementLoop] Cell {cell} → running {len(steps)} step(s)")
+            out_dir = os.path.join("output", setup_no, f"cell_{cell:02}",
+                                   f"repeat_{repeat_idx+1:02}")
+            if todo is None:
+                todo = prepare_cell(cell, repeat_idx)
+
+            measured = []
+            if chain_steps and len(todo) > 1:
+                # one upload for all steps of the cell; no per-step early stop
+                print(f"[RunMeasurementLoop] Cell {cell} → chaining "
+                      f"{' → '.join(method for _, _, method, _ in todo)}")
+                METRICS.set("campaign_step", todo[0][1])
+                try:
+                    with tags(step="chain"):
+                        runs = acquire_chain([step for *_, step in todo], port=palmsens_port,
+                                             baudrate=palmsens_baud, output_path=out_dir,
+                                             simulate=simulate, capture=capture_raw)
+                except Exception as e:
+                    METRICS.inc("campaign_items_failed_total", len(todo))
+                    for key, *_ in todo:
+                        journal.record_failed(key, e)
+                    raise
+                for (key, *_), run in zip(todo, runs):
+                    measured.append((key, run))
+                    if on_run:
+                        on_run(key, run)
+                return measured
+
+            for key, step_idx, method, step in todo:
+                print(f"[RunMeasurementLoop] Cell {cell} → Step {step_idx}: {method}")
+                METRICS.set("campaign_step", step_idx)
+                try:
+                    with tags(step=step_idx, method=step["method"]):
+                        run = acquire_method(
+                            step["method"],
+                            port=palmsens_port,
+                            baudrate=palmsens_baud,
+                            output_path=out_dir,
+                            simulate=simulate,
+                            terminator=termination.get(step["method"]),
+                            capture=capture_raw,
+                            **{k: v for k, v in step.items() if k != "method"},
+                        )
+                except Exception as e:
+                    METRICS.inc("campaign_items_failed_total")
+                    journal.record_failed(key, e)
+                    raise
+                measured.append((key, run))
+                if on_run:
+                    on_run(key, run)
+            return measured
+
+    def measure_cell(cell, repeat_idx):
+        """Measure, save and record ALL configured steps for this cell."""
+        acquire_cell(cell, repeat_idx, on_run=lambda key, run: record_result(key, run.finish()))
+
+    def move_to(visit):
+        # move to cell and go down once before steps
+        with tags(cell=visit["cell"], repeat=visit["repeat"] + 1):
+            planner.visit(visit["x"], visit["y"], visit["work_z"], visit["travel_z"],
+                          approach_z=visit["retract_z"], path_clear=path_clear)
+            # M400: the head has arrived before anything is measured
+            sync_printer()
+            METRICS.set("printer_motion_planned_seconds", planner.planned_time)
+            with span("cell.settle"):
+                time.sleep(1)
+
+    def retract_from(visit):
+        # retract only AFTER all steps are done for this cell
+        with tags(cell=visit["cell"], repeat=visit["repeat"] + 1):
+            planner.retract(visit["retract_z"])
+            with span("cell.dwell"):
+                time.sleep(visit["dwell_after"])
+
+    # per-phase timing spans (telemetry.tracing), exported next to the data
+    tracer = enable() if trace else None
+    trace_paths = None
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    # serial link counters of this campaign, dumped at the end
+    linkstats.reset_all()
+    # live gauges for monitoring (telemetry.metrics_server)
+    METRICS.reset()
+    METRICS.set("campaign_items_planned", len(pending))
+    METRICS.set("campaign_items_done_total", 0)
+    METRICS.set("campaign_items_failed_total", 0)
+    metrics_server = MetricsServer(port=metrics_port).start() if metrics_port else None
+    if metrics_server is not None:
+        print(f"[RunMeasurementLoop] Metrics: {metrics_server.url}")
+    queue_collector = None
+    if tracer is not None:
+        trace_paths = [os.path.join("output", setup_no, f"trace_{stamp}.jsonl"),
+                       os.path.join("output", setup_no, f"trace_{stamp}.trace.json")]
+    try:
+        if live_buffer or live_plot:
+            try:
+                live = RingBuffer.create(("x", "y", "t_host"), name=live_buffer or None)
+            except FileExistsError:
+                live = RingBuffer.attach(live_buffer)   # left over from an earlier campaign
+            print(f"[RunMeasurementLoop] Live points: shared memory {live.name!r}")
+        if live_plot:
+            from pyironflow.live_plot import LivePlot
+            live_view = LivePlot(live).show().start()
+
+        # session connection (kept open between runs so homing/position survive)
+        if worker_process:
+            # the worker owns both ports; the planner's G-code goes over the pipe
+            worker = AcquisitionWorker(port, baud, simulate, on_points=on_worker_points).start()
+            send_gcode = worker.gcode
+            sync_printer = worker.sync
+            position = worker.position()["position"]
+        else:
+            printer = open_printer(port=port, baudrate=baud, simulate=simulate)
+            if printer is None:
+                raise ConnectionError(f"Could not connect to printer on {port}")
+            # a panel on this session stops polling and refuses moves until the end
+            printer.claim("RunMeasurementLoop")
+            # planner moves wait for their ok, so the firmware queue never overflows
+            send_gcode = printer.send_and_wait
+            sync_printer = printer.sync
+            position = printer.position
+        if not compile_motion:
+            sync_printer()  # drop replies still owed to earlier commands of the session
+        start_position = None
+        if None not in position.values():
+            start_position = (position["X"], position["Y"], position["Z"])
+        path_clear = height_map.path_clear if height_map is not None else None
+        planner = None
+        utilization = None
+
+        if compile_motion:
+            # whole campaign as one reviewable, limit-checked program; streaming
+            # pauses at each cell's sync point while the steps are measured
+            program = compile_program(
+                visits, (START_X, START_Y, SAFE_Z), motion_profile,
+                path_clear=path_clear, start_position=start_position, settle_s=1.0,
+            )
+            program_dir = os.path.join("output", setup_no)
+            os.makedirs(program_dir, exist_ok=True)
+            program_path = os.path.join(program_dir, f"campaign_{time.strftime('%Y%m%d-%H%M%S')}.gcode")
+            program.save(program_path)
+            print(f"[RunMeasurementLoop] Motion program: {program_path} ({len(program)} lines)")
+            if soft_limits:
+                program.check(soft_limits)
+            program.stream(printer, on_sync=lambda v: measure_cell(v["cell"], v["repeat"]))
+            motion_report = program.motion
+            METRICS.set("printer_motion_planned_seconds", motion_report.get("planned_motion_s", 0))
+        elif overlap_io:
+            # per visit: move -> measure -> retract on the printer/potentiostat,
+            # while CSV, plot and journal record of the visit run on disk/plot
+            # and overlap with the next move; the next visit's steps are
+            # prepared as soon as the potentiostat is done with this one
+            planner = MotionPlanner(send_gcode, motion_profile)
+            if start_position is not None:
+                planner.set_position(*start_position)
+            potentiostat = f"potentiostat:{palmsens_port}"
+            orchestrator = Orchestrator(("printer", potentiostat, "disk", "plot"))
+
+            def queue_collector():
+                return [("scheduler_queue_depth", {"resource": name}, depth)
+                        for name, depth in orchestrator.queue_depths().items()]
+            METRICS.add_collector(queue_collector)
+            previous = None
+            measure = None
+            for i, visit in enumerate(visits):
+                move = orchestrator.add(f"move/{i}", "printer", lambda v=visit: move_to(v),
+                                        after=[previous])
+                prepare = orchestrator.add(
+                    f"prepare/{i}", "disk",
+                    lambda v=visit: prepare_cell(v["cell"], v["repeat"]), after=[measure])
+                measure = orchestrator.add(
+                    f"measure/{i}", potentiostat,
+                    lambda v=visit, p=prepare: acquire_cell(v["cell"], v["repeat"],
+                                                            todo=orchestrator.result(p)),
+                    after=[move, prepare])
+                previous = orchestrator.add(f"retract/{i}", "printer",
+                                            lambda v=visit: retract_from(v), after=[measure])
+                save = orchestrator.add(
+                    f"save/{i}", "disk",
+                    lambda m=measure: [run.save_csv() for _, run in orchestrator.result(m)],
+                    after=[measure])
+                plot = orchestrator.add(
+                    f"plot/{i}", "plot",
+                    lambda m=measure: [run.save_plot() for _, run in orchestrator.result(m)],
+                    after=[measure])
+                orchestrator.add(
+                    f"record/{i}", "disk",
+                    lambda m=measure: [record_result(key, run.summarize())
+                                       for key, run in orchestrator.result(m)],
+                    after=[save, plot])
+            orchestrator.add("park", "printer", lambda: planner.park(START_X, START_Y, SAFE_Z),
+                             after=[previous])
+            orchestrator.run()
+            motion_report = planner.report()
+            utilization = orchestrator.report()
+            print(f"[RunMeasurementLoop] Utilization: {utilization}")
+        else:
+            # the planner drops redundant moves
+            planner = MotionPlanner(send_gcode, motion_profile)
+            if start_position is not None:
+                planner.set_position(*start_position)
+            for visit in visits:
+                move_to(visit)
+                measure_cell(visit["cell"], visit["repeat"])
+                retract_from(visit)
+
+            # final park
+            planner.park(START_X, START_Y, SAFE_Z)
+            motion_report = planner.report()
+
+        print(f"[RunMeasurementLoop] Motion: {motion_report}")
+        journal.finish(motion=motion_report, utilization=utilization, trace=trace_paths,
+                       links={name: s.counters for name, s in linkstats.all_link_stats().items()})
+    finally:
+        if worker is not None:
+            if worker.alive:
+                # the worker's ports are counted in the worker process
+                worker_links = os.path.join("output", setup_no, f"linkstats_worker_{stamp}.json")
+                with open(worker_links, "w", encoding="utf-8") as f:
+                    json.dump(worker.link_stats(), f, indent=2)
+                print(f"[RunMeasurementLoop] Worker link statistics: {worker_links}")
+            worker.stop()
+        if printer is not None:
+            printer.release("RunMeasurementLoop")
+        if metrics_server is not None:
+            metrics_server.stop()
+        if live_view is not None:
+            live_view.stop()
+        if live is not None:
+            # viewers keep their mapping; the name is freed for the next campaign
+            live.close()
+            live.unlink()
+        METRICS.remove_collector(queue_collector)
+        links_path = linkstats.dump(os.path.join("output", setup_no, f"linkstats_{stamp}.json"))
+        print(f"[RunMeasurementLoop] Link statistics: {links_path}")
+        for stats in linkstats.all_link_stats().values():
+            print(f"    {stats.summary()}")
+        if tracer is not None:
+            disable()
+            tracer.export_jsonl(trace_paths[0])
+            tracer.export_chrome(trace_paths[1])
+            print(f"[RunMeasurementLoop] Trace: {trace_paths[1]}")
+            for name, entry in list(tracer.summary().items())[:8]:
+                print(f"    {name:<24} {entry['count']:>5} × {entry['total_s']:8.2f} s")
+
+    # results in plan order, including items finished before a resume
+    done = [journal.completed[key] for key in plan if journal.is_done(key)]
+    csv_paths = [r["outputs"].get("csv_path") for r in done]
+    avg_currents = [r["metrics"].get("avg") for r in done]
+
+    return {"csv_file_paths": csv_paths, "avg_currents": avg_currents, "motion": motion_report,
+            "utilization": utilization}
 
 
 # ========== Manual printer control (GUI panel node) ==========
@@ -512,11 +970,13 @@ def SamplePrinterMover(
     x_step: float = 1.0, y_step: float = 1.0, z_step: float = 0.5,
     # safe/default presets
     safe_x: float = 121.0, safe_y: float = 131.0, safe_z: float = 115.0,
+    simulate: bool = False,
 ):
 
     import ipywidgets as widgets
-    import serial
-    import re
+    from printer.printer_setup import open_printer, close_printer
+    from printer.printer_controller import parse_m114
+    from printer.jog import JogCoalescer, PositionPoller
 
     # absolute inputs
     x_in = widgets.FloatText(value=default_x, description="X:")
@@ -552,57 +1012,103 @@ def SamplePrinterMover(
     kill_btn   = widgets.Button(description="EMERGENCY STOP (M112)", button_style="danger")
     motors_btn = widgets.Button(description="Motors OFF (M18)")
     reset_btn  = widgets.Button(description="Reset FW (M999)", button_style="info")
+    disconnect_btn = widgets.Button(description="Disconnect")
 
     note = widgets.HTML(
         "<b>⚠ Safety:</b> <i>M112</i> halts immediately and puts firmware in alarm; "
         "send <i>M999</i> (Reset) then <i>G28</i> (Home) before moving again."
     )
     out = widgets.Output(layout={"border": "1px solid #ccc", "max_height": "200px", "overflow": "auto"})
-
-    def send(g: str, expect_response=False):
-        with out:
-            print("→", g)
-            try:
-                with serial.Serial(port, 115200, timeout=2) as ser:
-                    ser.write((g + "\n").encode())
-                    if expect_response:
-                        while True:
-                            line = ser.readline().decode().strip()
-                            if line:
-                                print("←", line)
-                                if "X:" in line and "Y:" in line:
-                                    # Try to parse coordinates
-                                    match = re.search(r"X:([\d\.\-]+) Y:([\d\.\-]+) Z:([\d\.\-]+)", line)
-                                    if match:
-                                        x, y, z = match.groups()
-                                        print(f"📍 Current Position → X={x}, Y={y}, Z={z}")
-                                    break
-            except Exception as e:
-                print(f"⚠ Error: {e}")
-
-    def on_move(_):   send("G90"); send("G21"); send(f"G1 X{x_in.value} Y{y_in.value} Z{z_in.value} F{speed_in.value}")
-    def on_home(_):   send("G90"); send("G21"); send("G28")
+    pos_label = widgets.HTML("<b>📍 Position:</b> unknown")
+
+    # one persistent connection per port (shared with the campaign nodes);
+    # replies are read on a background thread, so clicks never block on I/O
+    printer = open_printer(port=port, baudrate=115200, simulate=simulate)
+
+    def log(text):
+        out.append_stdout(text + "\n")
+
+    def on_reply(line):
+        # position reports and acks from the poller only update the label
+        if line.startswith("ok") or parse_m114(line) is not None:
+            return
+        log(f"← {line}")
+
+    def show_position(position):
+        if None in position.values():
+            pos_label.value = "<b>📍 Position:</b> unknown"
+        else:
+            pos_label.value = ("<b>📍 Position:</b> X={X:.2f} Y={Y:.2f} Z={Z:.2f}"
+                               .format(**position))
+
+    def busy():
+        # a campaign has claimed the session; its moves must not be interleaved
+        if printer is not None and printer.owner is not None:
+            log(f"⚠ {port} is in use by {printer.owner}")
+            return True
+        return False
+
+    def send(*commands, force=False):
+        if printer is None or not printer.is_connected:
+            log(f"⚠ Not connected to {port}")
+            return
+        if not force and busy():
+            return
+        for g in commands:
+            log(f"→ {g}")
+        try:
+            printer.send_many(commands, quiet=True)
+        except Exception as e:
+            log(f"⚠ Error: {e}")
+
+    if printer is None:
+        log(f"⚠ Could not open {port}")
+        jogger = poller = None
+    else:
+        printer.start_reader(on_line=on_reply)
+        jogger = JogCoalescer(printer, feed=speed)
+        poller = PositionPoller(printer, interval=0.5, on_update=show_position)
+        poller.start()
+
+    def on_move(_):   send("G90", "G21", f"G1 X{x_in.value} Y{y_in.value} Z{z_in.value} F{speed_in.value}")
+    def on_home(_):   send("G90", "G21", "G28")
     def on_default(_):
-        send("G90"); send("G21")
-        send(f"G1 Z{max(defz_in.value, safz_in.value)} F{speed_in.value}")
-        send(f"G1 X{defx_in.value} Y{defy_in.value} F{speed_in.value}")
-        send(f"G1 Z{defz_in.value} F{speed_in.value}")
+        send("G90", "G21",
+             f"G1 Z{max(defz_in.value, safz_in.value)} F{speed_in.value}",
+             f"G1 X{defx_in.value} Y{defy_in.value} F{speed_in.value}",
+             f"G1 Z{defz_in.value} F{speed_in.value}")
     def on_safe(_):
-        send("G90"); send("G21")
-        send(f"G1 Z{safz_in.value} F{speed_in.value}")
-        send(f"G1 X{safx_in.value} Y{safy_in.value} F{speed_in.value}")
+        send("G90", "G21",
+             f"G1 Z{safz_in.value} F{speed_in.value}",
+             f"G1 X{safx_in.value} Y{safy_in.value} F{speed_in.value}")
 
     def jog(dx=0, dy=0, dz=0):
-        send("G91")
-        parts = []
-        if dx: parts.append(f"X{dx}")
-        if dy: parts.append(f"Y{dy}")
-        if dz: parts.append(f"Z{dz}")
-        if parts: send("G1 " + " ".join(parts) + f" F{speed_in.value}")
-        send("G90")
+        # rapid clicks are merged into one relative move
+        if jogger is None:
+            log(f"⚠ Not connected to {port}")
+            return
+        if busy():
+            return
+        log(f"↔ jog X{dx:+g} Y{dy:+g} Z{dz:+g}")
+        jogger.jog(dx, dy, dz, feed=speed_in.value)
 
     def on_getpos(_):
-        send("M114", expect_response=True)
+        if printer is not None:
+            printer.request_position()
+            show_position(printer.position)
+
+    def stop(command):
+        if jogger is not None:
+            jogger.cancel()
+        send(command, force=True)  # stops go through even during a campaign
+
+    def on_disconnect(_):
+        if poller is not None:
+            poller.stop()
+        if jogger is not None:
+            jogger.cancel()
+        close_printer(port)
+        log(f"🔌 Disconnected {port}")
 
     # bind
     move_btn.on_click(on_move); home_btn.on_click(on_home)
@@ -610,17 +1116,19 @@ def SamplePrinterMover(
     jog_xm.on_click(lambda _: jog(dx=-xstep_in.value)); jog_xp.on_click(lambda _: jog(dx=+xstep_in.value))
     jog_ym.on_click(lambda _: jog(dy=-ystep_in.value)); jog_yp.on_click(lambda _: jog(dy=+ystep_in.value))
     jog_zm.on_click(lambda _: jog(dz=-zstep_in.value)); jog_zp.on_click(lambda _: jog(dz=+zstep_in.value))
-    quick_btn.on_click(lambda _: send("M410"))
-    kill_btn.on_click(lambda _: send("M112"))
+    quick_btn.on_click(lambda _: stop("M410"))
+    kill_btn.on_click(lambda _: stop("M112"))
     motors_btn.on_click(lambda _: send("M18"))
     reset_btn.on_click(lambda _: send("M999"))
     getpos_btn.on_click(on_getpos)
+    disconnect_btn.on_click(on_disconnect)
 
     panel = widgets.VBox([
         widgets.HTML("<b>Manual Printer Control</b>"),
         widgets.HBox([x_in, y_in, z_in, speed_in]),
         widgets.HBox([xstep_in, ystep_in, zstep_in]),
-        widgets.HBox([move_btn, home_btn, getpos_btn]),
+        widgets.HBox([move_btn, home_btn, getpos_btn, disconnect_btn]),
+        pos_label,
         widgets.HBox([jog_xm, jog_xp, jog_ym, jog_yp, jog_zm, jog_zp]),
         widgets.HTML("<hr/>"),
         widgets.HBox([quick_btn, kill_btn, motors_btn, reset_btn]),
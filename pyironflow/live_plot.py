@@ -0,0 +1,141 @@
+"""
+Live plot of a running measurement in the PyironFlow output panel.
+
+The plot reads the points from a `palmsens.ringbuffer.RingBuffer` (the
+acquisition side publishes to it, see ``ExperimentConfig.live_buffer``),
+reduces the current run to the pixel columns of the figure
+(`palmsens.decimate`, with the limits taken from every point) and sends one
+PNG per frame to an ``ipywidgets.Image``.
+Frames are rendered on a background thread at most `max_fps` times per
+second and only when new points arrived, so the widget traffic does not
+depend on the acquisition rate or the run length::
+
+    live = LivePlot("rig1_live", out_widget=pf.out_widget).show().start()
+    ...
+    live.stop()
+
+A `PyironFlow` GUI registers its output panel as `LivePlot.default_out_widget`,
+so plots started by a node without an `out_widget` (e.g. RunMeasurementLoop
+with ``live_plot``) show up there.
+"""
+import io
+import threading
+
+import ipywidgets as widgets
+import numpy as np
+from IPython.display import display
+from matplotlib.figure import Figure
+
+from palmsens.decimate import decimate, fit_view, for_axes
+from palmsens.ringbuffer import RingBuffer
+
+
+class LivePlot:
+    # where plots without an `out_widget` are shown (set by PyironFlow); None: current output
+    default_out_widget = None
+
+    def __init__(
+            self,
+            source,
+            out_widget=None,
+            width_px: int = 640,
+            height_px: int = 320,
+            max_fps: float = 4.0,
+            method: str = "minmax",
+            x: str = "x",
+            y: str = "y",
+    ):
+        """
+
+        Args:
+            source (RingBuffer | str): ring buffer, or the name of one to attach to
+            out_widget (widgets.Output): where `show` displays the plot (default:
+                `LivePlot.default_out_widget`, else the current output)
+            width_px, height_px (int): figure size; the width is the decimation budget
+            max_fps (float): frame rate cap
+            method (str): "minmax" (keeps the envelope) or "lttb"
+            x, y (str): ring buffer columns to plot
+        """
+        self._attached = isinstance(source, str)
+        self.ring = RingBuffer.attach(source) if self._attached else source
+        self.out_widget = out_widget if out_widget is not None else LivePlot.default_out_widget
+        self.width_px = width_px
+        self.max_fps = max_fps
+        self.method = method
+        self.x = x
+        self.y = y
+        self.frames = 0
+        self._shown = None      # (generation, seq) of the last frame
+        self._stop = threading.Event()
+        self._thread = None
+
+        dpi = 100
+        self.figure = Figure(figsize=(width_px / dpi, height_px / dpi), dpi=dpi)
+        self.ax = self.figure.subplots()
+        self.ax.grid(True)
+        (self.line,) = self.ax.plot([], [], lw=1)
+        self.image = widgets.Image(format="png", layout={"width": f"{width_px}px"})
+
+    def show(self):
+        if self.out_widget is not None:
+            with self.out_widget:
+                display(self.image)
+        else:
+            display(self.image)
+        return self
+
+    def render(self):
+        """Draw a frame if new points arrived; returns True if it did."""
+        generation, seq, columns = self.ring.current(copy=False)
+        if (generation, seq) == self._shown:
+            return False
+        x, y = columns[self.x], columns[self.y]
+        # limits from every point, then reduce to the pixel columns of that view
+        fit_view(self.ax, x, y)
+        if self.method == "minmax":
+            x, y = for_axes(self.ax, x, y)
+        else:
+            x, y = decimate(x, y, self.width_px, self.method)
+        x, y = np.array(x), np.array(y)
+        del columns     # views into shared memory
+        self.line.set_data(x, y)
+        self.ax.set_title(f"run {generation}: {seq - self.ring.generation_start} points",
+                          fontsize=9)
+        buffer = io.BytesIO()
+        self.figure.savefig(buffer, format="png")
+        self.image.value = buffer.getvalue()
+        self._shown = (generation, seq)
+        self.frames += 1
+        return True
+
+    def _loop(self):
+        interval = 1.0 / self.max_fps
+        while not self._stop.wait(interval):
+            try:
+                self.render()
+            except Exception as e:  # a broken frame must not end the view
+                print(f"[LivePlot] Frame failed: {e}")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="live-plot", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop updating (after a last frame) and release the ring buffer if attached here."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.render()
+        if self._attached and self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def __enter__(self):
+        return self.show().start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
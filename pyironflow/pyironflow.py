@@ -81,6 +81,10 @@ class PyironFlow:
             widget.accordion_widget = self.accordion
             widget.tree_widget = self.tree_view
 
+        # live plots started by nodes (e.g. RunMeasurementLoop) go to the output panel
+        from pyironflow.live_plot import LivePlot
+        LivePlot.default_out_widget = self.out_widget
+
         self.gui = widgets.HBox([
             self.accordion,
             self.view_flows,
@@ -93,6 +97,12 @@ class PyironFlow:
                 'height': '75vh',
             })
 
+    def live_plot(self, source, **kwargs):
+        """Show a live plot of ring buffer `source` in the output panel (see `LivePlot`)."""
+        from pyironflow.live_plot import LivePlot
+        self.accordion.selected_index = 1
+        return LivePlot(source, out_widget=self.out_widget, **kwargs).show().start()
+
     def get_workflow(self, tab_index=0):
         wf_widget = self.wf_widgets[tab_index]
         return wf_widget.get_workflow()
@@ -0,0 +1,24 @@
+"""
+Campaign telemetry (timing spans, serial link statistics, live metrics).
+"""
+from .tracing import Tracer, current_tags, disable, enable, get_tracer, span, tags, traced
+from .linkstats import LinkStats, link_stats, snapshot_all
+from .metrics_server import METRICS, CampaignMetrics, MetricsServer
+
+__all__ = [
+    "Tracer",
+    "current_tags",
+    "disable",
+    "enable",
+    "get_tracer",
+    "span",
+    "tags",
+    "traced",
+    "LinkStats",
+    "link_stats",
+    "snapshot_all",
+    "METRICS",
+    "CampaignMetrics",
+    "MetricsServer",
+]
+__version__ = "0.1.0"
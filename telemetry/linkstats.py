@@ -0,0 +1,178 @@
+"""
+Serial link counters and histograms.
+
+Every transport (the PalmSens `Instrument`, the `PrinterController`) keeps
+a `LinkStats` in a process-wide registry, keyed by link name (e.g.
+``"palmsens:COM5"``, ``"printer:COM4"``). Statistics accumulate across
+connections, so they describe the link over a whole campaign:
+
+    counters    bytes_tx, bytes_rx, lines_tx, lines_rx, connects, reconnects,
+                timeouts (empty reads), partial_lines, retries, errors, ...
+    histograms  rx_gap_s (time between received lines),
+                reply_s (time from a command to its reply, where known)
+
+Updates are plain attribute/dict operations without locks; concurrent
+writers (e.g. a reader thread) may rarely lose an increment, which is
+acceptable for monitoring. `snapshot` adds rates (bytes/s, lines/s);
+`dump` writes all links to JSON.
+"""
+import bisect
+import json
+import os
+import time
+
+# Histogram bucket upper bounds (s): 100 µs .. ~105 s, doubling.
+GAP_BOUNDS = tuple(1e-4 * 2 ** k for k in range(21))
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum, min and max."""
+
+    __slots__ = ("bounds", "buckets", "count", "sum", "min", "max")
+
+    def __init__(self, bounds=GAP_BOUNDS):
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self):
+        self.buckets = [0] * (len(self.bounds) + 1)     # last one: above the top bound
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bucket bound below which a fraction `q` of the values lie."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+            "buckets": {f"le_{bound:g}": n for bound, n in zip(self.bounds, self.buckets) if n},
+            "above": self.buckets[-1],
+        }
+
+
+class LinkStats:
+    """Counters and histograms of one serial link."""
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.started = time.monotonic()
+        self.counters = dict.fromkeys(
+            ("bytes_tx", "bytes_rx", "lines_tx", "lines_rx", "connects", "reconnects",
+             "timeouts", "partial_lines", "retries", "errors"), 0)
+        self.histograms = {"rx_gap_s": Histogram(), "reply_s": Histogram()}
+        self._last_rx = None
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def tx(self, nbytes, lines=1):
+        counters = self.counters
+        counters["bytes_tx"] += nbytes
+        counters["lines_tx"] += lines
+
+    def rx(self, nbytes, lines=1):
+        counters = self.counters
+        counters["bytes_rx"] += nbytes
+        counters["lines_rx"] += lines
+        now = time.monotonic()
+        if self._last_rx is not None:
+            self.histograms["rx_gap_s"].observe(now - self._last_rx)
+        self._last_rx = now
+
+    def connected(self):
+        """Count a (re)connection; the gap across it is not a line gap."""
+        if self.counters["connects"]:
+            self.counters["reconnects"] += 1
+        self.counters["connects"] += 1
+        self._last_rx = None
+
+    def snapshot(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        counters = dict(self.counters)
+        return {
+            "name": self.name,
+            "elapsed_s": elapsed,
+            **counters,
+            "bytes_tx_per_s": counters["bytes_tx"] / elapsed,
+            "bytes_rx_per_s": counters["bytes_rx"] / elapsed,
+            "lines_rx_per_s": counters["lines_rx"] / elapsed,
+            "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+        }
+
+    def summary(self):
+        """One line for logs."""
+        c = self.counters
+        gap = self.histograms["rx_gap_s"]
+        return (f"{self.name}: tx {c['bytes_tx']} B / rx {c['bytes_rx']} B, "
+                f"{c['lines_rx']} lines, gap p99 {gap.quantile(0.99) or 0:.3g} s, "
+                f"max {gap.max or 0:.3g} s, timeouts {c['timeouts']}, "
+                f"partial {c['partial_lines']}, retries {c['retries']}, "
+                f"errors {c['errors']}, reconnects {c['reconnects']}")
+
+
+_links = {}
+
+
+def link_stats(name):
+    """The `LinkStats` of link `name` (created on first use)."""
+    stats = _links.get(name)
+    if stats is None:
+        stats = _links[name] = LinkStats(name)
+    return stats
+
+
+def all_link_stats():
+    return dict(_links)
+
+
+def reset_all():
+    for stats in _links.values():
+        stats.reset()
+
+
+def snapshot_all():
+    return {name: stats.snapshot() for name, stats in _links.items()}
+
+
+def dump(path):
+    """Write the snapshots of all links to `path` (JSON)."""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot_all(), f, indent=2)
+    return path
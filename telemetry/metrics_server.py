@@ -0,0 +1,164 @@
+"""
+Live campaign metrics over HTTP (Prometheus text format).
+
+`METRICS` is a process-wide set of gauges and counters that the campaign
+code updates as it goes (current cell/step/repeat, points acquired,
+device status flags, motion time, failures). `MetricsServer` serves them,
+together with the serial link statistics (`telemetry.linkstats`) and any
+registered collectors (e.g. the orchestrator's queue depths), at
+``http://127.0.0.1:<port>/metrics``::
+
+    server = MetricsServer(port=9108).start()
+    ...
+    server.stop()
+
+The server binds to localhost only and runs on a daemon thread; metrics
+are rendered when scraped, so updates cost a dict operation.
+"""
+import http.server
+import threading
+import time
+
+from telemetry import linkstats
+
+# name -> (type, help)
+METRIC_INFO = {
+    "campaign_cell": ("gauge", "Cell currently measured"),
+    "campaign_step": ("gauge", "Step index currently measured (1-based)"),
+    "campaign_repeat": ("gauge", "Repeat currently measured (1-based)"),
+    "campaign_items_done_total": ("counter", "Measurements finished"),
+    "campaign_items_failed_total": ("counter", "Measurements that raised"),
+    "campaign_items_planned": ("gauge", "Measurements planned in this campaign"),
+    "palmsens_points_total": ("counter", "Data packages acquired"),
+    "palmsens_points_per_second": ("gauge", "Acquisition rate since the previous scrape"),
+    "palmsens_flagged_points_total": ("counter", "Points with a device status flag"),
+    "palmsens_device_info": ("gauge", "Connected potentiostat"),
+    "palmsens_run_errors_total": ("counter", "Runs ended by a communication error"),
+    "printer_motion_planned_seconds": ("gauge", "Estimated motion time so far"),
+    "scheduler_queue_depth": ("gauge", "Tasks ready but waiting for their resource"),
+    "link_counter_total": ("counter", "Serial link counters (telemetry.linkstats)"),
+    "link_rx_gap_seconds_max": ("gauge", "Largest gap between received lines"),
+}
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                    for k, v in sorted(labels.items()))
+    return "{" + body + "}"
+
+
+class CampaignMetrics:
+    """Gauges and counters keyed by (name, labels)."""
+
+    def __init__(self):
+        self.values = {}
+        self.collectors = []
+        self._last_rate = None      # (monotonic time, points) at the previous scrape
+
+    def reset(self):
+        self.values = {}
+        self._last_rate = None
+
+    def set(self, name, value, **labels):
+        self.values[name, tuple(sorted(labels.items()))] = value
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.values[key] = self.values.get(key, 0) + n
+
+    def get(self, name, **labels):
+        return self.values.get((name, tuple(sorted(labels.items()))), 0)
+
+    def add_collector(self, collector):
+        """`collector()` returns (name, labels dict, value) samples at scrape time."""
+        self.collectors.append(collector)
+
+    def remove_collector(self, collector):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def samples(self):
+        samples = [(name, dict(labels), value) for (name, labels), value in list(self.values.items())]
+        # acquisition rate between scrapes
+        now, points = time.monotonic(), self.get("palmsens_points_total")
+        if self._last_rate is not None and now > self._last_rate[0]:
+            rate = (points - self._last_rate[1]) / (now - self._last_rate[0])
+            samples.append(("palmsens_points_per_second", {}, rate))
+        self._last_rate = (now, points)
+        for name, stats in linkstats.all_link_stats().items():
+            for counter, value in stats.counters.items():
+                samples.append(("link_counter_total", {"link": name, "counter": counter}, value))
+            samples.append(("link_rx_gap_seconds_max", {"link": name},
+                            stats.histograms["rx_gap_s"].max or 0.0))
+        for collector in list(self.collectors):
+            samples.extend(collector())
+        return samples
+
+    def render(self):
+        """All samples in Prometheus text exposition format."""
+        by_name = {}
+        for name, labels, value in self.samples():
+            by_name.setdefault(name, []).append((labels, value))
+        lines = []
+        for name, entries in by_name.items():
+            kind, text = METRIC_INFO.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in entries:
+                lines.append(f"{name}{_labels(labels)} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = CampaignMetrics()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    metrics = METRICS
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass    # scrapes would flood the notebook output
+
+
+class MetricsServer:
+    """Serve `metrics` at http://<host>:<port>/metrics on a daemon thread."""
+
+    def __init__(self, metrics=METRICS, host="127.0.0.1", port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def start(self):
+        handler = type("Handler", (_Handler,), {"metrics": self.metrics})
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]      # port 0: any free port
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="metrics-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
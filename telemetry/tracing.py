@@ -0,0 +1,209 @@
+"""
+Lightweight timing spans.
+
+Code marks the phases it wants timed::
+
+    with span("printer.wait_ok"):
+        ...
+
+    @traced("csv")
+    def save_csv(...): ...
+
+and a campaign sets the context the spans are attributed to::
+
+    with tags(cell=5, repeat=1):
+        with tags(step=2, method="CHRONOAMPEROMETRY"):
+            ...
+
+Tracing is off by default: `span` then returns a shared no-op object and
+`traced` calls straight through, so instrumented code pays one global
+lookup. `enable()` installs a `Tracer` that records every finished span
+(name, category, start, duration, thread, tags and extra arguments).
+`Tracer.export_jsonl` writes one span per line. `Tracer.export_chrome`
+writes Chrome trace-event JSON, which opens in chrome://tracing or Perfetto.
+
+Tags live in a context variable, so they follow ``asyncio`` tasks and
+``asyncio.to_thread`` calls; plain threads start without tags.
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+_tags = contextvars.ContextVar("trace_tags", default={})
+_tracer = None
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Span:
+    """A running span; `set` adds arguments (e.g. counts known at the end)."""
+
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.cat, self.start, end, self.args)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+class Tracer:
+    """Collects finished spans in memory."""
+
+    def __init__(self):
+        self.events = []
+        self.origin_ns = time.perf_counter_ns()
+        self.origin_wall = time.time()
+        self._lock = threading.Lock()
+
+    def span(self, name, cat="", **args):
+        return Span(self, name, cat or name.split(".", 1)[0], {**_tags.get(), **args})
+
+    def record(self, name, cat, start_ns, end_ns, args):
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": cat,
+            "ts_us": (start_ns - self.origin_ns) / 1000,
+            "dur_us": (end_ns - start_ns) / 1000,
+            "tid": thread.ident,
+            "thread": thread.name,
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self):
+        with self._lock:
+            self.events = []
+
+    def summary(self):
+        """{span name: {"count", "total_s", "max_s"}}, largest total first."""
+        totals = {}
+        for event in list(self.events):
+            entry = totals.setdefault(event["name"], {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            duration = event["dur_us"] / 1e6
+            entry["count"] += 1
+            entry["total_s"] += duration
+            entry["max_s"] = max(entry["max_s"], duration)
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["total_s"]))
+
+    def export_jsonl(self, path):
+        """One JSON object per span; times in µs since the tracer started."""
+        _makedirs(path)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"origin_wall": self.origin_wall}) + "\n")
+            for event in list(self.events):
+                f.write(json.dumps(event, default=str) + "\n")
+        return path
+
+    def export_chrome(self, path):
+        """Chrome trace-event JSON (complete events, ``"ph": "X"``)."""
+        pid = os.getpid()
+        events = list(self.events)
+        trace = [{"name": e["name"], "cat": e["cat"], "ph": "X", "ts": e["ts_us"],
+                  "dur": e["dur_us"], "pid": pid, "tid": e["tid"], "args": e["args"]}
+                 for e in events]
+        threads = {e["tid"]: e["thread"] for e in events}
+        trace += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                   "args": {"name": name}} for tid, name in threads.items()]
+        _makedirs(path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms",
+                       "otherData": {"origin_wall": self.origin_wall}}, f, default=str)
+        return path
+
+
+def _makedirs(path):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+
+def enable(tracer=None):
+    """Start recording spans (into `tracer` or a new one); returns the tracer."""
+    global _tracer
+    _tracer = tracer or Tracer()
+    return _tracer
+
+
+def disable():
+    """Stop recording; returns the tracer that was active (or None)."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+def span(name, cat="", **args):
+    """Context manager timing a phase; a no-op while tracing is disabled."""
+    tracer = _tracer
+    if tracer is None:
+        return _NO_SPAN
+    return tracer.span(name, cat, **args)
+
+
+def traced(name=None, cat=""):
+    """Decorator: run the function inside ``span(name)`` (default: its qualified name)."""
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return fn(*args, **kwargs)
+            with tracer.span(span_name, cat):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_tags():
+    return dict(_tags.get())
+
+
+@contextlib.contextmanager
+def tags(**values):
+    """Attribute the spans inside the block to e.g. a cell, step and repeat."""
+    token = _tags.set({**_tags.get(), **values})
+    try:
+        yield
+    finally:
+        _tags.reset(token)